@@ -7,12 +7,14 @@ from django.contrib.auth import get_user_model, login, logout
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Count, Sum, Avg
+from django.db.models import Q, Count, Sum, Avg
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+from utils.pagination import paginate
+
 from .models import UserProfile, CustomerGroup, Address
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserSerializer, UserProfileSerializer,
@@ -486,28 +488,14 @@ class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
             else:
                 queryset = queryset.exclude(profile__company_name='')
         
-        # Pagination
-        page = int(request.query_params.get('page', 1))
-        limit = min(int(request.query_params.get('limit', 20)), 100)
-        offset = (page - 1) * limit
-        
-        total = queryset.count()
-        customers_page = queryset[offset:offset + limit]
-        
+        customers_page, pagination = paginate(request, queryset, ['-date_joined'])
         serializer = self.get_serializer(customers_page, many=True)
         
         return Response({
             'success': True,
             'data': {
                 'customers': serializer.data,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': total,
-                    'total_pages': (total + limit - 1) // limit,
-                    'has_next': offset + limit < total,
-                    'has_prev': page > 1
-                }
+                'pagination': pagination
             }
         })
     
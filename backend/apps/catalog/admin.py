@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import ProductCategory, Product, ProductImage, ProductItem
+from .models import (
+    ProductCategory, Product, ProductImage, ProductItem,
+    InventoryLedgerEntry, InventorySnapshot
+)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -17,7 +20,7 @@ class ProductItemInline(admin.TabularInline):
 
 @admin.register(ProductCategory)
 class ProductCategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'parent', 'is_active', 'created_at')
+    list_display = ('name', 'parent', 'depth', 'is_active', 'created_at')
     list_filter = ('is_active', 'parent', 'created_at')
     search_fields = ('name', 'description')
     prepopulated_fields = {'name': ('name',)}
@@ -34,7 +37,11 @@ class ProductAdmin(admin.ModelAdmin):
         'category', 'is_active', 'created_at'
     )
     search_fields = ('sku', 'name', 'description', 'brand', 'model')
-    readonly_fields = ('available_quantity', 'created_at', 'updated_at')
+    # Reserved/rented units follow reservations through the inventory ledger
+    readonly_fields = (
+        'quantity_reserved', 'quantity_rented', 'available_quantity',
+        'created_at', 'updated_at'
+    )
     inlines = [ProductImageInline, ProductItemInline]
     fieldsets = (
         ('Basic Information', {
@@ -79,3 +86,38 @@ class ProductItemAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('created_at', 'updated_at')
     raw_id_fields = ('product',)
+
+
+class ReadOnlyLedgerAdmin(admin.ModelAdmin):
+    """The ledger is append-only; entries are written by apps.catalog.inventory"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(InventoryLedgerEntry)
+class InventoryLedgerEntryAdmin(ReadOnlyLedgerAdmin):
+    list_display = (
+        'id', 'product', 'kind', 'on_hand_delta', 'reserved_delta',
+        'rented_delta', 'reference_type', 'reference_id', 'created_at'
+    )
+    list_filter = ('kind', 'reference_type', 'created_at')
+    search_fields = ('product__sku', 'product__name', 'reference_id', 'note')
+    raw_id_fields = ('product', 'created_by')
+
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(ReadOnlyLedgerAdmin):
+    list_display = (
+        'product', 'last_entry_id', 'quantity_on_hand',
+        'quantity_reserved', 'quantity_rented', 'taken_at'
+    )
+    list_filter = ('taken_at',)
+    search_fields = ('product__sku', 'product__name')
+    raw_id_fields = ('product',)
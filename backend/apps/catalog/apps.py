@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.catalog'
+
+    def ready(self):
+        # Import signal handlers when app is ready
+        try:
+            import apps.catalog.signals
+        except ImportError:
+            pass
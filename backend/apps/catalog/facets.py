@@ -0,0 +1,184 @@
+"""
+Faceted counts for product searches.
+
+One grouped query counts the filtered products per combination of brand,
+category, rental unit, price band and stock state; the facets are summed
+from those rows in Python, and category counts are rolled up through the
+cached category tree so a parent counts everything below it. Results are
+cached for a short time under a key built from the normalized filters.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, CharField, Count, F, Value, When
+
+from .models import Product
+from .tree import get_category_tree
+
+logger = logging.getLogger(__name__)
+
+FACET_CACHE_TIMEOUT = 60
+
+# Daily rate bands: (key, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ('0-500', Decimal('0'), Decimal('500')),
+    ('500-1000', Decimal('500'), Decimal('1000')),
+    ('1000-2500', Decimal('1000'), Decimal('2500')),
+    ('2500-5000', Decimal('2500'), Decimal('5000')),
+    ('5000+', Decimal('5000'), None),
+]
+UNPRICED_BAND = 'unpriced'
+
+# Query parameters that change which products match
+FILTER_PARAMS = [
+    'search', 'category', 'is_rentable', 'availability', 'brand',
+    'available_from', 'available_to', 'quantity'
+]
+
+
+def price_band_expression():
+    whens = [When(daily_rate__isnull=True, then=Value(UNPRICED_BAND))]
+    for key, lower, upper in PRICE_BANDS:
+        if upper is None:
+            whens.append(When(daily_rate__gte=lower, then=Value(key)))
+        else:
+            whens.append(When(daily_rate__gte=lower, daily_rate__lt=upper, then=Value(key)))
+    return Case(*whens, default=Value(UNPRICED_BAND), output_field=CharField())
+
+
+def facet_cache_key(params, scope: str = '') -> str:
+    """Cache key for a filter set; equivalent filter sets share a key"""
+    normalized = {}
+    for name in FILTER_PARAMS:
+        value = params.get(name)
+        if value in (None, ''):
+            continue
+        value = str(value).strip()
+        if name in ('search', 'brand', 'is_rentable', 'availability'):
+            value = ' '.join(value.lower().split())
+        normalized[name] = value
+    digest = hashlib.sha1(
+        json.dumps({'scope': scope, 'filters': normalized}, sort_keys=True).encode()
+    ).hexdigest()
+    return f"catalog:facets:{digest}"
+
+
+class ProductFacets:
+    """Facet counts over a filtered product queryset"""
+
+    @staticmethod
+    def compute(queryset) -> Dict:
+        """
+        Returns {
+            'total': int,
+            'brands': [{'value', 'count'}],
+            'categories': [{'id', 'name', 'full_path', 'parent', 'count', 'total_count'}],
+            'rental_units': [{'value', 'label', 'count'}],
+            'price_bands': [{'value', 'min', 'max', 'count'}],
+            'availability': {'available': int, 'unavailable': int}
+        }
+        """
+        rows = queryset.order_by().annotate(
+            price_band=price_band_expression(),
+            in_stock=Case(
+                When(quantity_on_hand__gt=F('quantity_reserved') + F('quantity_rented'), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).values(
+            'brand', 'category_id', 'default_rental_unit', 'price_band', 'in_stock'
+        ).annotate(count=Count('id'))
+
+        total = 0
+        brands = defaultdict(int)
+        categories = defaultdict(int)
+        units = defaultdict(int)
+        bands = defaultdict(int)
+        availability = {'available': 0, 'unavailable': 0}
+        for row in rows:
+            count = row['count']
+            total += count
+            if row['brand']:
+                brands[row['brand']] += count
+            if row['category_id'] is not None:
+                categories[row['category_id']] += count
+            units[row['default_rental_unit']] += count
+            bands[row['price_band']] += count
+            availability['available' if row['in_stock'] else 'unavailable'] += count
+
+        unit_labels = dict(Product.RentalUnit.choices)
+        return {
+            'total': total,
+            'brands': [
+                {'value': brand, 'count': count}
+                for brand, count in sorted(brands.items(), key=lambda entry: (-entry[1], entry[0].lower()))
+            ],
+            'categories': ProductFacets.roll_up_categories(categories),
+            'rental_units': [
+                {'value': unit, 'label': unit_labels.get(unit, unit), 'count': units[unit]}
+                for unit in unit_labels if units.get(unit)
+            ],
+            'price_bands': [
+                {
+                    'value': key,
+                    'min': float(lower),
+                    'max': float(upper) if upper is not None else None,
+                    'count': bands[key]
+                }
+                for key, lower, upper in PRICE_BANDS if bands.get(key)
+            ] + (
+                [{'value': UNPRICED_BAND, 'min': None, 'max': None, 'count': bands[UNPRICED_BAND]}]
+                if bands.get(UNPRICED_BAND) else []
+            ),
+            'availability': availability
+        }
+
+    @staticmethod
+    def roll_up_categories(direct_counts: Dict[int, int]) -> List[Dict]:
+        """Direct counts per category plus totals including every descendant"""
+        nodes = get_category_tree().nodes
+        totals = defaultdict(int)
+        for category_id, count in direct_counts.items():
+            seen = set()
+            current = category_id
+            while current is not None and current in nodes and current not in seen:
+                seen.add(current)
+                totals[current] += count
+                current = nodes[current]['parent']
+
+        return [
+            {
+                'id': category_id,
+                'name': nodes[category_id]['name'],
+                'full_path': nodes[category_id]['full_path'],
+                'parent': nodes[category_id]['parent'],
+                'count': direct_counts.get(category_id, 0),
+                'total_count': total
+            }
+            for category_id, total in sorted(
+                totals.items(), key=lambda entry: nodes[entry[0]]['full_path']
+            )
+        ]
+
+    @staticmethod
+    def cached(queryset, params, scope: str = '') -> Dict:
+        """compute() behind a short-lived cache keyed by the normalized filters"""
+        key = facet_cache_key(params, scope)
+        try:
+            facets = cache.get(key)
+            if facets is not None:
+                return facets
+        except Exception as e:
+            logger.warning(f"Could not read cached facets: {str(e)}")
+
+        facets = ProductFacets.compute(queryset)
+        try:
+            cache.set(key, facets, FACET_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Could not cache facets: {str(e)}")
+        return facets
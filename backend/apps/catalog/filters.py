@@ -0,0 +1,122 @@
+"""
+Product listing filters shared by the catalog endpoints.
+
+filter_products() applies the query-string filters of the product list
+(search, category, brand, rentable, stock and date-range availability) to
+a queryset, and product_ordering() turns sort parameters into an ordering,
+so every endpoint that lists products filters and sorts them the same way.
+"""
+from datetime import datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from django.db.models import F
+from django.utils import timezone
+
+from .search import ProductSearchIndex
+
+SORT_FIELDS = ['name', 'brand', 'created_at']
+
+
+class ProductFilterError(ValueError):
+    """Invalid filter parameters; ``code`` follows the API error codes"""
+
+    def __init__(self, code: str, message: str):
+        self.code = code
+        self.message = message
+        super().__init__(message)
+
+
+def _parse_moment(value: str, end_of_range: bool = False) -> datetime:
+    """
+    ISO date or datetime. A bare date means the whole day, so as the end
+    of a range it stands for the start of the following day.
+    """
+    value = value.strip()
+    if len(value) == 10:
+        day = datetime.fromisoformat(value).date()
+        if end_of_range:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    else:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_window(available_from: Optional[str], available_to: Optional[str]) -> Optional[Tuple[datetime, datetime]]:
+    """The requested rental window, or None when neither bound is given"""
+    if not available_from and not available_to:
+        return None
+    if not available_from or not available_to:
+        raise ProductFilterError(
+            'MISSING_PARAMETERS', 'available_from and available_to must be given together'
+        )
+    try:
+        start = _parse_moment(available_from)
+        end = _parse_moment(available_to, end_of_range=True)
+    except ValueError:
+        raise ProductFilterError('INVALID_DATE_FORMAT', 'Invalid date format. Use ISO format.')
+    if start >= end:
+        raise ProductFilterError('INVALID_DATE_RANGE', 'available_to must be after available_from')
+    return start, end
+
+
+def filter_products(queryset, params):
+    """
+    Apply the product list filters in ``params`` (a QueryDict or dict).
+    Raises ProductFilterError for malformed parameters.
+    """
+    from apps.orders.capacity import CapacityService
+
+    search = params.get('search')
+    category = params.get('category')
+    is_rentable = params.get('is_rentable')
+    availability = params.get('availability')
+    brand = params.get('brand')
+
+    if search:
+        queryset = ProductSearchIndex.search(queryset, search)
+
+    if category:
+        queryset = queryset.filter(category_id=category)
+
+    if is_rentable is not None:
+        queryset = queryset.filter(rentable=is_rentable.lower() == 'true')
+
+    if availability is not None and availability.lower() == 'true':
+        queryset = queryset.filter(
+            quantity_on_hand__gt=F('quantity_reserved') + F('quantity_rented')
+        )
+
+    if brand:
+        queryset = queryset.filter(brand__icontains=brand)
+
+    window = parse_window(params.get('available_from'), params.get('available_to'))
+    if window is not None:
+        try:
+            quantity = int(params.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise ProductFilterError('INVALID_QUANTITY', 'quantity must be a positive integer')
+        if quantity < 1:
+            raise ProductFilterError('INVALID_QUANTITY', 'quantity must be a positive integer')
+        queryset = CapacityService.filter_available(queryset, window[0], window[1], quantity)
+
+    return queryset
+
+
+def product_ordering(params) -> List[str]:
+    """Ordering for the sort_by/sort_order parameters; search results default to relevance"""
+    search = params.get('search')
+    sort_by = params.get('sort_by', 'relevance' if search else 'name')
+    sort_order = params.get('sort_order', 'asc')
+    prefix = '-' if (sort_order == 'desc') != sort_by.startswith('-') else ''
+    sort_by = sort_by.lstrip('-')
+
+    if sort_by in SORT_FIELDS:
+        return [f'{prefix}{sort_by}']
+    if sort_by == 'category':
+        return [f'{prefix}category__name']
+    if sort_by == 'relevance' and search:
+        return ['-search_rank', 'name']
+    return ['name']
@@ -0,0 +1,569 @@
+"""
+Streaming bulk import of catalog data from CSV or JSON Lines.
+
+Records are read lazily from the stream and handled in chunks: every row
+of a chunk is validated against the model fields, foreign keys (category,
+product SKU, price list) are resolved with one query per chunk, and the
+valid rows are written with bulk upserts. Invalid rows are reported with
+their line number and skipped; they never abort the run. If a chunk fails
+in the database anyway, it is retried row by row to isolate the culprits.
+
+Supported kinds:
+
+* ``products``: keyed on ``sku``; ``category`` is a category id or name.
+* ``items``: serial items keyed on ``serial_number`` and attached by
+  ``product_sku``. A row can describe a range instead, with
+  ``serial_prefix``, ``serial_start``, ``serial_end`` and optional
+  ``serial_width`` (zero padding).
+* ``images``: image metadata (the file must already be in storage),
+  keyed on ``product_sku`` + ``image``.
+* ``price_rules``: keyed on price list, scope (``product_sku`` or
+  ``category``), minimum duration and quantity, and validity dates.
+
+Only the columns present in a row are written, so a file holding just
+``sku`` and ``daily_rate`` updates rates without touching anything else.
+Rows that upsert on a unique column (products, items) use
+``bulk_create(update_conflicts=True)``; images and price rules have no
+unique key in the schema and are matched in memory per chunk instead.
+"""
+import csv
+import io
+import json
+import logging
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+from django.db.models import Q
+
+from .models import Product, ProductCategory, ProductImage, ProductItem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# Upper bound of items one serial range row may expand to
+MAX_SERIAL_RANGE = 10000
+
+TRUE_VALUES = {'1', 't', 'true', 'y', 'yes'}
+FALSE_VALUES = {'0', 'f', 'false', 'n', 'no'}
+
+# Sentinel for an empty cell that should leave the column untouched
+MISSING = object()
+
+
+class ImportRowError(Exception):
+    """A row that cannot be imported; ``errors`` maps columns to messages"""
+
+    def __init__(self, errors):
+        self.errors = errors if isinstance(errors, dict) else {'row': errors}
+        super().__init__(str(self.errors))
+
+
+def iter_records(stream, file_format: str) -> Iterator[Tuple[int, Dict]]:
+    """(line number, raw record) pairs from a CSV or JSONL stream, read lazily"""
+    if not isinstance(stream, io.TextIOBase):
+        # Binary files and Django uploads (which wrap a binary file)
+        stream = io.TextIOWrapper(getattr(stream, 'file', stream), encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {
+                (key or '').strip(): value for key, value in record.items() if key
+            }
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ImportRowError(f"Invalid JSON: {str(e)}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ImportRowError('Each line must be a JSON object')
+                continue
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+
+def clean_value(field: models.Field, raw):
+    """A model field value from a raw cell, or MISSING for an empty cell to skip"""
+    if isinstance(raw, str):
+        raw = raw.strip()
+    if raw is None or raw == '':
+        if field.null:
+            return None
+        if isinstance(field, (models.CharField, models.TextField, models.FileField)):
+            return ''
+        return MISSING
+    if isinstance(field, models.BooleanField) and isinstance(raw, str):
+        lowered = raw.lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+        raise ValidationError(f"'{raw}' is not a boolean")
+    return field.clean(raw, None)
+
+
+class ImportKind:
+    """How one kind of record is validated, keyed and written"""
+
+    model = None
+    # Columns mapped straight onto model fields
+    fields: List[str] = []
+    # Columns resolved to foreign keys: column -> model field name
+    relations: Dict[str, str] = {}
+    required: List[str] = []
+
+    def expand(self, record: Dict) -> List[Dict]:
+        """Records this raw record stands for (serial ranges expand to many)"""
+        return [record]
+
+    def resolve(self, records: List[Dict]) -> Dict[str, Dict]:
+        """{column: {raw value: id}} for the relation columns used in a chunk"""
+        return {}
+
+    def clean(self, record: Dict, resolved: Dict[str, Dict]) -> Dict:
+        errors = {}
+        values = {}
+        missing = [column for column in self.required if record.get(column) in (None, '')]
+        for column in missing:
+            errors[column] = 'This field is required.'
+
+        for column, target in self.relations.items():
+            raw = record.get(column)
+            if raw in (None, '') or column in errors:
+                continue
+            key = str(raw).strip()
+            if key not in resolved.get(column, {}):
+                errors[column] = f"Unknown {column.replace('_', ' ')} '{key}'"
+            else:
+                values[target] = resolved[column][key]
+
+        for name in self.fields:
+            if name not in record or name in errors:
+                continue
+            try:
+                value = clean_value(self.model._meta.get_field(name), record[name])
+            except ValidationError as e:
+                errors[name] = '; '.join(e.messages)
+                continue
+            if value is not MISSING:
+                values[name] = value
+
+        if errors:
+            raise ImportRowError(errors)
+        return values
+
+    def key(self, values: Dict):
+        raise NotImplementedError
+
+    def write(self, rows: List[Dict]) -> Tuple[int, int]:
+        """Persist cleaned rows; returns (created, updated)"""
+        raise NotImplementedError
+
+    def after_chunk(self, rows: List[Dict]):
+        """Side effects bulk writes skip (signals), run once per chunk"""
+
+    def finish(self):
+        """Side effects run once after the import"""
+
+
+def _lookup(model, raw_values: Iterable, field: str = 'name') -> Dict[str, int]:
+    """{raw value: id} where raw values are ids or ``field`` values"""
+    raw_values = {str(value).strip() for value in raw_values if value not in (None, '')}
+    if not raw_values:
+        return {}
+    ids = [int(value) for value in raw_values if value.isdigit()]
+    result = {}
+    for pk, name in model.objects.filter(
+        Q(**{f'{field}__in': raw_values}) | Q(pk__in=ids)
+    ).values_list('pk', field):
+        if str(pk) in raw_values:
+            result[str(pk)] = pk
+        if name in raw_values:
+            result[name] = pk
+    return result
+
+
+def _products_by_sku(skus: Iterable) -> Dict[str, int]:
+    skus = {str(sku).strip() for sku in skus if sku not in (None, '')}
+    return dict(Product.objects.filter(sku__in=skus).values_list('sku', 'id')) if skus else {}
+
+
+def _upsert(model, rows: List[Dict], unique_field: str) -> Tuple[int, int]:
+    """bulk_create(update_conflicts=True) per set of provided columns"""
+    keys = [row[unique_field] for row in rows]
+    existing = set(
+        model.objects.filter(**{f'{unique_field}__in': keys}).values_list(unique_field, flat=True)
+    )
+
+    # Rows only overwrite the columns they carry
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    for columns, group in groups.items():
+        update_fields = sorted(column for column in columns if column != unique_field)
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            update_fields.append('updated_at')
+        objects = [model(**row) for row in group]
+        if update_fields:
+            model.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=[unique_field],
+                update_fields=update_fields
+            )
+        else:
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+
+    created = len([key for key in keys if key not in existing])
+    return created, len(keys) - created
+
+
+def _match_and_write(model, rows: List[Dict], existing: Dict, key) -> Tuple[int, int]:
+    """bulk_update rows matching ``existing`` ({key: instance}), bulk_create the rest"""
+    to_create = []
+    to_update = OrderedDict()
+    for row in rows:
+        instance = existing.get(key(row))
+        if instance is None:
+            to_create.append(model(**row))
+            continue
+        for name, value in row.items():
+            setattr(instance, name, value)
+        to_update.setdefault(frozenset(row), []).append(instance)
+
+    model.objects.bulk_create(to_create, batch_size=500)
+    updated = 0
+    for columns, instances in to_update.items():
+        model.objects.bulk_update(instances, sorted(columns), batch_size=500)
+        updated += len(instances)
+    return len(to_create), updated
+
+
+class ProductImport(ImportKind):
+    model = Product
+    fields = [
+        'sku', 'name', 'description', 'rentable', 'tracking', 'default_rental_unit',
+        'min_rental_duration', 'max_rental_duration', 'quantity_on_hand', 'daily_rate',
+        'weight', 'dimensions', 'brand', 'model', 'year', 'condition_notes', 'is_active'
+    ]
+    relations = {'category': 'category_id'}
+    required = ['sku']
+
+    def resolve(self, records):
+        return {'category': _lookup(ProductCategory, (record.get('category') for record in records))}
+
+    def key(self, values):
+        return values['sku']
+
+    def write(self, rows):
+        missing_names = [row['sku'] for row in rows if 'name' not in row]
+        if missing_names:
+            # New products need a name; existing ones may be partially updated
+            known = set(Product.objects.filter(sku__in=missing_names).values_list('sku', flat=True))
+            unknown = [sku for sku in missing_names if sku not in known]
+            if unknown:
+                raise ImportRowError({'name': f"Required for new products: {', '.join(unknown[:5])}"})
+
+        # Counts for existing products are posted to the inventory ledger
+        # instead of overwriting the counter
+        from .inventory import COUNTERS, InventoryLedger
+        counted = {row['sku']: row['quantity_on_hand'] for row in rows if 'quantity_on_hand' in row}
+        existing = dict(
+            Product.objects.filter(sku__in=list(counted)).values_list('sku', 'id')
+        ) if counted else {}
+        rows = [
+            {
+                name: value for name, value in row.items()
+                if name != 'quantity_on_hand' or row['sku'] not in existing
+            }
+            for row in rows
+        ]
+
+        created, updated = _upsert(Product, rows, 'sku')
+        if existing:
+            InventoryLedger.set_on_hand(
+                {existing[sku]: counted[sku] for sku in existing}, note='Catalog import'
+            )
+        opened = [sku for sku in counted if sku not in existing]
+        if opened:
+            InventoryLedger.open_balances(
+                Product.objects.filter(sku__in=opened).only('id', *COUNTERS)
+            )
+        return created, updated
+
+    def after_chunk(self, rows):
+        from apps.pricing.tables import request_rebuild
+        from .search import ProductSearchIndex
+        product_ids = list(
+            Product.objects.filter(sku__in=[row['sku'] for row in rows]).values_list('id', flat=True)
+        )
+        ProductSearchIndex.index_products(product_ids)
+        # Category and active state decide a product's price tables
+        request_rebuild(product_ids=product_ids)
+
+    def finish(self):
+        from .tree import invalidate_category_tree
+        invalidate_category_tree()
+
+
+class ProductItemImport(ImportKind):
+    model = ProductItem
+    fields = [
+        'serial_number', 'internal_code', 'status', 'condition_rating', 'condition_notes',
+        'location', 'last_service_date', 'next_service_date'
+    ]
+    relations = {'product_sku': 'product_id'}
+    required = ['product_sku', 'serial_number']
+
+    def expand(self, record):
+        if record.get('serial_number') not in (None, '') or record.get('serial_start') in (None, ''):
+            return [record]
+        try:
+            start = int(record['serial_start'])
+            end = int(record.get('serial_end') or start)
+            width = int(record.get('serial_width') or 0)
+        except (TypeError, ValueError):
+            raise ImportRowError({'serial_start': 'serial_start, serial_end and serial_width must be integers'})
+        if end < start or end - start + 1 > MAX_SERIAL_RANGE:
+            raise ImportRowError({'serial_end': f"Range must be ascending and at most {MAX_SERIAL_RANGE} items"})
+
+        prefix = str(record.get('serial_prefix') or '')
+        base = {
+            column: value for column, value in record.items()
+            if column not in ('serial_prefix', 'serial_start', 'serial_end', 'serial_width')
+        }
+        return [
+            dict(base, serial_number=f"{prefix}{str(number).zfill(width)}")
+            for number in range(start, end + 1)
+        ]
+
+    def resolve(self, records):
+        return {'product_sku': _products_by_sku(record.get('product_sku') for record in records)}
+
+    def key(self, values):
+        return values['serial_number']
+
+    def write(self, rows):
+        return _upsert(ProductItem, rows, 'serial_number')
+
+
+class ProductImageImport(ImportKind):
+    model = ProductImage
+    fields = ['image', 'alt_text', 'is_primary', 'sort_order']
+    relations = {'product_sku': 'product_id'}
+    required = ['product_sku', 'image']
+
+    def resolve(self, records):
+        return {'product_sku': _products_by_sku(record.get('product_sku') for record in records)}
+
+    def key(self, values):
+        return values['product_id'], str(values['image'])
+
+    def write(self, rows):
+        existing = {
+            (image.product_id, image.image.name): image
+            for image in ProductImage.objects.filter(
+                product_id__in={row['product_id'] for row in rows},
+                image__in={str(row['image']) for row in rows}
+            )
+        }
+        return _match_and_write(ProductImage, rows, existing, self.key)
+
+
+class PriceRuleImport(ImportKind):
+    fields = [
+        'valid_from', 'valid_to', 'rate_hour', 'rate_day', 'rate_week', 'rate_month',
+        'discount_type', 'discount_value', 'min_duration_hours', 'min_quantity', 'is_active'
+    ]
+    relations = {
+        'price_list': 'price_list_id',
+        'product_sku': 'product_id',
+        'category': 'category_id',
+    }
+    required = ['price_list']
+
+    # Columns identifying a rule
+    KEY_FIELDS = [
+        'price_list_id', 'product_id', 'category_id', 'min_duration_hours',
+        'min_quantity', 'valid_from', 'valid_to'
+    ]
+
+    def __init__(self):
+        from apps.pricing.models import PriceList, PriceRule
+        self.model = PriceRule
+        self.price_list_model = PriceList
+        self.written = False
+        self.price_list_ids = set()
+
+    def resolve(self, records):
+        records = list(records)
+        return {
+            'price_list': _lookup(self.price_list_model, (record.get('price_list') for record in records)),
+            'product_sku': _products_by_sku(record.get('product_sku') for record in records),
+            'category': _lookup(ProductCategory, (record.get('category') for record in records)),
+        }
+
+    def clean(self, record, resolved):
+        values = super().clean(record, resolved)
+        if ('product_id' in values) == ('category_id' in values):
+            raise ImportRowError({'row': 'Give exactly one of product_sku or category'})
+        return values
+
+    def key(self, values):
+        defaults = {'min_duration_hours': 0, 'min_quantity': 1}
+        return tuple(values.get(name, defaults.get(name)) for name in self.KEY_FIELDS)
+
+    def write(self, rows):
+        scope = Q(product_id__in={row['product_id'] for row in rows if 'product_id' in row}) | \
+            Q(category_id__in={row['category_id'] for row in rows if 'category_id' in row})
+        existing = {
+            tuple(getattr(rule, name) for name in self.KEY_FIELDS): rule
+            for rule in self.model.objects.filter(
+                scope, price_list_id__in={row['price_list_id'] for row in rows}
+            )
+        }
+        self.written = True
+        self.price_list_ids.update(row['price_list_id'] for row in rows)
+        return _match_and_write(self.model, rows, existing, self.key)
+
+    def finish(self):
+        if self.written:
+            # bulk writes skip the pricing signals
+            from apps.pricing.index import invalidate_pricing_index
+            from apps.orders.repricing import request_repricing
+            from apps.pricing.tables import request_rebuild
+            from apps.pricing.versions import request_publish
+            invalidate_pricing_index()
+            request_publish(self.price_list_ids)
+            request_rebuild(price_list_ids=self.price_list_ids)
+            request_repricing(price_list_ids=self.price_list_ids)
+
+
+IMPORT_KINDS = {
+    'products': ProductImport,
+    'items': ProductItemImport,
+    'images': ProductImageImport,
+    'price_rules': PriceRuleImport,
+}
+
+
+class CatalogImporter:
+    """Run an import of one kind over a stream of records"""
+
+    def __init__(self, kind: str, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind '{kind}'. Choose from: {', '.join(IMPORT_KINDS)}")
+        self.kind = IMPORT_KINDS[kind]()
+        self.kind_name = kind
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.report = {
+            'kind': kind,
+            'dry_run': dry_run,
+            'rows': 0,
+            'created': 0,
+            'updated': 0,
+            'failed': 0,
+            'errors': [],
+            'errors_truncated': False,
+        }
+
+    def run(self, records: Iterable[Tuple[int, Dict]]) -> Dict:
+        """
+        Import ``records`` ((line, record) pairs, see iter_records).
+
+        Returns {'kind', 'dry_run', 'rows', 'created', 'updated', 'failed',
+        'errors': [{'line', 'errors'}], 'errors_truncated'}
+        """
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            self._process_chunk(chunk)
+        if not self.dry_run:
+            self.kind.finish()
+        return self.report
+
+    def _fail(self, line: int, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line, 'errors': errors})
+        else:
+            self.report['errors_truncated'] = True
+
+    def _process_chunk(self, chunk: List[Tuple[int, Dict]]):
+        expanded = []
+        for line, record in chunk:
+            self.report['rows'] += 1
+            if isinstance(record, ImportRowError):
+                self._fail(line, record.errors)
+                continue
+            try:
+                expanded.extend((line, item) for item in self.kind.expand(record))
+            except ImportRowError as e:
+                self._fail(line, e.errors)
+
+        resolved = self.kind.resolve(record for _, record in expanded)
+
+        # Later rows for the same key win, as if applied one after another
+        rows = OrderedDict()
+        for line, record in expanded:
+            try:
+                values = self.kind.clean(record, resolved)
+            except ImportRowError as e:
+                self._fail(line, e.errors)
+                continue
+            key = self.kind.key(values)
+            rows.pop(key, None)
+            rows[key] = (line, values)
+
+        if not rows or self.dry_run:
+            return
+
+        try:
+            with transaction.atomic():
+                created, updated = self.kind.write([values for _, values in rows.values()])
+        except (DatabaseError, ImportRowError, ValidationError) as e:
+            logger.warning(f"Import chunk failed, retrying row by row: {str(e)}")
+            created = updated = 0
+            for line, values in rows.values():
+                try:
+                    with transaction.atomic():
+                        row_created, row_updated = self.kind.write([values])
+                except ImportRowError as row_error:
+                    self._fail(line, row_error.errors)
+                    continue
+                except (DatabaseError, ValidationError) as row_error:
+                    self._fail(line, {'row': str(row_error)})
+                    continue
+                created += row_created
+                updated += row_updated
+
+        self.report['created'] += created
+        self.report['updated'] += updated
+        written = [values for _, values in rows.values()]
+        if written:
+            self.kind.after_chunk(written)
+
+
+def import_catalog(
+    stream,
+    kind: str,
+    file_format: str = 'csv',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False
+) -> Dict:
+    """Import a CSV/JSONL stream of ``kind`` records; see CatalogImporter.run() for the report"""
+    return CatalogImporter(kind, chunk_size, dry_run).run(iter_records(stream, file_format))
@@ -0,0 +1,480 @@
+"""
+Append-only inventory ledger behind the Product stock counters.
+
+Every change to ``quantity_on_hand``, ``quantity_reserved`` or
+``quantity_rented`` is written as an InventoryLedgerEntry and applied to the
+product row with ``UPDATE ... SET col = col + delta`` in the same
+transaction, so concurrent pickups and returns never overwrite each other
+and a counter always equals the sum of its entries.
+
+Reserved and rented units follow reservation state (RESERVED and ACTIVE
+reservations respectively); units on hand change with stock adjustments
+and with damage/loss StockMovements. Snapshots checkpoint the ledger so
+balances are summed from the latest snapshot onwards, and reconcile()
+rebuilds the counters from reservations and stock movements, reporting
+any drift it finds.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Exists, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.deliveries.models import StockMovement
+from apps.orders.models import Reservation, ReservationItem
+
+from .models import InventoryLedgerEntry, InventorySnapshot, Product
+
+logger = logging.getLogger(__name__)
+
+# Product counter -> ledger delta column
+COUNTERS = {
+    'quantity_on_hand': 'on_hand_delta',
+    'quantity_reserved': 'reserved_delta',
+    'quantity_rented': 'rented_delta',
+}
+
+# Which counter a reservation in a given status occupies
+STATUS_COUNTERS = {
+    Reservation.Status.RESERVED: 'quantity_reserved',
+    Reservation.Status.ACTIVE: 'quantity_rented',
+}
+
+# Entry kind for moving reservation units between counters
+RESERVATION_KINDS = {
+    (None, 'quantity_reserved'): InventoryLedgerEntry.Kind.RESERVE,
+    (None, 'quantity_rented'): InventoryLedgerEntry.Kind.PICKUP,
+    ('quantity_reserved', 'quantity_rented'): InventoryLedgerEntry.Kind.PICKUP,
+    ('quantity_reserved', None): InventoryLedgerEntry.Kind.RELEASE,
+    ('quantity_rented', None): InventoryLedgerEntry.Kind.RETURN,
+}
+
+# Stock movements that change the units on hand (written off or recovered)
+ON_HAND_MOVEMENTS = {
+    StockMovement.MovementType.DAMAGE: InventoryLedgerEntry.Kind.DAMAGE,
+    StockMovement.MovementType.LOSS: InventoryLedgerEntry.Kind.LOSS,
+}
+
+REFERENCE_RESERVATION = 'reservation'
+REFERENCE_STOCK_MOVEMENT = 'stock_movement'
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Superseded snapshots older than this are pruned
+SNAPSHOT_RETENTION = timedelta(days=90)
+
+
+class InventoryError(Exception):
+    """A ledger entry would take a stock counter below zero"""
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _zero() -> Dict[str, int]:
+    return dict.fromkeys(COUNTERS, 0)
+
+
+class InventoryLedger:
+    """Post ledger entries, snapshot balances and reconcile the counters"""
+
+    @staticmethod
+    def post(entries: Iterable[InventoryLedgerEntry]) -> List[InventoryLedgerEntry]:
+        """
+        Append unsaved entries and apply their deltas to the product counters
+        in one transaction. Products sharing the same net deltas are updated
+        together. Raises InventoryError (writing nothing) if a counter would
+        go below zero.
+        """
+        entries = [
+            entry for entry in entries
+            if entry.on_hand_delta or entry.reserved_delta or entry.rented_delta
+        ]
+        if not entries:
+            return []
+
+        totals = defaultdict(_zero)
+        for entry in entries:
+            for counter, delta_field in COUNTERS.items():
+                totals[entry.product_id][counter] += getattr(entry, delta_field)
+
+        by_deltas = defaultdict(list)
+        for product_id, deltas in totals.items():
+            key = tuple((counter, delta) for counter, delta in deltas.items() if delta)
+            if key:
+                by_deltas[key].append(product_id)
+
+        try:
+            with transaction.atomic():
+                # Counters first: the row locks taken here serialize writers
+                # and keep snapshots from missing uncommitted entries
+                for key, product_ids in sorted(by_deltas.items()):
+                    Product.objects.filter(pk__in=sorted(product_ids)).update(
+                        **{counter: F(counter) + delta for counter, delta in key}
+                    )
+                InventoryLedgerEntry.objects.bulk_create(entries, batch_size=500)
+        except IntegrityError as e:
+            raise InventoryError(f"Stock counters cannot go below zero: {str(e)}")
+        return entries
+
+    @staticmethod
+    def record(
+        product_id,
+        kind: str,
+        on_hand: int = 0,
+        reserved: int = 0,
+        rented: int = 0,
+        reference_type: str = '',
+        reference_id: str = '',
+        note: str = '',
+        user=None
+    ) -> Optional[InventoryLedgerEntry]:
+        """Post a single entry; returns None when every delta is zero"""
+        entries = InventoryLedger.post([
+            InventoryLedgerEntry(
+                product_id=product_id,
+                kind=kind,
+                on_hand_delta=on_hand,
+                reserved_delta=reserved,
+                rented_delta=rented,
+                reference_type=reference_type,
+                reference_id=str(reference_id or ''),
+                note=note,
+                created_by=user
+            )
+        ])
+        return entries[0] if entries else None
+
+    @staticmethod
+    def open_balances(products: Iterable[Product]):
+        """
+        Opening entries for products whose counters were written directly
+        (new rows); the counters themselves are left alone.
+        """
+        InventoryLedgerEntry.objects.bulk_create(
+            [
+                InventoryLedgerEntry(
+                    product_id=product.pk,
+                    kind=InventoryLedgerEntry.Kind.OPENING,
+                    **{delta_field: getattr(product, counter) for counter, delta_field in COUNTERS.items()}
+                )
+                for product in products
+                if any(getattr(product, counter) for counter in COUNTERS)
+            ],
+            batch_size=500
+        )
+
+    @staticmethod
+    def set_on_hand(targets: Dict, note: str = '', user=None) -> List[InventoryLedgerEntry]:
+        """Adjust units on hand to absolute counts, ``{product_id: quantity}``, e.g. after a stock take"""
+        with transaction.atomic():
+            current = dict(
+                Product.objects.select_for_update().filter(
+                    pk__in=list(targets)
+                ).order_by('pk').values_list('pk', 'quantity_on_hand')
+            )
+            return InventoryLedger.post([
+                InventoryLedgerEntry(
+                    product_id=product_id,
+                    kind=InventoryLedgerEntry.Kind.ADJUSTMENT,
+                    on_hand_delta=int(quantity) - current[product_id],
+                    note=note,
+                    created_by=user
+                )
+                for product_id, quantity in targets.items()
+                if product_id in current
+            ])
+
+    @staticmethod
+    def counter_for_status(status: Optional[str]) -> Optional[str]:
+        return STATUS_COUNTERS.get(status)
+
+    @staticmethod
+    def reservation_entries(
+        items: Iterable[ReservationItem],
+        previous_status: Optional[str],
+        new_status: Optional[str]
+    ) -> List[InventoryLedgerEntry]:
+        """Unsaved entries moving reservation items from one status' counter to another's"""
+        old_counter = InventoryLedger.counter_for_status(previous_status)
+        new_counter = InventoryLedger.counter_for_status(new_status)
+        if old_counter == new_counter:
+            return []
+
+        kind = RESERVATION_KINDS.get((old_counter, new_counter), InventoryLedgerEntry.Kind.ADJUSTMENT)
+        entries = []
+        for item in items:
+            deltas = {}
+            if old_counter:
+                deltas[COUNTERS[old_counter]] = -item.quantity
+            if new_counter:
+                deltas[COUNTERS[new_counter]] = item.quantity
+            entries.append(InventoryLedgerEntry(
+                product_id=item.product_id,
+                kind=kind,
+                reference_type=REFERENCE_RESERVATION,
+                reference_id=str(item.reservation_id),
+                **deltas
+            ))
+        return entries
+
+    @staticmethod
+    def move_items(
+        items: Iterable[ReservationItem],
+        previous_status: Optional[str],
+        new_status: Optional[str]
+    ) -> List[InventoryLedgerEntry]:
+        return InventoryLedger.post(
+            InventoryLedger.reservation_entries(items, previous_status, new_status)
+        )
+
+    @staticmethod
+    def move_reservation(
+        reservation: Reservation,
+        previous_status: Optional[str],
+        new_status: Optional[str]
+    ) -> List[InventoryLedgerEntry]:
+        """Move a reservation's units between counters after a status change"""
+        if InventoryLedger.counter_for_status(previous_status) == InventoryLedger.counter_for_status(new_status):
+            return []
+        return InventoryLedger.move_items(list(reservation.items.all()), previous_status, new_status)
+
+    @staticmethod
+    def movement_entry(movement: StockMovement) -> Optional[InventoryLedgerEntry]:
+        """Unsaved entry for a stock movement that changes the units on hand"""
+        kind = ON_HAND_MOVEMENTS.get(movement.movement_type)
+        if kind is None or not movement.quantity:
+            return None
+        return InventoryLedgerEntry(
+            product_id=movement.product_id,
+            kind=kind,
+            on_hand_delta=movement.quantity,
+            reference_type=REFERENCE_STOCK_MOVEMENT,
+            reference_id=str(movement.pk),
+            note=movement.reason,
+            created_by_id=movement.handled_by_id
+        )
+
+    @staticmethod
+    def record_stock_movement(movement: StockMovement) -> List[InventoryLedgerEntry]:
+        entry = InventoryLedger.movement_entry(movement)
+        return InventoryLedger.post([entry]) if entry else []
+
+    @staticmethod
+    def _latest_snapshots(product_ids: List) -> Dict:
+        latest = InventorySnapshot.objects.filter(
+            product_id=OuterRef('product_id')
+        ).order_by('-id').values('id')[:1]
+        return {
+            snapshot.product_id: snapshot
+            for snapshot in InventorySnapshot.objects.filter(
+                product_id__in=product_ids, id=Subquery(latest)
+            )
+        }
+
+    @staticmethod
+    def balances(product_ids: Iterable) -> Dict:
+        """
+        Ledger balance per product, ``{product_id: {counter: int}}``: the
+        latest snapshot plus every later entry, summed in one query.
+        """
+        product_ids = list(product_ids)
+        balances = defaultdict(_zero)
+        for product_id, snapshot in InventoryLedger._latest_snapshots(product_ids).items():
+            for counter in COUNTERS:
+                balances[product_id][counter] = getattr(snapshot, counter)
+
+        floor = InventorySnapshot.objects.filter(
+            product_id=OuterRef('product_id')
+        ).order_by('-id').values('last_entry_id')[:1]
+        rows = InventoryLedgerEntry.objects.filter(product_id__in=product_ids).annotate(
+            snapshot_floor=Coalesce(Subquery(floor, output_field=BigIntegerField()), 0)
+        ).filter(id__gt=F('snapshot_floor')).values('product_id').annotate(
+            **{counter: Sum(delta_field) for counter, delta_field in COUNTERS.items()}
+        )
+        for row in rows:
+            for counter in COUNTERS:
+                balances[row['product_id']][counter] += row[counter] or 0
+        return balances
+
+    @staticmethod
+    def reservation_totals(product_ids: Iterable) -> Dict:
+        """Units held per product by RESERVED and ACTIVE reservations"""
+        totals = defaultdict(_zero)
+        rows = ReservationItem.objects.filter(
+            product_id__in=list(product_ids),
+            reservation__status__in=list(STATUS_COUNTERS)
+        ).values('product_id', 'reservation__status').annotate(total=Sum('quantity'))
+        for row in rows:
+            totals[row['product_id']][STATUS_COUNTERS[row['reservation__status']]] += row['total'] or 0
+        return totals
+
+    @staticmethod
+    def unposted_movements(product_ids: Iterable) -> List[InventoryLedgerEntry]:
+        """Entries for damage/loss movements that never reached the ledger"""
+        product_ids = list(product_ids)
+        posted = set(
+            InventoryLedgerEntry.objects.filter(
+                product_id__in=product_ids,
+                reference_type=REFERENCE_STOCK_MOVEMENT
+            ).values_list('reference_id', flat=True)
+        )
+        movements = StockMovement.objects.filter(
+            product_id__in=product_ids,
+            movement_type__in=list(ON_HAND_MOVEMENTS)
+        ).only('id', 'product_id', 'movement_type', 'quantity', 'reason', 'handled_by_id')
+        entries = []
+        for movement in movements.iterator(chunk_size=2000):
+            if str(movement.pk) in posted:
+                continue
+            entry = InventoryLedger.movement_entry(movement)
+            if entry:
+                entries.append(entry)
+        return entries
+
+    @staticmethod
+    def take_snapshots(product_ids: Optional[Iterable] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """
+        Snapshot the ledger balance of every product with entries since its
+        last snapshot, then prune superseded snapshots past retention.
+        Product rows are locked per chunk so no in-flight entry is skipped.
+
+        Returns the number of snapshots taken.
+        """
+        queryset = Product.objects.order_by('pk')
+        if product_ids is not None:
+            queryset = queryset.filter(pk__in=list(product_ids))
+
+        taken = 0
+        for chunk in _chunks(queryset.values_list('pk', flat=True).iterator(), chunk_size):
+            with transaction.atomic():
+                list(Product.objects.select_for_update().filter(pk__in=chunk).order_by('pk').values_list('pk', flat=True))
+                last_entries = dict(
+                    InventoryLedgerEntry.objects.filter(product_id__in=chunk).values(
+                        'product_id'
+                    ).annotate(last=Max('id')).values_list('product_id', 'last')
+                )
+                latest = InventoryLedger._latest_snapshots(chunk)
+                stale = [
+                    product_id for product_id, last in last_entries.items()
+                    if product_id not in latest or last > latest[product_id].last_entry_id
+                ]
+                if not stale:
+                    continue
+                balances = InventoryLedger.balances(stale)
+                InventorySnapshot.objects.bulk_create(
+                    [
+                        InventorySnapshot(
+                            product_id=product_id,
+                            last_entry_id=last_entries[product_id],
+                            **balances[product_id]
+                        )
+                        for product_id in stale
+                    ],
+                    batch_size=500
+                )
+                taken += len(stale)
+
+        InventorySnapshot.objects.filter(
+            taken_at__lt=timezone.now() - SNAPSHOT_RETENTION
+        ).filter(
+            Exists(InventorySnapshot.objects.filter(product_id=OuterRef('product_id'), id__gt=OuterRef('id')))
+        ).delete()
+        return taken
+
+    @staticmethod
+    def reconcile(
+        product_ids: Optional[Iterable] = None,
+        fix: bool = True,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Dict:
+        """
+        Rebuild the stock counters and report drift.
+
+        Expected values are: units held by RESERVED/ACTIVE reservations for
+        the reserved/rented counters, and the ledger balance (including any
+        damage/loss StockMovement not yet posted) for units on hand. With
+        ``fix`` the missing movements and a RECONCILIATION entry are posted
+        so the ledger matches the expected values, and drifted counters are
+        overwritten. Product rows are locked per chunk.
+
+        Returns {
+            'products': int,
+            'drifted': int,
+            'movements_posted': int,
+            'fixed': bool,
+            'drift': [{'product_id', 'sku', 'counters': {...}, 'expected': {...}}]
+        }
+        """
+        queryset = Product.objects.order_by('pk')
+        if product_ids is not None:
+            queryset = queryset.filter(pk__in=list(product_ids))
+
+        report = {'products': 0, 'drifted': 0, 'movements_posted': 0, 'fixed': fix, 'drift': []}
+        for chunk in _chunks(queryset.values_list('pk', flat=True).iterator(), chunk_size):
+            with transaction.atomic():
+                # Lock before reading anything else, so a pickup or return
+                # committing meanwhile is not overwritten with stale values
+                rows = list(Product.objects.select_for_update().filter(
+                    pk__in=chunk
+                ).order_by('pk').values_list('pk', 'sku', *COUNTERS))
+
+                movements = InventoryLedger.unposted_movements(chunk)
+                balances = InventoryLedger.balances(chunk)
+                for entry in movements:
+                    balances[entry.product_id]['quantity_on_hand'] += entry.on_hand_delta
+                held = InventoryLedger.reservation_totals(chunk)
+
+                corrections = []
+                for product_id, sku, *values in rows:
+                    report['products'] += 1
+                    counters = dict(zip(COUNTERS, values))
+                    ledger = balances[product_id]
+                    expected = {
+                        'quantity_on_hand': max(ledger['quantity_on_hand'], 0),
+                        'quantity_reserved': held[product_id]['quantity_reserved'],
+                        'quantity_rented': held[product_id]['quantity_rented'],
+                    }
+                    if counters != expected:
+                        report['drifted'] += 1
+                        report['drift'].append({
+                            'product_id': product_id,
+                            'sku': sku,
+                            'counters': counters,
+                            'expected': expected
+                        })
+                    if not fix:
+                        continue
+
+                    correction = InventoryLedgerEntry(
+                        product_id=product_id,
+                        kind=InventoryLedgerEntry.Kind.RECONCILIATION,
+                        note='Counters rebuilt from reservations and stock movements',
+                        **{COUNTERS[counter]: expected[counter] - ledger[counter] for counter in COUNTERS}
+                    )
+                    if correction.on_hand_delta or correction.reserved_delta or correction.rented_delta:
+                        corrections.append(correction)
+                    if counters != expected:
+                        Product.objects.filter(pk=product_id).update(**expected)
+
+                if fix:
+                    InventoryLedgerEntry.objects.bulk_create(movements + corrections, batch_size=500)
+                    report['movements_posted'] += len(movements)
+
+        if report['drifted']:
+            logger.warning(
+                f"Inventory reconciliation found drift on {report['drifted']} of {report['products']} products"
+                + (' (fixed)' if fix else '')
+            )
+        return report
@@ -0,0 +1,73 @@
+"""
+Management command to bulk import catalog data from CSV or JSON Lines.
+Usage: python manage.py import_catalog products supplier.csv [--format jsonl] [--chunk-size 1000] [--dry-run]
+Kinds: products, items, images, price_rules (see apps.catalog.importer).
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.importer import DEFAULT_CHUNK_SIZE, IMPORT_KINDS, import_catalog
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products, serial items, image metadata or price rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORT_KINDS))
+        parser.add_argument('path', help='CSV or JSONL file')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows validated and written together (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate only, write nothing'
+        )
+        parser.add_argument(
+            '--errors',
+            type=str,
+            help='Write the per-row errors to this JSON file'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        try:
+            stream = open(path, 'rb')
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        self.stdout.write(f"Importing {options['kind']} from {path}...")
+        with stream:
+            report = import_catalog(
+                stream,
+                options['kind'],
+                file_format=file_format,
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run']
+            )
+
+        for error in report['errors'][:20]:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['errors']}"))
+        if options['errors']:
+            with open(options['errors'], 'w') as errors_file:
+                json.dump(report['errors'], errors_file, indent=2, default=str)
+
+        summary = (
+            f"{report['rows']} rows: {report['created']} created, "
+            f"{report['updated']} updated, {report['failed']} failed"
+        )
+        if report['dry_run']:
+            summary += ' (dry run, nothing written)'
+        self.stdout.write(self.style.SUCCESS(summary) if not report['failed'] else self.style.WARNING(summary))
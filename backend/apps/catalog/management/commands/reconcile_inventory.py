@@ -0,0 +1,58 @@
+"""
+Management command to rebuild product stock counters from reservations and stock movements.
+Usage: python manage.py reconcile_inventory [--product 12 --product 15] [--dry-run] [--snapshot]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.catalog.inventory import InventoryLedger
+
+
+class Command(BaseCommand):
+    help = 'Reconcile product stock counters with the inventory ledger and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='products',
+            help='Only reconcile this product (may be given several times)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without changing anything'
+        )
+        parser.add_argument(
+            '--snapshot',
+            action='store_true',
+            help='Snapshot the ledger balances afterwards'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling inventory counters...")
+
+        report = InventoryLedger.reconcile(
+            product_ids=options['products'],
+            fix=not options['dry_run']
+        )
+
+        for drift in report['drift']:
+            changes = ', '.join(
+                f"{counter} {drift['counters'][counter]} -> {expected}"
+                for counter, expected in drift['expected'].items()
+                if drift['counters'][counter] != expected
+            )
+            self.stdout.write(self.style.WARNING(f"{drift['sku']}: {changes}"))
+
+        summary = (
+            f"{report['products']} products checked, {report['drifted']} drifted, "
+            f"{report['movements_posted']} stock movements posted"
+        )
+        if options['dry_run']:
+            summary += ' (dry run, nothing written)'
+        self.stdout.write(self.style.SUCCESS(summary))
+
+        if options['snapshot'] and not options['dry_run']:
+            taken = InventoryLedger.take_snapshots(product_ids=options['products'])
+            self.stdout.write(self.style.SUCCESS(f"Took {taken} inventory snapshots"))
@@ -0,0 +1,36 @@
+"""
+Management command to rebuild the product search documents.
+Usage: python manage.py reindex_products [--product 12 --product 15] [--batch-size 1000]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.catalog.search import ProductSearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild product search documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='products',
+            help='Only reindex this product (may be given several times)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Documents written per upsert (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding product search documents...")
+
+        written = ProductSearchIndex.index_products(
+            product_ids=options['products'],
+            batch_size=options['batch_size']
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} products"))
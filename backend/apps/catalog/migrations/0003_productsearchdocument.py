@@ -0,0 +1,168 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+import logging
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+# Frozen copies of apps.catalog.search as of this migration
+
+POSTGRES_SETUP = [
+    """
+    ALTER TABLE product_search_documents ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX product_search_vector_idx ON product_search_documents USING GIN (search_vector)",
+]
+POSTGRES_TRIGRAM_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX product_search_title_trgm_idx ON product_search_documents USING GIN (title gin_trgm_ops)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS product_search_title_trgm_idx",
+    "DROP INDEX IF EXISTS product_search_vector_idx",
+    "ALTER TABLE product_search_documents DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE product_search_fts USING fts5(
+        title, body,
+        content='product_search_documents', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER product_search_fts_ai AFTER INSERT ON product_search_documents BEGIN
+        INSERT INTO product_search_fts(rowid, title, body)
+        VALUES (new.product_id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_fts_ad AFTER DELETE ON product_search_documents BEGIN
+        INSERT INTO product_search_fts(product_search_fts, rowid, title, body)
+        VALUES ('delete', old.product_id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_fts_au AFTER UPDATE ON product_search_documents BEGIN
+        INSERT INTO product_search_fts(product_search_fts, rowid, title, body)
+        VALUES ('delete', old.product_id, old.title, old.body);
+        INSERT INTO product_search_fts(rowid, title, body)
+        VALUES (new.product_id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS product_search_fts_au",
+    "DROP TRIGGER IF EXISTS product_search_fts_ad",
+    "DROP TRIGGER IF EXISTS product_search_fts_ai",
+    "DROP TABLE IF EXISTS product_search_fts",
+]
+
+
+def build_document(name, sku, brand, model, description, category_path):
+    title = ' '.join(part for part in (name, sku, brand, model) if part)
+    body = ' '.join(part for part in (category_path, description) if part)
+    return title, body
+
+
+def category_paths(categories):
+    """{id: "Parent > Child"} from (id, name, parent_id) rows"""
+    rows = {pk: (name, parent_id) for pk, name, parent_id in categories}
+    paths = {}
+
+    def path(pk, seen=()):
+        if pk in paths:
+            return paths[pk]
+        name, parent_id = rows[pk]
+        if parent_id in rows and parent_id not in seen:
+            result = f"{path(parent_id, seen + (pk,))} > {name}"
+        else:
+            result = name
+        paths[pk] = result
+        return result
+
+    for pk in rows:
+        path(pk)
+    return paths
+
+
+def create_search_structures(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for statement in POSTGRES_SETUP:
+            schema_editor.execute(statement)
+        # Creating the extension needs privileges some deployments lack
+        try:
+            with transaction.atomic(using=connection.alias):
+                for statement in POSTGRES_TRIGRAM_SETUP:
+                    schema_editor.execute(statement)
+        except DatabaseError as e:
+            logger.warning(f"pg_trgm unavailable, fuzzy product search disabled: {str(e)}")
+    elif connection.vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=connection.alias):
+                for statement in SQLITE_SETUP:
+                    schema_editor.execute(statement)
+        except DatabaseError as e:
+            logger.warning(f"SQLite FTS5 unavailable, product search falls back to LIKE: {str(e)}")
+
+
+def drop_search_structures(apps, schema_editor):
+    statements = {
+        'postgresql': POSTGRES_TEARDOWN, 'sqlite': SQLITE_TEARDOWN
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def populate_documents(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductCategory = apps.get_model('catalog', 'ProductCategory')
+    ProductSearchDocument = apps.get_model('catalog', 'ProductSearchDocument')
+
+    paths = category_paths(ProductCategory.objects.values_list('id', 'name', 'parent_id'))
+    batch = []
+    for product in Product.objects.order_by('id').iterator(chunk_size=1000):
+        title, body = build_document(
+            product.name, product.sku, product.brand, product.model,
+            product.description, paths.get(product.category_id, '')
+        )
+        batch.append(ProductSearchDocument(product_id=product.id, title=title, body=body))
+        if len(batch) >= 1000:
+            ProductSearchDocument.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProductSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_product_daily_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='catalog.product')),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Product Search Document',
+                'verbose_name_plural': 'Product Search Documents',
+                'db_table': 'product_search_documents',
+            },
+        ),
+        migrations.RunPython(create_search_structures, drop_search_structures),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+def build_category_paths(parents):
+    """
+    {id: (path, depth)} from {id: parent_id}; a frozen copy of
+    apps.catalog.models.build_category_paths as of this migration.
+    """
+    result = {}
+
+    def resolve(pk, seen):
+        if pk in result:
+            return result[pk]
+        parent_id = parents[pk]
+        if parent_id in parents and parent_id not in seen:
+            parent_path, parent_depth = resolve(parent_id, seen | {pk})
+            result[pk] = (f"{parent_path}{pk}/", parent_depth + 1)
+        else:
+            result[pk] = (f"{pk}/", 0)
+        return result[pk]
+
+    for pk in parents:
+        resolve(pk, frozenset())
+    return result
+
+
+def populate_paths(apps, schema_editor):
+    ProductCategory = apps.get_model('catalog', 'ProductCategory')
+
+    parents = dict(ProductCategory.objects.values_list('id', 'parent_id'))
+    categories = [
+        ProductCategory(pk=pk, path=path, depth=depth)
+        for pk, (path, depth) in build_category_paths(parents).items()
+    ]
+    ProductCategory.objects.bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcategory',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='productcategory',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def open_balances(apps, schema_editor):
+    """
+    Open the ledger the way InventoryLedger.reconcile rebuilds it: units
+    reserved and rented come from RESERVED and ACTIVE reservations (the
+    counters were never kept in step before the ledger), units on hand from
+    the counter plus any damage/loss movement. Counters are set to match.
+    """
+    Product = apps.get_model('catalog', 'Product')
+    InventoryLedgerEntry = apps.get_model('catalog', 'InventoryLedgerEntry')
+    ReservationItem = apps.get_model('orders', 'ReservationItem')
+    StockMovement = apps.get_model('deliveries', 'StockMovement')
+
+    held = defaultdict(lambda: {'RESERVED': 0, 'ACTIVE': 0})
+    for product_id, status, total in ReservationItem.objects.filter(
+        reservation__status__in=['RESERVED', 'ACTIVE']
+    ).values('product_id', 'reservation__status').annotate(
+        total=Sum('quantity')
+    ).values_list('product_id', 'reservation__status', 'total'):
+        held[product_id][status] += total or 0
+
+    movements = defaultdict(list)
+    for movement in StockMovement.objects.filter(
+        movement_type__in=['DAMAGE', 'LOSS']
+    ).exclude(quantity=0).only(
+        'id', 'product_id', 'movement_type', 'quantity', 'reason', 'handled_by_id'
+    ).iterator(chunk_size=2000):
+        movements[movement.product_id].append(movement)
+
+    entries = []
+    drifted = []
+    for product_id, on_hand, reserved, rented in Product.objects.values_list(
+        'id', 'quantity_on_hand', 'quantity_reserved', 'quantity_rented'
+    ).iterator(chunk_size=2000):
+        expected_reserved = held[product_id]['RESERVED']
+        expected_rented = held[product_id]['ACTIVE']
+        if on_hand or expected_reserved or expected_rented:
+            entries.append(InventoryLedgerEntry(
+                product_id=product_id,
+                kind='OPENING',
+                on_hand_delta=on_hand,
+                reserved_delta=expected_reserved,
+                rented_delta=expected_rented
+            ))
+
+        ledger_on_hand = on_hand
+        for movement in movements.get(product_id, []):
+            ledger_on_hand += movement.quantity
+            entries.append(InventoryLedgerEntry(
+                product_id=product_id,
+                kind=movement.movement_type,
+                on_hand_delta=movement.quantity,
+                reference_type='stock_movement',
+                reference_id=str(movement.pk),
+                note=movement.reason,
+                created_by_id=movement.handled_by_id
+            ))
+        expected_on_hand = max(ledger_on_hand, 0)
+        if expected_on_hand != ledger_on_hand:
+            entries.append(InventoryLedgerEntry(
+                product_id=product_id,
+                kind='RECONCILIATION',
+                on_hand_delta=expected_on_hand - ledger_on_hand,
+                note='Counters rebuilt from reservations and stock movements'
+            ))
+
+        if (on_hand, reserved, rented) != (expected_on_hand, expected_reserved, expected_rented):
+            drifted.append(Product(
+                pk=product_id,
+                quantity_on_hand=expected_on_hand,
+                quantity_reserved=expected_reserved,
+                quantity_rented=expected_rented
+            ))
+
+        if len(entries) >= 1000:
+            InventoryLedgerEntry.objects.bulk_create(entries)
+            entries = []
+    InventoryLedgerEntry.objects.bulk_create(entries)
+    Product.objects.bulk_update(
+        drifted, ['quantity_on_hand', 'quantity_reserved', 'quantity_rented'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_productcategory_path'),
+        ('orders', '0001_initial'),
+        ('deliveries', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('OPENING', 'Opening Balance'), ('ADJUSTMENT', 'Stock Adjustment'), ('RESERVE', 'Reserved'), ('RELEASE', 'Reservation Released'), ('PICKUP', 'Picked Up'), ('RETURN', 'Returned'), ('DAMAGE', 'Damage Write-off'), ('LOSS', 'Loss Write-off'), ('RECONCILIATION', 'Reconciliation')], max_length=20)),
+                ('on_hand_delta', models.IntegerField(default=0)),
+                ('reserved_delta', models.IntegerField(default=0)),
+                ('rented_delta', models.IntegerField(default=0)),
+                ('reference_type', models.CharField(blank=True, max_length=32)),
+                ('reference_id', models.CharField(blank=True, max_length=64)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='catalog.product')),
+            ],
+            options={
+                'verbose_name': 'Inventory Ledger Entry',
+                'verbose_name_plural': 'Inventory Ledger Entries',
+                'db_table': 'inventory_ledger_entries',
+                'ordering': ['-id'],
+                'indexes': [
+                    models.Index(fields=['product', 'id'], name='inv_ledger_product_idx'),
+                    models.Index(fields=['reference_type', 'reference_id'], name='inv_ledger_reference_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('quantity_on_hand', models.IntegerField()),
+                ('quantity_reserved', models.IntegerField()),
+                ('quantity_rented', models.IntegerField()),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='catalog.product')),
+            ],
+            options={
+                'verbose_name': 'Inventory Snapshot',
+                'verbose_name_plural': 'Inventory Snapshots',
+                'db_table': 'inventory_snapshots',
+                'ordering': ['-id'],
+                'indexes': [
+                    models.Index(fields=['product', 'id'], name='inv_snapshot_product_idx'),
+                    models.Index(fields=['taken_at'], name='inv_snapshot_taken_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
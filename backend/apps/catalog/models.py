@@ -1,9 +1,18 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.auth import get_user_model
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 import uuid
 
+User = get_user_model()
+
 
 class ProductCategory(models.Model):
     """Product categories for organizing rental items"""
+
+    # Separator of the materialized path, e.g. "3/17/42/"
+    PATH_SEPARATOR = '/'
+
     name = models.CharField(max_length=120, unique=True)
     description = models.TextField(blank=True)
     parent = models.ForeignKey(
@@ -13,6 +22,10 @@ class ProductCategory(models.Model):
         on_delete=models.SET_NULL, 
         related_name='children'
     )
+    # Materialized path of ancestor ids ending with this node's id; a
+    # subtree is every row whose path starts with the root's path
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -27,12 +40,97 @@ class ProductCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Save and keep the materialized path of this node and its subtree current"""
+        if self.pk and self.parent_id is not None:
+            parent_path = ProductCategory.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+            if parent_path and f"{self.PATH_SEPARATOR}{self.pk}{self.PATH_SEPARATOR}" in f"{self.PATH_SEPARATOR}{parent_path}":
+                raise ValueError('A category cannot be moved below itself')
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_path()
+
+    def _update_path(self):
+        # The in-memory path is stale if an ancestor moved since this row was loaded
+        old_path, old_depth = ProductCategory.objects.filter(pk=self.pk).values_list('path', 'depth').get()
+        if self.parent_id is not None:
+            parent_path, parent_depth = ProductCategory.objects.filter(
+                pk=self.parent_id
+            ).values_list('path', 'depth').get()
+            new_path, new_depth = f"{parent_path}{self.pk}{self.PATH_SEPARATOR}", parent_depth + 1
+        else:
+            new_path, new_depth = f"{self.pk}{self.PATH_SEPARATOR}", 0
+
+        self.path, self.depth = new_path, new_depth
+        if (new_path, new_depth) == (old_path, old_depth):
+            return
+
+        ProductCategory.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            # Move the whole subtree in one statement
+            ProductCategory.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth)
+            )
+
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every path from the parent links (after bulk changes or deletes)"""
+        rows = list(cls.objects.values_list('id', 'parent_id', 'path', 'depth'))
+        paths = build_category_paths({pk: parent_id for pk, parent_id, _, _ in rows})
+        current = {pk: (path, depth) for pk, _, path, depth in rows}
+        changed = [
+            cls(pk=pk, path=path, depth=depth)
+            for pk, (path, depth) in paths.items()
+            if current.get(pk) != (path, depth)
+        ]
+        cls.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        return len(changed)
+
+    @property
+    def ancestor_ids(self):
+        return [int(part) for part in self.path.split(self.PATH_SEPARATOR) if part][:-1]
+
+    def get_descendants(self, include_self=False):
+        """The subtree below this node, in one query"""
+        queryset = ProductCategory.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
     @property
     def full_path(self):
         """Return full category path"""
-        if self.parent:
-            return f"{self.parent.full_path} > {self.name}"
-        return self.name
+        from .tree import category_full_paths
+        path = category_full_paths().get(self.pk)
+        if path is not None:
+            return path
+        names = dict(ProductCategory.objects.filter(pk__in=self.ancestor_ids).values_list('id', 'name'))
+        return ' > '.join([names[pk] for pk in self.ancestor_ids if pk in names] + [self.name])
+
+
+def build_category_paths(parents):
+    """
+    {id: (path, depth)} from {id: parent_id}. Nodes caught in a parent
+    cycle are treated as roots.
+    """
+    result = {}
+
+    def resolve(pk, seen):
+        if pk in result:
+            return result[pk]
+        parent_id = parents[pk]
+        if parent_id in parents and parent_id not in seen:
+            parent_path, parent_depth = resolve(parent_id, seen | {pk})
+            result[pk] = (f"{parent_path}{pk}{ProductCategory.PATH_SEPARATOR}", parent_depth + 1)
+        else:
+            result[pk] = (f"{pk}{ProductCategory.PATH_SEPARATOR}", 0)
+        return result[pk]
+
+    for pk in parents:
+        resolve(pk, frozenset())
+    return result
 
 
 class Product(models.Model):
@@ -82,7 +180,9 @@ class Product(models.Model):
         help_text="Maximum rental duration in the default unit"
     )
     
-    # Stock Information
+    # Stock Information (maintained through apps.catalog.inventory)
+    LEDGER_COUNTERS = ('quantity_on_hand', 'quantity_reserved', 'quantity_rented')
+
     quantity_on_hand = models.PositiveIntegerField(default=0)
     quantity_reserved = models.PositiveIntegerField(default=0)
     quantity_rented = models.PositiveIntegerField(default=0)
@@ -120,11 +220,52 @@ class Product(models.Model):
             models.Index(fields=['sku']),
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['rentable', 'is_active']),
+            # Keyset pagination orders (see utils.pagination)
+            models.Index(fields=['name', 'id'], name='products_name_keyset_idx'),
+            models.Index(fields=['created_at', 'id'], name='products_created_keyset_idx'),
         ]
 
     def __str__(self):
         return f"{self.sku} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_quantity_on_hand = instance.__dict__.get('quantity_on_hand')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Stock counters are owned by the inventory ledger (apps.catalog.inventory)
+        and never go out in a plain UPDATE: reserved/rented follow reservations,
+        and a changed quantity_on_hand is posted as a ledger adjustment to the
+        new count so concurrent changes are not overwritten.
+        """
+        from .inventory import InventoryLedger
+
+        if self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                InventoryLedger.open_balances([self])
+            return
+
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        update_fields = list(update_fields)
+        adjust_on_hand = (
+            'quantity_on_hand' in update_fields
+            and self.quantity_on_hand != getattr(self, '_loaded_quantity_on_hand', None)
+        )
+        update_fields = [name for name in update_fields if name not in self.LEDGER_COUNTERS]
+
+        with transaction.atomic():
+            super().save(*args, update_fields=update_fields, **kwargs)
+            if adjust_on_hand:
+                InventoryLedger.set_on_hand({self.pk: self.quantity_on_hand})
+                self.refresh_from_db(fields=list(self.LEDGER_COUNTERS))
+                self._loaded_quantity_on_hand = self.quantity_on_hand
+
     @property
     def available_quantity(self):
         """Calculate available quantity for rental"""
@@ -208,3 +349,116 @@ class ProductItem(models.Model):
     def is_available_for_rental(self):
         """Check if this specific item is available for rental"""
         return self.status == self.Status.AVAILABLE and self.condition_rating >= 6
+
+
+class ProductSearchDocument(models.Model):
+    """
+    Denormalized search text per product. The database keeps its own
+    full-text structures on top of this table (a weighted tsvector with
+    GIN and trigram indexes on PostgreSQL, an FTS5 table on SQLite); see
+    apps.catalog.search.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    title = models.TextField()  # Name, SKU, brand and model: weighted highest, used for autocomplete
+    body = models.TextField(blank=True)  # Category path and description
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_search_documents'
+        verbose_name = 'Product Search Document'
+        verbose_name_plural = 'Product Search Documents'
+
+    def __str__(self):
+        return f"Search document for {self.product_id}"
+
+
+class InventoryLedgerEntry(models.Model):
+    """
+    Append-only record of a change to a product's stock counters. The
+    counters on Product always equal the sum of its entries; see
+    apps.catalog.inventory.
+    """
+
+    class Kind(models.TextChoices):
+        OPENING = "OPENING", "Opening Balance"
+        ADJUSTMENT = "ADJUSTMENT", "Stock Adjustment"
+        RESERVE = "RESERVE", "Reserved"
+        RELEASE = "RELEASE", "Reservation Released"
+        PICKUP = "PICKUP", "Picked Up"
+        RETURN = "RETURN", "Returned"
+        DAMAGE = "DAMAGE", "Damage Write-off"
+        LOSS = "LOSS", "Loss Write-off"
+        RECONCILIATION = "RECONCILIATION", "Reconciliation"
+
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='ledger_entries')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+
+    on_hand_delta = models.IntegerField(default=0)
+    reserved_delta = models.IntegerField(default=0)
+    rented_delta = models.IntegerField(default=0)
+
+    # What caused the entry, e.g. ("reservation", <uuid>) or ("stock_movement", <uuid>)
+    reference_type = models.CharField(max_length=32, blank=True)
+    reference_id = models.CharField(max_length=64, blank=True)
+    note = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'inventory_ledger_entries'
+        verbose_name = 'Inventory Ledger Entry'
+        verbose_name_plural = 'Inventory Ledger Entries'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['product', 'id'], name='inv_ledger_product_idx'),
+            models.Index(fields=['reference_type', 'reference_id'], name='inv_ledger_reference_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.product_id}: {self.on_hand_delta:+}/{self.reserved_delta:+}/{self.rented_delta:+}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Inventory ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Inventory ledger entries are append-only")
+
+
+class InventorySnapshot(models.Model):
+    """
+    Ledger balance of a product up to and including ``last_entry_id``, so
+    balances can be summed from the latest snapshot instead of from the
+    first entry.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    last_entry_id = models.BigIntegerField()
+    quantity_on_hand = models.IntegerField()
+    quantity_reserved = models.IntegerField()
+    quantity_rented = models.IntegerField()
+    taken_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'inventory_snapshots'
+        verbose_name = 'Inventory Snapshot'
+        verbose_name_plural = 'Inventory Snapshots'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['product', 'id'], name='inv_snapshot_product_idx'),
+            models.Index(fields=['taken_at'], name='inv_snapshot_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot of {self.product_id} at entry {self.last_entry_id}"
@@ -0,0 +1,237 @@
+"""
+Product search index.
+
+Every product has a ProductSearchDocument row (title: name, SKU, brand,
+model; body: category path and description) kept current by the catalog
+signals. The database indexes those rows natively:
+
+* PostgreSQL: a generated, weighted ``tsvector`` column with a GIN index
+  for ranked full-text matching, plus a ``pg_trgm`` GIN index on the title
+  so misspelt queries still find products.
+* SQLite: an external-content FTS5 table kept in sync by triggers, ranked
+  with bm25.
+
+Any other backend (or SQLite without FTS5) falls back to substring
+matching on the documents. The structures are created by migration
+0003; ``manage.py reindex_products`` rebuilds the documents in bulk.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Product, ProductCategory, ProductSearchDocument
+
+SEARCH_TABLE = 'product_search_documents'
+SQLITE_FTS_TABLE = 'product_search_fts'
+
+# Minimum pg_trgm similarity for a title to count as a fuzzy match
+TRIGRAM_THRESHOLD = 0.3
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def build_document(name, sku, brand, model, description, category_path) -> Tuple[str, str]:
+    """Search title and body from plain product values"""
+    title = ' '.join(part for part in (name, sku, brand, model) if part)
+    body = ' '.join(part for part in (category_path, description) if part)
+    return title, body
+
+
+def category_paths(categories: Iterable[ProductCategory]) -> Dict[int, str]:
+    """
+    Full path ("Parent > Child") of the given categories. Ancestors come
+    from each category's materialized path, so only their names are
+    fetched, in one query.
+    """
+    categories = {category.pk: category for category in categories if category is not None}
+    ancestor_ids = {
+        pk for category in categories.values() for pk in category.ancestor_ids
+    } - set(categories)
+    names = {pk: category.name for pk, category in categories.items()}
+    if ancestor_ids:
+        names.update(ProductCategory.objects.filter(pk__in=ancestor_ids).values_list('id', 'name'))
+
+    return {
+        pk: ' > '.join(
+            names[ancestor_id] for ancestor_id in category.ancestor_ids + [pk]
+            if ancestor_id in names
+        )
+        for pk, category in categories.items()
+    }
+
+
+def category_subtree(category_id) -> List[int]:
+    """Ids of a category and all of its descendants"""
+    path = ProductCategory.objects.filter(pk=category_id).values_list('path', flat=True).first()
+    if not path:
+        return [category_id]
+    return list(ProductCategory.objects.filter(path__startswith=path).values_list('id', flat=True))
+
+
+def tokenize(query: str) -> List[str]:
+    return TOKEN_PATTERN.findall(query.lower())
+
+
+def _backend() -> str:
+    """Which native search structure this database has"""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [SQLITE_FTS_TABLE]
+            )
+            if cursor.fetchone():
+                return 'sqlite'
+    return 'fallback'
+
+
+_trigram_available: Optional[bool] = None
+
+
+def _has_trigram() -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+class ProductSearchIndex:
+    """Maintain and query product search documents"""
+
+    @staticmethod
+    def index_products(product_ids: Optional[Iterable] = None, batch_size: int = 1000) -> int:
+        """
+        Rebuild the documents of the given products (all products when
+        None) with batched upserts. Returns the number of documents written.
+        """
+        products = Product.objects.select_related('category').only(
+            'id', 'name', 'sku', 'brand', 'model', 'description',
+            'category__id', 'category__name', 'category__path'
+        ).order_by('id')
+        if product_ids is not None:
+            products = products.filter(id__in=list(product_ids))
+
+        written = 0
+        batch = []
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                written += ProductSearchIndex._upsert(ProductSearchIndex._documents(batch))
+                batch = []
+        if batch:
+            written += ProductSearchIndex._upsert(ProductSearchIndex._documents(batch))
+        return written
+
+    @staticmethod
+    def _documents(products: List[Product]) -> List[ProductSearchDocument]:
+        paths = category_paths(product.category for product in products)
+        documents = []
+        for product in products:
+            title, body = build_document(
+                product.name, product.sku, product.brand, product.model,
+                product.description, paths.get(product.category_id, '')
+            )
+            documents.append(ProductSearchDocument(product_id=product.id, title=title, body=body))
+        return documents
+
+    @staticmethod
+    def index_categories(category_ids: Iterable) -> int:
+        """Rebuild the documents of products in the given categories and their subcategories"""
+        subtree = set()
+        for category_id in category_ids:
+            subtree.update(category_subtree(category_id))
+        product_ids = Product.objects.filter(category_id__in=subtree).values_list('id', flat=True)
+        return ProductSearchIndex.index_products(product_ids)
+
+    @staticmethod
+    def _upsert(documents: List[ProductSearchDocument]) -> int:
+        ProductSearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['title', 'body', 'updated_at']
+        )
+        return len(documents)
+
+    @staticmethod
+    def search(queryset, query: str):
+        """
+        Restrict a Product queryset to matches for ``query`` and annotate
+        ``search_rank`` (higher is better). Every term must match; the
+        last term also matches as a prefix, for search-as-you-type.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        backend = _backend()
+        table = Product._meta.db_table
+
+        if backend == 'postgresql':
+            tsquery = ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+            match_sql = f"SELECT product_id FROM {SEARCH_TABLE} WHERE search_vector @@ to_tsquery('simple', %s)"
+            rank_sql = (
+                f"SELECT ts_rank(d.search_vector, to_tsquery('simple', %s)) FROM {SEARCH_TABLE} d "
+                f"WHERE d.product_id = {table}.id"
+            )
+            match_params = [tsquery]
+            rank_params = [tsquery]
+            if _has_trigram():
+                phrase = ' '.join(terms)
+                # The % operator can use the title's gin_trgm_ops index,
+                # a similarity() comparison cannot. The setting is per
+                # session because the queryset may run outside a transaction.
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+                        [str(TRIGRAM_THRESHOLD)]
+                    )
+                match_sql += " OR title %% %s"
+                match_params += [phrase]
+                rank_sql = (
+                    f"SELECT ts_rank(d.search_vector, to_tsquery('simple', %s)) + similarity(d.title, %s) "
+                    f"FROM {SEARCH_TABLE} d WHERE d.product_id = {table}.id"
+                )
+                rank_params += [phrase]
+            return queryset.filter(id__in=RawSQL(match_sql, match_params)).annotate(
+                search_rank=RawSQL(rank_sql, rank_params, output_field=FloatField())
+            )
+
+        if backend == 'sqlite':
+            match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+            match = match.strip()
+            return queryset.filter(
+                id__in=RawSQL(
+                    f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s",
+                    [match]
+                )
+            ).annotate(
+                search_rank=RawSQL(
+                    f"SELECT -bm25({SQLITE_FTS_TABLE}, 10.0, 1.0) FROM {SQLITE_FTS_TABLE} "
+                    f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                    [match],
+                    output_field=FloatField()
+                )
+            )
+
+        condition = Q()
+        for term in terms:
+            condition &= Q(search_document__title__icontains=term) | Q(search_document__body__icontains=term)
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    @staticmethod
+    def autocomplete(queryset, query: str, limit: int = 10) -> List[Dict]:
+        """Best matches for a partial query: [{'id', 'name', 'sku', 'brand'}]"""
+        return list(
+            ProductSearchIndex.search(queryset, query).order_by('-search_rank', 'name').values(
+                'id', 'name', 'sku', 'brand'
+            )[:limit]
+        )
+
@@ -1,12 +1,19 @@
 from rest_framework import serializers
 from .models import ProductCategory, Product, ProductImage, ProductItem
-from django.db.models import Min
+from .tree import get_category_tree
+from django.db import models
+from django.db.models import Count, Min
+from apps.pricing.rate_cards import RATE_FIELDS, load_rate_cards
+from apps.pricing.tables import PriceTables
+from utils.fieldsets import SparseFieldsetMixin
 
 
-class ProductCategorySerializer(serializers.ModelSerializer):
+class ProductCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Children and counts come from the cached category tree (apps.catalog.tree)"""
     children = serializers.SerializerMethodField()
     parent_name = serializers.CharField(source='parent.name', read_only=True)
     product_count = serializers.SerializerMethodField()
+    total_product_count = serializers.SerializerMethodField()
     full_path = serializers.ReadOnlyField()
     
     class Meta:
@@ -14,29 +21,50 @@ class ProductCategorySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'parent', 'parent_name', 'image',
             'is_active', 'created_at', 'updated_at', 'children', 'product_count',
-            'full_path'
+            'total_product_count', 'full_path', 'depth'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at', 'depth']
+        expandable_fields = ['children']
+        summary_fields = ['id', 'name', 'parent', 'is_active', 'product_count', 'total_product_count', 'full_path']
+    
+    def validate_parent(self, value):
+        if value is not None and self.instance is not None:
+            if value.pk == self.instance.pk or self.instance.pk in value.ancestor_ids:
+                raise serializers.ValidationError("A category cannot be moved below itself")
+        return value
+    
+    def _node(self, obj):
+        return get_category_tree().nodes.get(obj.pk)
     
     def get_children(self, obj):
-        if hasattr(obj, 'children'):
-            return ProductCategorySerializer(obj.children.filter(is_active=True), many=True).data
-        return []
+        return get_category_tree().nested(obj.pk, request=self.context.get('request'))
     
     def get_product_count(self, obj):
+        node = self._node(obj)
+        if node is not None:
+            return node['product_count']
         return obj.products.filter(is_active=True, rentable=True).count()
+    
+    def get_total_product_count(self, obj):
+        node = self._node(obj)
+        if node is not None:
+            return node['total_product_count']
+        return Product.objects.filter(
+            category__in=obj.get_descendants(include_self=True), is_active=True, rentable=True
+        ).count()
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductImage
         fields = [
             'id', 'image', 'alt_text', 'is_primary', 'sort_order', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+        summary_fields = ['id', 'image', 'is_primary']
 
 
-class ProductItemSerializer(serializers.ModelSerializer):
+class ProductItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     is_available_for_rental = serializers.ReadOnlyField()
     
@@ -49,13 +77,86 @@ class ProductItemSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        summary_fields = ['id', 'serial_number', 'status', 'condition_rating', 'location']
+
+
+def pick_primary_image(images):
+    """The primary image, else the first one; ``images`` in ProductImage order"""
+    first = None
+    for image in images:
+        if image.is_primary:
+            return image
+        if first is None:
+            first = image
+    return first
+
 
+def load_item_summaries(product_ids):
+    """{product_id: {status: count}} for the given products, in one query"""
+    summaries = {product_id: {} for product_id in product_ids}
+    for row in ProductItem.objects.filter(product_id__in=product_ids).values(
+        'product_id', 'status'
+    ).annotate(count=Count('id')):
+        summaries[row['product_id']][row['status']] = row['count']
+    return summaries
 
-class ProductSerializer(serializers.ModelSerializer):
+
+class ProductBatchListSerializer(serializers.ListSerializer):
+    """
+    Loads rate cards, primary images and item summaries for every product
+    being serialized in one query each (skipping whatever the selected
+    fields do not render) and shares them with the child through the
+    context, so a page costs the same number of queries whatever its size.
+    "From" prices come from the cached price tables.
+    """
+    
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        product_ids = [product.pk for product in products]
+        fields = self.child.fields
+        
+        if any(name in fields for name in list(RATE_FIELDS) + ['security_deposit']):
+            self.context.setdefault('rate_cards', {}).update(load_rate_cards(product_ids))
+        
+        if 'from_daily_rate' in fields:
+            from_daily_rates = self.context.setdefault('from_daily_rates', {})
+            from_daily_rates.update(dict.fromkeys(product_ids))
+            from_daily_rates.update(PriceTables.from_daily_rates(product_ids))
+        
+        if 'item_summary' in fields:
+            missing_summaries = [
+                product.pk for product in products
+                if 'items' not in getattr(product, '_prefetched_objects_cache', {})
+            ]
+            if missing_summaries:
+                self.context.setdefault('item_summaries', {}).update(
+                    load_item_summaries(missing_summaries)
+                )
+        
+        # Products with prefetched images are resolved from the prefetch
+        missing_images = [
+            product.pk for product in products
+            if 'images' not in getattr(product, '_prefetched_objects_cache', {})
+        ] if 'primary_image' in fields else []
+        if missing_images:
+            primary_images = self.context.setdefault('primary_images', {})
+            for product_id in missing_images:
+                primary_images.setdefault(product_id, None)
+            for image in ProductImage.objects.filter(
+                product_id__in=missing_images
+            ).order_by('product_id', '-is_primary', 'sort_order', 'created_at'):
+                if primary_images[image.product_id] is None:
+                    primary_images[image.product_id] = image
+        
+        return super().to_representation(products)
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_path = serializers.CharField(source='category.full_path', read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     items = ProductItemSerializer(many=True, read_only=True)
+    item_summary = serializers.SerializerMethodField()
     available_quantity = serializers.ReadOnlyField()
     is_available = serializers.ReadOnlyField()
     primary_image = serializers.SerializerMethodField()
@@ -66,6 +167,7 @@ class ProductSerializer(serializers.ModelSerializer):
     monthly_rate = serializers.SerializerMethodField()
     hourly_rate = serializers.SerializerMethodField()
     security_deposit = serializers.SerializerMethodField()
+    from_daily_rate = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
@@ -76,78 +178,91 @@ class ProductSerializer(serializers.ModelSerializer):
             'quantity_reserved', 'quantity_rented', 'available_quantity',
             'weight', 'dimensions', 'brand', 'model', 'year', 'condition_notes',
             'is_active', 'is_available', 'created_at', 'updated_at', 'images',
-            'items', 'primary_image', 'daily_rate', 'weekly_rate', 'monthly_rate',
-            'hourly_rate', 'security_deposit'
+            'items', 'item_summary', 'primary_image', 'daily_rate', 'weekly_rate',
+            'monthly_rate', 'hourly_rate', 'security_deposit', 'from_daily_rate'
         ]
         read_only_fields = [
-            'id', 'available_quantity', 'is_available', 'created_at', 'updated_at',
-            'daily_rate', 'weekly_rate', 'monthly_rate', 'hourly_rate', 'security_deposit'
+            'id', 'quantity_reserved', 'quantity_rented', 'available_quantity',
+            'is_available', 'created_at', 'updated_at', 'daily_rate', 'weekly_rate',
+            'monthly_rate', 'hourly_rate', 'security_deposit', 'from_daily_rate'
         ]
+        list_serializer_class = ProductBatchListSerializer
+        # Summary view: item status counts instead of every unit, primary image only
+        expandable_fields = ['items', 'images']
+        summary_only_fields = ['item_summary']
+        summary_fields = [
+            'id', 'sku', 'name', 'category_name', 'rentable', 'tracking',
+            'default_rental_unit', 'available_quantity', 'is_available', 'brand',
+            'model', 'item_summary', 'primary_image', 'daily_rate', 'weekly_rate',
+            'monthly_rate', 'hourly_rate', 'security_deposit', 'from_daily_rate'
+        ]
+    
+    def get_item_summary(self, obj):
+        """Item counts by status, e.g. {'AVAILABLE': 120, 'RENTED': 14}"""
+        prefetched = getattr(obj, '_prefetched_objects_cache', {}).get('items')
+        if prefetched is not None:
+            summary = {}
+            for item in prefetched:
+                summary[item.status] = summary.get(item.status, 0) + 1
+            return summary
+        summaries = self.context.get('item_summaries', {})
+        if obj.pk in summaries:
+            return summaries[obj.pk]
+        return load_item_summaries([obj.pk])[obj.pk]
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        prefetched = getattr(obj, '_prefetched_objects_cache', {}).get('images')
+        if prefetched is not None:
+            primary_image = pick_primary_image(prefetched)
+        elif obj.pk in self.context.get('primary_images', {}):
+            primary_image = self.context['primary_images'][obj.pk]
+        else:
+            primary_image = obj.images.order_by('-is_primary', 'sort_order', 'created_at').first()
+        
         if primary_image:
             return ProductImageSerializer(primary_image).data
-        elif obj.images.exists():
-            return ProductImageSerializer(obj.images.first()).data
         return None
     
+    def get_rate_card(self, obj):
+        """Rates from the product's own price rules, batched when serializing a list"""
+        rate_cards = self.context.get('rate_cards', {})
+        if obj.pk not in rate_cards:
+            rate_cards.update(load_rate_cards([obj.pk]))
+            self.context['rate_cards'] = rate_cards
+        return rate_cards[obj.pk]
+    
+    def _rate(self, obj, name):
+        rate = self.get_rate_card(obj).get(name)
+        return float(rate) if rate is not None else None
+    
     def get_daily_rate(self, obj):
         """Get daily rental rate - prioritize direct field, then pricing rules"""
         # First check if product has a direct daily_rate
         if obj.daily_rate:
             return float(obj.daily_rate)
-        
-        # Fall back to pricing rules
-        try:
-            from apps.pricing.models import PriceRule
-            rule = PriceRule.objects.filter(
-                product=obj,
-                is_active=True,
-                rate_day__isnull=False
-            ).first()
-            return float(rule.rate_day) if rule else None
-        except ImportError:
-            return None
+        return self._rate(obj, 'daily_rate')
     
     def get_weekly_rate(self, obj):
         """Get weekly rental rate from pricing rules"""
-        try:
-            from apps.pricing.models import PriceRule
-            rule = PriceRule.objects.filter(
-                product=obj,
-                is_active=True,
-                rate_week__isnull=False
-            ).first()
-            return float(rule.rate_week) if rule else None
-        except ImportError:
-            return None
+        return self._rate(obj, 'weekly_rate')
     
     def get_monthly_rate(self, obj):
         """Get monthly rental rate from pricing rules"""
-        try:
-            from apps.pricing.models import PriceRule
-            rule = PriceRule.objects.filter(
-                product=obj,
-                is_active=True,
-                rate_month__isnull=False
-            ).first()
-            return float(rule.rate_month) if rule else None
-        except ImportError:
-            return None
+        return self._rate(obj, 'monthly_rate')
     
     def get_hourly_rate(self, obj):
         """Get hourly rental rate from pricing rules"""
-        try:
-            from apps.pricing.models import PriceRule
-            rule = PriceRule.objects.filter(
-                product=obj,
-                is_active=True,
-                rate_hour__isnull=False
-            ).first()
-            return float(rule.rate_hour) if rule else None
-        except ImportError:
-            return None
+        return self._rate(obj, 'hourly_rate')
+    
+    def get_from_daily_rate(self, obj):
+        """Cheapest per-day price over standard durations, from the price tables"""
+        from_daily_rates = self.context.get('from_daily_rates', {})
+        if obj.pk not in from_daily_rates:
+            from_daily_rates.setdefault(obj.pk, None)
+            from_daily_rates.update(PriceTables.from_daily_rates([obj.pk]))
+            self.context['from_daily_rates'] = from_daily_rates
+        rate = from_daily_rates[obj.pk]
+        return float(rate) if rate is not None else None
     
     def get_security_deposit(self, obj):
         """Get security deposit amount - could be a percentage of daily rate"""
@@ -165,7 +280,8 @@ class ProductListSerializer(ProductSerializer):
             'id', 'sku', 'name', 'description', 'category_name', 'category_path',
             'rentable', 'default_rental_unit', 'available_quantity', 'brand',
             'model', 'is_active', 'is_available', 'primary_image', 'daily_rate',
-            'weekly_rate', 'monthly_rate', 'hourly_rate', 'security_deposit'
+            'weekly_rate', 'monthly_rate', 'hourly_rate', 'security_deposit',
+            'from_daily_rate', 'item_summary'
         ]
 
 
@@ -234,9 +350,9 @@ class ProductSearchSerializer(serializers.Serializer):
 
 class BulkProductUpdateSerializer(serializers.Serializer):
     """Serializer for bulk product updates"""
-    product_ids = serializers.ListField(child=serializers.UUIDField())
+    product_ids = serializers.ListField(child=serializers.IntegerField())
     action = serializers.ChoiceField(choices=['activate', 'deactivate', 'update_category'])
-    category = serializers.UUIDField(required=False)
+    category = serializers.IntegerField(required=False)
     
     def validate(self, data):
         if data['action'] == 'update_category' and not data.get('category'):
@@ -0,0 +1,61 @@
+"""
+Keep product search documents and the cached category tree in step with
+products and categories, and post damage/loss stock movements to the
+inventory ledger.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.deliveries.models import StockMovement
+
+from .inventory import InventoryError, InventoryLedger
+from .models import Product, ProductCategory
+from .search import ProductSearchIndex
+from .tree import invalidate_category_tree
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ProductSearchIndex.index_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductCategory)
+def category_saved(sender, instance, created=False, raw=False, **kwargs):
+    # A new category has no products yet; a renamed or moved one changes
+    # the category path of every product below it
+    if raw or created:
+        return
+    category_id = instance.pk
+    transaction.on_commit(lambda: ProductSearchIndex.index_categories([category_id]))
+
+
+@receiver(post_delete, sender=ProductCategory)
+def category_deleted(sender, instance, **kwargs):
+    # Children were re-parented to the root with a plain UPDATE (SET_NULL)
+    ProductCategory.rebuild_paths()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def catalog_tree_changed(sender, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=StockMovement)
+def stock_movement_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    try:
+        InventoryLedger.record_stock_movement(instance)
+    except InventoryError as e:
+        # The movement stands; reconciliation clamps the count at zero
+        logger.warning(f"Stock movement {instance.movement_number} not posted to the ledger: {str(e)}")
@@ -0,0 +1,207 @@
+"""
+Cached product category tree.
+
+The whole taxonomy is compiled from two queries (categories ordered by
+materialized path, active product counts grouped by category): each node
+gets its full name path plus direct and rolled-up product counts, and
+children lists are built in memory. The compiled tree lives in the shared
+cache under a version stamp; catalog signals bump the stamp whenever a
+category or product changes, and each process keeps its own copy until
+the stamp moves, the same scheme as the pricing index.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from rest_framework import serializers
+
+from .models import Product, ProductCategory
+
+logger = logging.getLogger(__name__)
+
+TREE_CACHE_KEY = 'catalog:category-tree'
+VERSION_CACHE_KEY = 'catalog:category-tree-version'
+TREE_CACHE_TIMEOUT = 60 * 60
+
+# How often (seconds) a process re-reads the shared version stamp
+VERSION_CHECK_INTERVAL = 1.0
+
+_datetime_field = serializers.DateTimeField()
+
+
+class CategoryTree:
+    """Compiled category nodes keyed by id"""
+
+    def __init__(self, nodes: Dict[int, Dict], children: Dict, version: Optional[str] = None):
+        self.nodes = nodes
+        self.children = children
+        self.version = version
+
+    @classmethod
+    def build(cls, version: Optional[str] = None) -> 'CategoryTree':
+        """Compile the tree from two queries"""
+        categories = list(ProductCategory.objects.order_by('path', 'name').values(
+            'id', 'name', 'description', 'parent_id', 'path', 'depth', 'image',
+            'is_active', 'created_at', 'updated_at'
+        ))
+        direct_counts = dict(
+            Product.objects.filter(is_active=True, rentable=True, category__isnull=False)
+            .values('category_id').annotate(count=Count('id'))
+            .values_list('category_id', 'count')
+        )
+
+        nodes = {}
+        children = defaultdict(list)
+        for category in categories:
+            parent = nodes.get(category['parent_id'])
+            nodes[category['id']] = {
+                'id': category['id'],
+                'name': category['name'],
+                'description': category['description'],
+                'parent': category['parent_id'],
+                'parent_name': parent['name'] if parent else None,
+                'image': category['image'] or None,
+                'is_active': category['is_active'],
+                'created_at': _datetime_field.to_representation(category['created_at']),
+                'updated_at': _datetime_field.to_representation(category['updated_at']),
+                'full_path': f"{parent['full_path']} > {category['name']}" if parent else category['name'],
+                'depth': category['depth'],
+                'product_count': direct_counts.get(category['id'], 0),
+                'total_product_count': 0,
+            }
+            children[category['parent_id'] if parent else None].append(category['id'])
+
+        # Roll every direct count up through the node's ancestors
+        for category in categories:
+            count = nodes[category['id']]['product_count']
+            if not count:
+                continue
+            for part in category['path'].split(ProductCategory.PATH_SEPARATOR):
+                if part and int(part) in nodes:
+                    nodes[int(part)]['total_product_count'] += count
+
+        for ids in children.values():
+            ids.sort(key=lambda pk: nodes[pk]['name'])
+        return cls(nodes, dict(children), version)
+
+    def full_paths(self) -> Dict[int, str]:
+        return {pk: node['full_path'] for pk, node in self.nodes.items()}
+
+    def subtree_ids(self, category_id: int) -> List[int]:
+        """A category and all of its descendants"""
+        ids = []
+        pending = [category_id]
+        while pending:
+            pk = pending.pop()
+            ids.append(pk)
+            pending.extend(self.children.get(pk, []))
+        return ids
+
+    def nested(self, parent_id: Optional[int] = None, request=None, active_only: bool = True) -> List[Dict]:
+        """
+        Serialized children of ``parent_id`` (roots when None), each with
+        its own ``children`` filled in recursively.
+        """
+        result = []
+        for pk in self.children.get(parent_id, []):
+            node = self.nodes[pk]
+            if active_only and not node['is_active']:
+                continue
+            data = dict(node)
+            if data['image']:
+                data['image'] = default_storage.url(data['image'])
+                if request is not None:
+                    data['image'] = request.build_absolute_uri(data['image'])
+            data['children'] = self.nested(pk, request, active_only)
+            result.append(data)
+        return result
+
+
+_tree: Optional[CategoryTree] = None
+_paths: Dict[int, str] = {}
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _shared_version() -> Optional[str]:
+    try:
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(VERSION_CACHE_KEY)
+        return version
+    except Exception as e:
+        logger.warning(f"Could not read category tree version: {str(e)}")
+        return None
+
+
+def _load(version: Optional[str]) -> CategoryTree:
+    """The shared compiled tree for ``version``, compiling it if nobody has"""
+    if version is not None:
+        try:
+            cached = cache.get(TREE_CACHE_KEY)
+            if cached and cached.get('version') == version:
+                return CategoryTree(cached['nodes'], cached['children'], version)
+        except Exception as e:
+            logger.warning(f"Could not read cached category tree: {str(e)}")
+
+    tree = CategoryTree.build(version)
+    if version is not None:
+        try:
+            cache.set(
+                TREE_CACHE_KEY,
+                {'version': version, 'nodes': tree.nodes, 'children': tree.children},
+                TREE_CACHE_TIMEOUT
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache category tree: {str(e)}")
+    return tree
+
+
+def get_category_tree() -> CategoryTree:
+    """The process-wide tree, reloaded when the shared version moved on"""
+    global _tree, _paths, _checked_at
+
+    now = time.monotonic()
+    tree = _tree
+    if tree is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return tree
+
+    version = _shared_version()
+    if tree is not None and version is not None and tree.version == version:
+        _checked_at = now
+        return tree
+
+    with _lock:
+        if _tree is None or version is None or _tree.version != version:
+            _tree = _load(version)
+            _paths = _tree.full_paths()
+        _checked_at = now
+        return _tree
+
+
+def category_full_paths() -> Dict[int, str]:
+    """{category_id: "Parent > Child"} from the process-wide tree"""
+    get_category_tree()
+    return _paths
+
+
+def _bump_version():
+    global _tree
+    _tree = None
+    try:
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not bump category tree version: {str(e)}")
+
+
+def invalidate_category_tree():
+    """Recompile the tree (everywhere) once the current transaction commits"""
+    transaction.on_commit(_bump_version)
@@ -2,11 +2,22 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Count, F
 from django.shortcuts import get_object_or_404
 from datetime import datetime, timedelta
 
+from apps.pricing.tables import request_rebuild
+from utils.fieldsets import SparseFieldsetViewMixin, fieldset_options
+from utils.pagination import paginate
+
 from .models import ProductCategory, Product, ProductImage, ProductItem
+from .facets import ProductFacets
+from .filters import ProductFilterError, filter_products, product_ordering
+from .importer import IMPORT_KINDS, import_catalog
+from .inventory import InventoryLedger
+from .search import ProductSearchIndex
+from .tree import get_category_tree, invalidate_category_tree
 from .serializers import (
     ProductCategorySerializer, ProductSerializer, ProductListSerializer,
     ProductCreateUpdateSerializer, ProductImageSerializer, ProductItemSerializer,
@@ -14,13 +25,13 @@ from .serializers import (
 )
 
 
-class ProductCategoryViewSet(viewsets.ModelViewSet):
+class ProductCategoryViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = ProductCategory.objects.all()
     serializer_class = ProductCategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('parent')
         if self.action == 'list':
             # Only show top-level categories by default
             parent_id = self.request.query_params.get('parent')
@@ -38,15 +49,10 @@ class ProductCategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """Get complete category tree"""
-        categories = ProductCategory.objects.filter(
-            parent=None, is_active=True
-        ).prefetch_related('children__children')
-        
-        serializer = self.get_serializer(categories, many=True)
         return Response({
             'success': True,
             'data': {
-                'categories': serializer.data
+                'categories': get_category_tree().nested(request=request)
             }
         })
     
@@ -60,33 +66,19 @@ class ProductCategoryViewSet(viewsets.ModelViewSet):
             rentable=True
         )
         
-        # Pagination
-        page = int(request.query_params.get('page', 1))
-        limit = min(int(request.query_params.get('limit', 20)), 100)
-        offset = (page - 1) * limit
-        
-        total = products.count()
-        products_page = products[offset:offset + limit]
-        
-        serializer = ProductListSerializer(products_page, many=True)
+        products_page, pagination = paginate(request, products, ['name'])
+        serializer = ProductListSerializer(products_page, many=True, **fieldset_options(request))
         
         return Response({
             'success': True,
             'data': {
                 'products': serializer.data,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': total,
-                    'total_pages': (total + limit - 1) // limit,
-                    'has_next': offset + limit < total,
-                    'has_prev': page > 1
-                }
+                'pagination': pagination
             }
         })
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
     
@@ -98,7 +90,16 @@ class ProductViewSet(viewsets.ModelViewSet):
         return ProductSerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('category').prefetch_related('images', 'items')
+        queryset = super().get_queryset()
+        
+        # Only join and prefetch what the selected fields render
+        fields = set(self.selected_fields())
+        if fields & {'category_name', 'category_path'}:
+            queryset = queryset.select_related('category')
+        if fields & {'images', 'primary_image'}:
+            queryset = queryset.prefetch_related('images')
+        if 'items' in fields:
+            queryset = queryset.prefetch_related('items')
         
         # Filter active products for non-staff users
         if not self.request.user.is_staff:
@@ -110,68 +111,26 @@ class ProductViewSet(viewsets.ModelViewSet):
         """Get products with filtering and pagination"""
         queryset = self.get_queryset()
         
-        # Search and filtering
-        search = request.query_params.get('search')
-        category = request.query_params.get('category')
-        is_rentable = request.query_params.get('is_rentable')
-        availability = request.query_params.get('availability')
-        brand = request.query_params.get('brand')
-        sort_by = request.query_params.get('sort_by', 'name')
-        sort_order = request.query_params.get('sort_order', 'asc')
-        
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search) |
-                Q(sku__icontains=search) |
-                Q(brand__icontains=search)
-            )
-        
-        if category:
-            queryset = queryset.filter(category_id=category)
-        
-        if is_rentable is not None:
-            queryset = queryset.filter(rentable=is_rentable.lower() == 'true')
-        
-        if availability is not None and availability.lower() == 'true':
-            queryset = queryset.filter(
-                quantity_on_hand__gt=models.F('quantity_reserved') + models.F('quantity_rented')
-            )
-        
-        if brand:
-            queryset = queryset.filter(brand__icontains=brand)
-        
-        # Sorting
-        if sort_order == 'desc':
-            sort_by = f'-{sort_by}'
-        
-        if sort_by in ['name', '-name', 'brand', '-brand', 'created_at', '-created_at']:
-            queryset = queryset.order_by(sort_by)
-        elif sort_by in ['category', '-category']:
-            queryset = queryset.order_by(f'{sort_by.replace("category", "category__name")}')
-        
-        # Pagination
-        page = int(request.query_params.get('page', 1))
-        limit = min(int(request.query_params.get('limit', 20)), 100)
-        offset = (page - 1) * limit
-        
-        total = queryset.count()
-        products_page = queryset[offset:offset + limit]
+        try:
+            queryset = filter_products(queryset, request.query_params)
+        except ProductFilterError as e:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': e.code,
+                    'message': e.message
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        ordering = product_ordering(request.query_params)
         
+        products_page, pagination = paginate(request, queryset, ordering)
         serializer = self.get_serializer(products_page, many=True)
         
         return Response({
             'success': True,
             'data': {
                 'products': serializer.data,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': total,
-                    'total_pages': (total + limit - 1) // limit,
-                    'has_next': offset + limit < total,
-                    'has_prev': page > 1
-                }
+                'pagination': pagination
             }
         })
     
@@ -199,9 +158,9 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
             
             # Find unavailable dates
-            for date_info in calendar:
-                if date_info['available_quantity'] == 0:
-                    availability_info['unavailable_dates'].append(date_info['date'])
+            for day, day_info in calendar.items():
+                if day_info['available_quantity'] == 0:
+                    availability_info['unavailable_dates'].append(day)
         
         return Response({
             'success': True,
@@ -261,6 +220,61 @@ class ProductViewSet(viewsets.ModelViewSet):
                 }
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Facet counts (brand, category, rental unit, price band, availability) for a search"""
+        queryset = Product.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(is_active=True)
+        
+        try:
+            queryset = filter_products(queryset, request.query_params)
+        except ProductFilterError as e:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': e.code,
+                    'message': e.message
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        facets = ProductFacets.cached(
+            queryset, request.query_params, scope='staff' if request.user.is_staff else 'public'
+        )
+        return Response({
+            'success': True,
+            'data': facets
+        })
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Suggest products for a partial search query"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 25))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_LIMIT',
+                    'message': 'limit must be an integer'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        suggestions = []
+        if query:
+            queryset = Product.objects.all()
+            if not request.user.is_staff:
+                queryset = queryset.filter(is_active=True)
+            suggestions = ProductSearchIndex.autocomplete(queryset, query, limit)
+        
+        return Response({
+            'success': True,
+            'data': {
+                'suggestions': suggestions
+            }
+        })
+    
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Get all product categories"""
@@ -273,6 +287,52 @@ class ProductViewSet(viewsets.ModelViewSet):
             }
         })
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk_import(self, request):
+        """Import a CSV/JSONL file of products, items, images or price rules (Admin only)"""
+        if not request.user.is_staff:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'PERMISSION_DENIED',
+                    'message': 'Admin access required'
+                }
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        upload = request.FILES.get('file')
+        kind = request.data.get('kind')
+        if upload is None or kind not in IMPORT_KINDS:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': f"A file and a kind ({', '.join(IMPORT_KINDS)}) are required"
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('format') or (
+            'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+        )
+        if file_format not in ('csv', 'jsonl'):
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'format must be csv or jsonl'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        report = import_catalog(
+            upload,
+            kind,
+            file_format=file_format,
+            dry_run=str(request.data.get('dry_run', '')).lower() == 'true'
+        )
+        return Response({
+            'success': report['failed'] == 0,
+            'data': report
+        })
+    
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def bulk_update(self, request):
         """Bulk update products (Admin only)"""
@@ -307,7 +367,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             message = f"Deactivated {products.count()} products"
         elif data['action'] == 'update_category':
             products.update(category_id=data['category'])
+            # update() skips the signals that keep search documents current
+            ProductSearchIndex.index_products(data['product_ids'])
             message = f"Updated category for {products.count()} products"
+
+        # update() also skips the Product post_save that rebuilds price tables
+        # and the catalog_tree_changed that refreshes the tree's product counts
+        request_rebuild(product_ids=data['product_ids'])
+        invalidate_category_tree()
         
         return Response({
             'success': True,
@@ -315,7 +382,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         })
 
 
-class ProductImageViewSet(viewsets.ModelViewSet):
+class ProductImageViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = ProductImage.objects.all()
     serializer_class = ProductImageSerializer
     permission_classes = [IsAuthenticated]
@@ -337,7 +404,7 @@ class ProductImageViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class ProductItemViewSet(viewsets.ModelViewSet):
+class ProductItemViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = ProductItem.objects.all()
     serializer_class = ProductItemSerializer
     permission_classes = [IsAuthenticated]
@@ -440,7 +507,7 @@ class InventoryViewSet(viewsets.ViewSet):
         
         if inventory_status == 'available':
             products = products.filter(
-                quantity_on_hand__gt=models.F('quantity_reserved') + models.F('quantity_rented')
+                quantity_on_hand__gt=F('quantity_reserved') + F('quantity_rented')
             )
         elif inventory_status == 'rented':
             products = products.filter(quantity_rented__gt=0)
@@ -476,24 +543,7 @@ class InventoryViewSet(viewsets.ViewSet):
         
         try:
             product = Product.objects.get(id=product_id)
-            
-            if inventory_status == 'available':
-                # Reset to available - this is simplified
-                product.quantity_on_hand = quantity or product.quantity_on_hand
-                product.quantity_reserved = 0
-                product.quantity_rented = 0
-            
-            if notes:
-                product.condition_notes = notes
-            
-            product.save()
-            
-            return Response({
-                'success': True,
-                'message': 'Inventory status updated successfully'
-            })
-            
-        except Product.DoesNotExist:
+        except (Product.DoesNotExist, ValueError, TypeError):
             return Response({
                 'success': False,
                 'error': {
@@ -501,6 +551,48 @@ class InventoryViewSet(viewsets.ViewSet):
                     'message': 'Product not found'
                 }
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        if quantity not in (None, ''):
+            try:
+                quantity = int(quantity)
+                if quantity < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return Response({
+                    'success': False,
+                    'error': {
+                        'code': 'INVALID_QUANTITY',
+                        'message': 'quantity must be a non-negative integer'
+                    }
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            quantity = None
+        
+        with transaction.atomic():
+            if quantity is not None:
+                # A stock count: posted to the ledger as an adjustment
+                InventoryLedger.set_on_hand(
+                    {product.id: quantity}, note=notes, user=request.user
+                )
+            if inventory_status == 'available':
+                # Reserved and rented units follow reservations; rebuild
+                # them instead of zeroing them
+                InventoryLedger.reconcile([product.id])
+            if notes:
+                Product.objects.filter(pk=product.pk).update(condition_notes=notes)
+        
+        product.refresh_from_db()
+        
+        return Response({
+            'success': True,
+            'message': 'Inventory status updated successfully',
+            'data': {
+                'quantity_on_hand': product.quantity_on_hand,
+                'quantity_reserved': product.quantity_reserved,
+                'quantity_rented': product.quantity_rented,
+                'available_quantity': product.available_quantity
+            }
+        })
     
     @action(detail=False, methods=['get'])
     def alerts(self, request):
@@ -517,7 +609,7 @@ class InventoryViewSet(viewsets.ViewSet):
         # Low stock alerts (less than 10% available)
         low_stock = Product.objects.filter(
             is_active=True,
-            quantity_on_hand__lte=models.F('quantity_reserved') + models.F('quantity_rented') + 2
+            quantity_on_hand__lte=F('quantity_reserved') + F('quantity_rented') + 2
         )
         
         # Maintenance alerts (items due for service)
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 import uuid
+from apps.sequences.services import SequenceService
 from apps.orders.models import Reservation
 
 User = get_user_model()
@@ -83,19 +84,15 @@ class DeliveryDocument(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.document_number:
-            self.document_number = self.generate_document_number()
+            with transaction.atomic():
+                self.document_number = self.generate_document_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_document_number(self):
         """Generate unique document number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
         prefix = 'PU' if self.document_type == self.DocumentType.PICKUP else 'DL'
-        count = DeliveryDocument.objects.filter(
-            document_type=self.document_type,
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"{prefix}-{timestamp}-{count:04d}"
+        return SequenceService.next_number(prefix, DeliveryDocument, 'document_number')
 
     @property
     def is_overdue(self):
@@ -226,17 +223,14 @@ class ReturnDocument(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.document_number:
-            self.document_number = self.generate_document_number()
+            with transaction.atomic():
+                self.document_number = self.generate_document_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_document_number(self):
         """Generate unique return document number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = ReturnDocument.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"RT-{timestamp}-{count:04d}"
+        return SequenceService.next_number('RT', ReturnDocument, 'document_number')
 
     @property
     def is_overdue(self):
@@ -358,17 +352,14 @@ class StockMovement(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.movement_number:
-            self.movement_number = self.generate_movement_number()
+            with transaction.atomic():
+                self.movement_number = self.generate_movement_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_movement_number(self):
         """Generate unique movement number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = StockMovement.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"SM-{timestamp}-{count:04d}"
+        return SequenceService.next_number('SM', StockMovement, 'movement_number')
 
 
 class DeliveryRoute(models.Model):
@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 import uuid
+from apps.sequences.services import SequenceService
 from apps.orders.models import RentalOrder
+from utils.money import from_paise, multiply, percent_of, to_paise
 
 User = get_user_model()
 
@@ -76,6 +78,8 @@ class Invoice(models.Model):
             models.Index(fields=['invoice_number']),
             models.Index(fields=['status', 'due_date']),
             models.Index(fields=['order']),
+            # Keyset pagination order (see utils.pagination)
+            models.Index(fields=['invoice_date', 'id'], name='invoices_date_keyset_idx'),
         ]
 
     def __str__(self):
@@ -83,17 +87,14 @@ class Invoice(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.invoice_number:
-            self.invoice_number = self.generate_invoice_number()
+            with transaction.atomic():
+                self.invoice_number = self.generate_invoice_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_invoice_number(self):
         """Generate unique invoice number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = Invoice.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"INV-{timestamp}-{count:04d}"
+        return SequenceService.next_number('INV', Invoice, 'invoice_number')
 
     @property
     def balance_due(self):
@@ -173,14 +174,22 @@ class InvoiceLine(models.Model):
         return f"{self.description} x{self.quantity} - {self.invoice.invoice_number}"
 
     def save(self, *args, **kwargs):
-        # Calculate line total
-        subtotal = self.quantity * self.unit_price
-        discount = self.discount_amount or (subtotal * self.discount_percent / 100)
-        taxable_amount = subtotal - discount
-        tax = taxable_amount * self.tax_rate / 100
-        self.line_total = taxable_amount + tax
+        self.calculate_amounts()
         super().save(*args, **kwargs)
 
+    def calculate_amounts(self):
+        """
+        Set tax_amount and line_total from quantity, unit price, discount
+        and tax rate in integer paise. Returns the taxable amount in paise.
+        """
+        subtotal = multiply(to_paise(self.unit_price), self.quantity)
+        discount = to_paise(self.discount_amount) or percent_of(subtotal, self.discount_percent)
+        taxable = subtotal - discount
+        tax = percent_of(taxable, self.tax_rate)
+        self.tax_amount = from_paise(tax)
+        self.line_total = from_paise(taxable + tax)
+        return taxable
+
 
 class InvoiceTemplate(models.Model):
     """Templates for different types of invoices"""
@@ -302,17 +311,14 @@ class CreditNote(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.credit_note_number:
-            self.credit_note_number = self.generate_credit_note_number()
+            with transaction.atomic():
+                self.credit_note_number = self.generate_credit_note_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_credit_note_number(self):
         """Generate unique credit note number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = CreditNote.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"CN-{timestamp}-{count:04d}"
+        return SequenceService.next_number('CN', CreditNote, 'credit_note_number')
 
     @property
     def remaining_credit(self):
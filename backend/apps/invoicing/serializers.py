@@ -6,6 +6,7 @@ from .models import (
     CreditNote, TaxRate
 )
 from apps.orders.serializers import RentalOrderSerializer
+from utils.money import from_paise, to_paise
 
 User = get_user_model()
 
@@ -46,7 +47,8 @@ class InvoiceLineSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_line_total(self, obj):
-        return obj.quantity * obj.unit_price - obj.discount_amount + obj.tax_amount
+        # Computed in paise on save; see InvoiceLine.calculate_amounts()
+        return obj.line_total
 
 
 class InvoiceSerializer(serializers.ModelSerializer):
@@ -99,34 +101,30 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
         lines_data = validated_data.pop('lines', [])
         invoice = Invoice.objects.create(**validated_data)
         
-        # Create invoice lines
-        total_subtotal = Decimal('0.00')
-        total_tax = Decimal('0.00')
+        # Create invoice lines; each line computes its tax and total on save
+        total_subtotal = 0
+        total_tax = 0
         
         for line_data in lines_data:
             line = InvoiceLine.objects.create(
                 invoice=invoice,
                 product_id=line_data.get('product_id'),
                 description=line_data.get('description', ''),
-                quantity=Decimal(line_data.get('quantity', 1)),
-                unit_price=Decimal(line_data.get('unit_price', 0)),
-                discount_percent=Decimal(line_data.get('discount_percent', 0)),
-                discount_amount=Decimal(line_data.get('discount_amount', 0)),
-                tax_rate=Decimal(line_data.get('tax_rate', 0))
+                quantity=Decimal(str(line_data.get('quantity', 1))),
+                unit_price=Decimal(str(line_data.get('unit_price', 0))),
+                discount_percent=Decimal(str(line_data.get('discount_percent', 0))),
+                discount_amount=Decimal(str(line_data.get('discount_amount', 0))),
+                tax_rate=Decimal(str(line_data.get('tax_rate', 0)))
             )
             
-            # Calculate tax amount
-            line_subtotal = line.quantity * line.unit_price - line.discount_amount
-            line.tax_amount = line_subtotal * (line.tax_rate / 100)
-            line.save()
-            
-            total_subtotal += line_subtotal
-            total_tax += line.tax_amount
+            line_tax = to_paise(line.tax_amount)
+            total_subtotal += to_paise(line.line_total) - line_tax
+            total_tax += line_tax
         
         # Update invoice totals
-        invoice.subtotal = total_subtotal
-        invoice.tax_amount = total_tax
-        invoice.total_amount = total_subtotal + total_tax - invoice.discount_amount
+        invoice.subtotal = from_paise(total_subtotal)
+        invoice.tax_amount = from_paise(total_tax)
+        invoice.total_amount = from_paise(total_subtotal + total_tax - to_paise(invoice.discount_amount))
         invoice.save()
         
         return invoice
@@ -16,6 +16,8 @@ import io
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 
+from utils.pagination import paginate
+
 from .models import (
     Invoice, InvoiceLine, InvoiceTemplate, PaymentTerm,
     CreditNote, TaxRate
@@ -62,45 +64,31 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         if date_from:
             try:
                 from_date = datetime.fromisoformat(date_from).date()
-                queryset = queryset.filter(issue_date__gte=from_date)
+                queryset = queryset.filter(invoice_date__gte=from_date)
             except ValueError:
                 pass
         
         if date_to:
             try:
                 to_date = datetime.fromisoformat(date_to).date()
-                queryset = queryset.filter(issue_date__lte=to_date)
+                queryset = queryset.filter(invoice_date__lte=to_date)
             except ValueError:
                 pass
         
-        return queryset.order_by('-issue_date')
+        return queryset.order_by('-invoice_date')
     
     def list(self, request):
         """Get invoices with pagination"""
         queryset = self.get_queryset()
         
-        # Pagination
-        page = int(request.query_params.get('page', 1))
-        limit = min(int(request.query_params.get('limit', 20)), 100)
-        offset = (page - 1) * limit
-        
-        total = queryset.count()
-        invoices_page = queryset[offset:offset + limit]
-        
+        invoices_page, pagination = paginate(request, queryset, ['-invoice_date'])
         serializer = self.get_serializer(invoices_page, many=True)
         
         return Response({
             'success': True,
             'data': {
                 'invoices': serializer.data,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': total,
-                    'total_pages': (total + limit - 1) // limit,
-                    'has_next': offset + limit < total,
-                    'has_prev': page > 1
-                }
+                'pagination': pagination
             }
         })
     
@@ -174,8 +162,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             p.drawString(50, y_position, line.description or line.product.name if line.product else "")
             p.drawString(300, y_position, str(line.quantity))
             p.drawString(350, y_position, f"{line.unit_price}")
-            line_total = line.quantity * line.unit_price - line.discount_amount + line.tax_amount
-            p.drawString(400, y_position, f"{line_total}")
+            p.drawString(400, y_position, f"{line.line_total}")
             y_position -= 20
         
         # Totals
@@ -4,7 +4,8 @@ from django.utils import timezone
 from django.db.models import Count
 from .models import (
     NotificationTemplate, NotificationSetting, Notification,
-    ScheduledNotification, NotificationLog, NotificationProvider
+    ScheduledNotification, NotificationLog, NotificationProvider,
+    NotificationOutbox
 )
 
 
@@ -425,6 +426,30 @@ class NotificationProviderAdmin(admin.ModelAdmin):
     rate_limits.short_description = 'Rate Limits'
 
 
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    """Admin interface for the notification outbox"""
+    list_display = [
+        'notification_type', 'channel', 'recipient', 'status', 'attempts',
+        'available_at', 'sent_at', 'created_at'
+    ]
+    list_filter = ['status', 'notification_type', 'channel', 'created_at']
+    search_fields = ['recipient', 'order__order_number', 'user__username']
+    readonly_fields = ['id', 'claimed_at', 'sent_at', 'created_at']
+    raw_id_fields = ['user', 'order']
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        """Make failed or waiting entries due again"""
+        updated = queryset.exclude(status=NotificationOutbox.Status.SENT).update(
+            status=NotificationOutbox.Status.PENDING,
+            available_at=timezone.now(),
+            attempts=0
+        )
+        self.message_user(request, f'{updated} outbox entries queued for retry.')
+    retry_now.short_description = "Retry selected entries now"
+
+
 # Admin site customizations
 admin.site.site_header = "Rental Management System - Notifications"
 admin.site.site_title = "Notifications Admin"
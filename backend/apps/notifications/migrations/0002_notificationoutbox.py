@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        ('orders', '0002_productcapacitybucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('notification_type', models.CharField(choices=[('ORDER_CONFIRMATION', 'Order Confirmation'), ('PICKUP_REMINDER', 'Pickup Reminder'), ('RETURN_REMINDER', 'Return Reminder'), ('OVERDUE_NOTICE', 'Overdue Notice'), ('PAYMENT_REMINDER', 'Payment Reminder'), ('PAYMENT_CONFIRMATION', 'Payment Confirmation'), ('QUOTE_SENT', 'Quote Sent'), ('DELIVERY_UPDATE', 'Delivery Update'), ('MAINTENANCE_ALERT', 'Maintenance Alert'), ('CUSTOM', 'Custom Notification')], max_length=25)),
+                ('channel', models.CharField(choices=[('EMAIL', 'Email'), ('SMS', 'SMS'), ('PUSH', 'Push Notification'), ('IN_APP', 'In-App Notification'), ('WHATSAPP', 'WhatsApp')], default='EMAIL', max_length=10)),
+                ('recipient', models.CharField(blank=True, max_length=255)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=15)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='orders.rentalorder')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification Outbox Entry',
+                'verbose_name_plural': 'Notification Outbox',
+                'db_table': 'notification_outbox',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='notification_outbox_due_idx'), models.Index(fields=['status', 'claimed_at'], name='notification_outbox_claim_idx')],
+            },
+        ),
+    ]
@@ -422,3 +422,51 @@ class NotificationProvider(models.Model):
                 is_default=True
             ).exclude(pk=self.pk).update(is_default=False)
         super().save(*args, **kwargs)
+
+
+class NotificationOutbox(models.Model):
+    """Notifications recorded in the business transaction and dispatched by a worker"""
+    
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        PROCESSING = "PROCESSING", "Processing"
+        SENT = "SENT", "Sent"
+        FAILED = "FAILED", "Failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    notification_type = models.CharField(max_length=25, choices=NotificationTemplate.NotificationType.choices)
+    channel = models.CharField(
+        max_length=10,
+        choices=NotificationTemplate.Channel.choices,
+        default=NotificationTemplate.Channel.EMAIL
+    )
+    
+    # Recipient and references
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbox_notifications')
+    recipient = models.CharField(max_length=255, blank=True)
+    order = models.ForeignKey(RentalOrder, on_delete=models.SET_NULL, null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    # Delivery state
+    status = models.CharField(max_length=15, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now)  # Not dispatched before this
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notification_outbox'
+        verbose_name = 'Notification Outbox Entry'
+        verbose_name_plural = 'Notification Outbox'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='notification_outbox_due_idx'),
+            models.Index(fields=['status', 'claimed_at'], name='notification_outbox_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} to {self.recipient or self.user_id} ({self.status})"
@@ -0,0 +1,203 @@
+"""
+Transactional notification outbox.
+
+Business code records a NotificationOutbox row in the same transaction as
+the change it reports on (e.g. a new order), so the notification exists if
+and only if the change committed. A Celery worker drains the outbox: it
+claims due rows in batches with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+several workers never pick the same row, dispatches them outside the claim
+transaction, and records the outcome. Rows claimed by a worker that died
+are reclaimed once the claim goes stale, so delivery is at-least-once.
+"""
+import logging
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.notifications.models import NotificationOutbox, NotificationTemplate
+from apps.orders.models import RentalOrder
+from utils.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+# A claim older than this is assumed to belong to a crashed worker
+STALE_CLAIM_AFTER = timedelta(minutes=10)
+
+# First retry delay; doubled on every further failed attempt
+RETRY_BACKOFF = timedelta(minutes=1)
+
+
+def send_order_confirmation(entry: NotificationOutbox) -> bool:
+    """Order confirmation email, built from the order as it is at dispatch time"""
+    order = RentalOrder.objects.select_related('customer').prefetch_related(
+        'items__product'
+    ).get(id=entry.payload['order_id'])
+
+    context = {
+        'order': {
+            'id': str(order.id),
+            'order_number': order.order_number,
+            'created_at': order.created_at.strftime('%Y-%m-%d %H:%M'),
+            'start_date': order.rental_start.strftime('%Y-%m-%d'),
+            'end_date': order.rental_end.strftime('%Y-%m-%d'),
+            'total_amount': str(order.total_amount),
+            'status': order.status,
+            'items': [
+                {
+                    'product_name': item.product.name,
+                    'quantity': item.quantity,
+                    'rate': str(item.unit_price),
+                    'subtotal': str(item.line_total)
+                }
+                for item in order.items.all()
+            ]
+        },
+        'user': {
+            'first_name': order.customer.first_name or 'Valued Customer',
+            'last_name': order.customer.last_name or '',
+            'email': order.customer.email
+        }
+    }
+
+    return email_service.send_notification_email(
+        to_email=entry.recipient or order.customer.email,
+        subject=f"Order Confirmation - #{order.order_number}",
+        template_name='order_confirmation',
+        context=context,
+        user=order.customer,
+        notification_type=NotificationTemplate.NotificationType.ORDER_CONFIRMATION
+    )
+
+
+# notification_type -> callable(entry) returning True when sent
+OUTBOX_HANDLERS: Dict[str, Callable[[NotificationOutbox], bool]] = {
+    NotificationTemplate.NotificationType.ORDER_CONFIRMATION: send_order_confirmation,
+}
+
+
+class OutboxService:
+    """Record and dispatch outbox notifications"""
+
+    @staticmethod
+    def enqueue(
+        notification_type: str,
+        user=None,
+        recipient: str = '',
+        order: Optional[RentalOrder] = None,
+        payload: Optional[Dict] = None,
+        channel: str = NotificationTemplate.Channel.EMAIL
+    ) -> NotificationOutbox:
+        """
+        Record a notification in the current transaction. A drain is
+        requested once the transaction commits; if the broker is down the
+        periodic drain still picks the row up.
+        """
+        entry = NotificationOutbox.objects.create(
+            notification_type=notification_type,
+            channel=channel,
+            user=user,
+            recipient=recipient,
+            order=order,
+            payload=payload or {}
+        )
+        transaction.on_commit(OutboxService.request_drain)
+        return entry
+
+    @staticmethod
+    def request_drain():
+        try:
+            from apps.notifications.tasks import drain_notification_outbox
+            drain_notification_outbox.delay()
+        except Exception as e:
+            logger.warning(f"Could not queue outbox drain, leaving it to the periodic run: {str(e)}")
+
+    @staticmethod
+    def claim_batch(batch_size: int = 50) -> List[NotificationOutbox]:
+        """
+        Claim up to ``batch_size`` due rows: pending rows whose time has
+        come and processing rows whose claim went stale. Rows locked by
+        another worker's claim are skipped, not waited on.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            entries = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+                    Q(status=NotificationOutbox.Status.PENDING, available_at__lte=now) |
+                    Q(status=NotificationOutbox.Status.PROCESSING, claimed_at__lt=now - STALE_CLAIM_AFTER)
+                ).order_by('available_at')[:batch_size]
+            )
+            if not entries:
+                return []
+
+            NotificationOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+                status=NotificationOutbox.Status.PROCESSING,
+                claimed_at=now,
+                attempts=F('attempts') + 1
+            )
+        for entry in entries:
+            entry.status = NotificationOutbox.Status.PROCESSING
+            entry.claimed_at = now
+            entry.attempts += 1
+        return entries
+
+    @staticmethod
+    def dispatch(entry: NotificationOutbox) -> bool:
+        """Send one claimed entry and record the outcome"""
+        handler = OUTBOX_HANDLERS.get(entry.notification_type)
+        try:
+            if handler is None:
+                raise LookupError(f"No outbox handler for {entry.notification_type}")
+            if not handler(entry):
+                raise RuntimeError('Provider reported failure')
+        except Exception as e:
+            OutboxService.record_failure(entry, str(e))
+            return False
+
+        NotificationOutbox.objects.filter(pk=entry.pk).update(
+            status=NotificationOutbox.Status.SENT,
+            sent_at=timezone.now(),
+            last_error=''
+        )
+        return True
+
+    @staticmethod
+    def record_failure(entry: NotificationOutbox, error: str):
+        """Schedule a retry with exponential backoff, or give up after max_attempts"""
+        if entry.attempts >= entry.max_attempts:
+            NotificationOutbox.objects.filter(pk=entry.pk).update(
+                status=NotificationOutbox.Status.FAILED,
+                last_error=error
+            )
+            logger.error(f"Outbox notification {entry.pk} failed permanently: {error}")
+            return
+
+        NotificationOutbox.objects.filter(pk=entry.pk).update(
+            status=NotificationOutbox.Status.PENDING,
+            available_at=timezone.now() + RETRY_BACKOFF * (2 ** (entry.attempts - 1)),
+            last_error=error
+        )
+        logger.warning(f"Outbox notification {entry.pk} attempt {entry.attempts} failed: {error}")
+
+    @staticmethod
+    def drain(batch_size: int = 50, max_batches: int = 20) -> Dict:
+        """
+        Claim and dispatch batches until nothing is due or ``max_batches``
+        have run.
+
+        Returns {'claimed': int, 'sent': int, 'failed': int}
+        """
+        stats = {'claimed': 0, 'sent': 0, 'failed': 0}
+        for _ in range(max_batches):
+            entries = OutboxService.claim_batch(batch_size)
+            if not entries:
+                break
+            stats['claimed'] += len(entries)
+            for entry in entries:
+                if OutboxService.dispatch(entry):
+                    stats['sent'] += 1
+                else:
+                    stats['failed'] += 1
+        return stats
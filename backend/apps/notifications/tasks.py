@@ -494,9 +494,14 @@ def check_upcoming_returns():
 
 @shared_task
 def check_overdue_returns():
-    """Check for overdue returns and send overdue notices"""
+    """Accrue late fees on overdue rentals and send overdue notices"""
+    from apps.pricing.late_fees import LateFeeEngine
+    
     today = timezone.now().date()
     
+    # One batch pass prices every overdue order and stores the fees
+    late_fees = LateFeeEngine().run()['fees']
+    
     overdue_orders = RentalOrder.objects.filter(
         rental_end__date__lt=today,
         status__in=['ACTIVE', 'PICKED_UP']
@@ -508,9 +513,22 @@ def check_overdue_returns():
         
         # Send overdue notice every 3 days
         if days_overdue % 3 == 0:
-            late_fee = days_overdue * 100  # ₹100 per day late fee
-            send_overdue_notice_email.delay(order.id, days_overdue, late_fee)
+            late_fee = late_fees.get(order.id, order.late_fee_amount)
+            send_overdue_notice_email.delay(order.id, days_overdue, float(late_fee))
             sent_count += 1
     
     logger.info(f"Sent {sent_count} overdue notice emails")
     return sent_count
+
+
+@shared_task
+def drain_notification_outbox():
+    """Dispatch due notifications from the transactional outbox"""
+    from apps.notifications.services import OutboxService
+    
+    stats = OutboxService.drain()
+    if stats['claimed']:
+        logger.info(
+            f"Outbox drain: {stats['sent']} sent, {stats['failed']} failed of {stats['claimed']} claimed"
+        )
+    return stats
@@ -4,7 +4,7 @@ from django.urls import reverse
 from django.utils import timezone
 from .models import (
     RentalQuote, QuoteItem, RentalOrder, RentalItem, 
-    Reservation, ReservationItem, RentalContract
+    Reservation, ReservationItem, RentalContract, ProductCapacityBucket
 )
 
 
@@ -25,15 +25,19 @@ class RentalQuoteAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'created_at', 'valid_until')
     search_fields = ('quote_number', 'customer__username', 'customer__email')
-    readonly_fields = ('quote_number', 'created_at', 'updated_at')
+    readonly_fields = ('quote_number', 'price_list_version', 'created_at', 'updated_at')
     inlines = [QuoteItemInline]
+    actions = ['reprice_quotes']
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('quote_number', 'customer', 'created_by', 'status', 'valid_until')
         }),
         ('Pricing', {
-            'fields': ('price_list', 'subtotal', 'discount_amount', 'tax_amount', 'total_amount', 'currency')
+            'fields': (
+                'price_list', 'price_list_version', 'subtotal', 'discount_amount',
+                'tax_amount', 'total_amount', 'currency'
+            )
         }),
         ('Additional Information', {
             'fields': ('notes', 'terms_conditions', 'metadata'),
@@ -47,6 +51,18 @@ class RentalQuoteAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('customer', 'created_by', 'price_list')
+    
+    def reprice_quotes(self, request, queryset):
+        from apps.orders.repricing import OPEN_STATUSES, QuoteRepricingService
+        report = QuoteRepricingService.reprice(
+            queryset.filter(status__in=OPEN_STATUSES).values_list('pk', flat=True)
+        )
+        self.message_user(
+            request,
+            f"{report['changed_quotes']} of {report['quotes']} open quotes re-priced "
+            f"({report['changed_items']} lines changed, total {report['total_before']} -> {report['total_after']})."
+        )
+    reprice_quotes.short_description = "Re-price selected open quotes"
 
 
 class RentalItemInline(admin.TabularInline):
@@ -67,7 +83,7 @@ class RentalOrderAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'created_at', 'rental_start', 'rental_end')
     search_fields = ('order_number', 'customer__username', 'customer__email')
-    readonly_fields = ('order_number', 'created_at', 'updated_at', 'rental_duration_days')
+    readonly_fields = ('order_number', 'price_list_version', 'created_at', 'updated_at', 'rental_duration_days')
     inlines = [RentalItemInline]
     
     fieldsets = (
@@ -82,7 +98,7 @@ class RentalOrderAdmin(admin.ModelAdmin):
         }),
         ('Pricing', {
             'fields': (
-                'price_list', 'subtotal', 'discount_amount', 'tax_amount',
+                'price_list', 'price_list_version', 'subtotal', 'discount_amount', 'tax_amount',
                 'deposit_amount', 'late_fee_amount', 'total_amount', 'currency'
             )
         }),
@@ -135,6 +151,15 @@ class RentalOrderAdmin(admin.ModelAdmin):
                 count += 1
         self.message_user(request, f"{count} orders marked as returned.")
     mark_as_returned.short_description = "Mark selected orders as returned"
+    
+    def calculate_late_fees(self, request, queryset):
+        from apps.pricing.late_fees import OVERDUE_STATUSES, LateFeeEngine
+        report = LateFeeEngine().run(queryset.filter(status__in=OVERDUE_STATUSES))
+        self.message_user(
+            request,
+            f"Late fees assessed for {report['orders']} open orders ({report['updated']} updated)."
+        )
+    calculate_late_fees.short_description = "Recalculate late fees"
 
 
 class ReservationItemInline(admin.TabularInline):
@@ -234,3 +259,14 @@ class ReservationItemAdmin(admin.ModelAdmin):
     list_filter = ('start_datetime', 'end_datetime')
     search_fields = ('reservation__order__order_number', 'product__name')
     readonly_fields = ('created_at',)
+
+
+@admin.register(ProductCapacityBucket)
+class ProductCapacityBucketAdmin(admin.ModelAdmin):
+    list_display = (
+        'product', 'granularity', 'bucket_start', 'reserved_quantity',
+        'active_quantity', 'maintenance_quantity'
+    )
+    list_filter = ('granularity', 'bucket_start')
+    search_fields = ('product__name', 'product__sku')
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,162 @@
+"""
+Overbooking-safe reservation allocation.
+
+Checking availability and then inserting reservation items is a classic
+check-then-act race: two conversions for the last unit can both pass the
+check before either inserts. Allocation closes that gap by locking the
+requested product rows (in id order, so overlapping baskets cannot
+deadlock) before checking, and keeping the lock until the surrounding
+transaction commits.
+
+Locks are per product, so conversions touching different products never
+wait on each other. On backends without ``SELECT ... FOR UPDATE`` (SQLite)
+the product rows are touched with a no-op UPDATE instead, which takes the
+database write lock and serializes allocators there.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from apps.catalog.inventory import InventoryLedger
+from apps.catalog.models import Product
+from apps.orders.capacity import CapacityService
+from apps.orders.models import RentalItem, RentalOrder, Reservation, ReservationItem
+from apps.orders.services import AvailabilityService
+
+
+class AllocationError(Exception):
+    """Raised when a basket cannot be reserved; ``issues`` lists the failing lines"""
+
+    def __init__(self, issues: List[Dict]):
+        self.issues = issues
+        super().__init__('Availability issues')
+
+
+def lock_products(product_ids: Iterable) -> None:
+    """
+    Lock the product rows until the current transaction ends.
+
+    Must be called inside ``transaction.atomic``.
+    """
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return
+
+    if connection.features.has_select_for_update:
+        # NO KEY UPDATE still lets unrelated inserts reference the product
+        locking = Product.objects.filter(id__in=ids).order_by('id')
+        if connection.features.has_select_for_no_key_update:
+            locking = locking.select_for_update(no_key=True)
+        else:
+            locking = locking.select_for_update()
+        list(locking.values_list('id', flat=True))
+    else:
+        Product.objects.filter(id__in=ids).update(quantity_on_hand=F('quantity_on_hand'))
+
+
+class ReservationAllocator:
+    """Reserve stock for orders without overbooking"""
+
+    @staticmethod
+    def check_and_lock(lines: List[Dict], exclude_order_id: Optional[str] = None) -> List[Dict]:
+        """
+        Lock the products in ``lines`` and check them as one basket.
+
+        ``lines`` uses the batch_check_availability shape. Raises
+        AllocationError if any line is short; otherwise returns the
+        per-line results. The locks are held until the caller's
+        transaction commits, so anything reserved in that transaction is
+        safe from concurrent allocators.
+        """
+        lock_products(line['product_id'] for line in lines)
+
+        results = AvailabilityService.batch_check_availability(lines, exclude_order_id)
+        issues = [
+            {
+                'line': result['line'],
+                'product_id': result['product_id'],
+                'issue': result.get('error') or (
+                    f"Insufficient quantity. Available: {result['available_quantity']}, "
+                    f"Requested: {result['requested_quantity']}"
+                ),
+                'available_quantity': result.get('available_quantity', 0),
+                'requested_quantity': result['requested_quantity'],
+                'conflicts': result.get('conflicts', []),
+            }
+            for result in results if not result['available']
+        ]
+        if issues:
+            raise AllocationError(issues)
+        return results
+
+    @staticmethod
+    def reserve(orders: List[Tuple[RentalOrder, List[RentalItem]]]) -> List[Reservation]:
+        """
+        Reserve the given items of each order as one basket, creating one
+        reservation per order.
+
+        All lines are checked together under one set of product locks, so
+        orders in the same batch compete with each other as well as with
+        existing reservations. Raises AllocationError (rolling everything
+        back) if any line is short; issues carry the owning order_number.
+        """
+        lines = []
+        owners = []
+        for order, order_items in orders:
+            for item in order_items:
+                lines.append({
+                    'product_id': item.product_id,
+                    'start_datetime': item.start_datetime,
+                    'end_datetime': item.end_datetime,
+                    'quantity': item.quantity,
+                })
+                owners.append(order)
+
+        with transaction.atomic():
+            try:
+                ReservationAllocator.check_and_lock(lines)
+            except AllocationError as e:
+                for issue in e.issues:
+                    issue['order_number'] = owners[issue['line']].order_number
+                raise
+
+            reservations = Reservation.objects.bulk_create([
+                Reservation(
+                    order=order,
+                    status=Reservation.Status.RESERVED,
+                    return_due_at=order.rental_end,
+                    pickup_location=order.pickup_address,
+                    return_location=order.return_address
+                )
+                for order, _ in orders
+            ])
+            reservation_items = ReservationItem.objects.bulk_create(
+                [
+                    ReservationItem(
+                        reservation=reservation,
+                        product_id=item.product_id,
+                        quantity=item.quantity,
+                        start_datetime=item.start_datetime,
+                        end_datetime=item.end_datetime
+                    )
+                    for reservation, (_, order_items) in zip(reservations, orders)
+                    for item in order_items
+                ],
+                batch_size=500
+            )
+            # bulk_create bypasses the capacity and inventory signals
+            CapacityService.apply_items(
+                reservation_items,
+                CapacityService.column_for_status(Reservation.Status.RESERVED)
+            )
+            InventoryLedger.move_items(reservation_items, None, Reservation.Status.RESERVED)
+
+        return reservations
+
+    @staticmethod
+    def reserve_order(order: RentalOrder, order_items: Optional[List[RentalItem]] = None) -> Reservation:
+        """Reserve every item of ``order``; see reserve()"""
+        if order_items is None:
+            order_items = list(order.items.all())
+        return ReservationAllocator.reserve([(order, order_items)])[0]
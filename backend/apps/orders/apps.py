@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.orders'
+    
+    def ready(self):
+        # Import signal handlers when app is ready
+        try:
+            import apps.orders.signals
+        except ImportError:
+            pass
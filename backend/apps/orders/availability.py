@@ -0,0 +1,244 @@
+"""
+Interval-based availability engine.
+
+Reservations are half-open intervals ``[start, end)`` carrying a quantity.
+Usage at any instant is the sum of the quantities covering that instant, so
+the question "can N more units be rented between X and Y" is answered by the
+peak of that step function over the window, not by the plain sum of every
+overlapping reservation.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from apps.orders.models import ReservationItem
+
+# Reservation statuses that hold stock
+ACTIVE_RESERVATION_STATUSES = ['RESERVED', 'ACTIVE']
+
+Interval = Tuple[datetime, datetime, int]
+
+
+def load_reservation_items(
+    product_ids: Iterable,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    exclude_order_id: Optional[str] = None,
+    with_conflict_details: bool = True
+) -> List[ReservationItem]:
+    """
+    Fetch every stock-holding reservation item overlapping the window for
+    the given products in a single query. By default the order and customer
+    are joined so conflict reporting does not hit the database again.
+    """
+    queryset = ReservationItem.objects.filter(
+        product_id__in=list(product_ids),
+        start_datetime__lt=end_datetime,
+        end_datetime__gt=start_datetime,
+        reservation__status__in=ACTIVE_RESERVATION_STATUSES
+    )
+    if with_conflict_details:
+        queryset = queryset.select_related('reservation__order__customer')
+
+    if exclude_order_id:
+        queryset = queryset.exclude(reservation__order_id=exclude_order_id)
+
+    return list(queryset)
+
+
+def to_intervals(reservation_items: Iterable[ReservationItem]) -> List[Interval]:
+    """Convert reservation items to ``(start, end, quantity)`` tuples"""
+    return [
+        (item.start_datetime, item.end_datetime, item.quantity)
+        for item in reservation_items
+    ]
+
+
+def _clipped_events(
+    intervals: Iterable[Interval],
+    window_start: datetime,
+    window_end: datetime
+) -> List[Tuple[datetime, int]]:
+    """
+    Clip intervals to the window and return their sorted endpoint events.
+
+    Sorting ``(time, delta)`` places releases before acquisitions at the same
+    instant, which is what half-open intervals need: a rental ending at 10:00
+    frees its unit for one starting at 10:00.
+    """
+    events = []
+    for start, end, quantity in intervals:
+        start = max(start, window_start)
+        end = min(end, window_end)
+        if start < end:
+            events.append((start, quantity))
+            events.append((end, -quantity))
+
+    events.sort()
+    return events
+
+
+def peak_usage(
+    intervals: Iterable[Interval],
+    window_start: datetime,
+    window_end: datetime
+) -> int:
+    """Return the maximum concurrent quantity in use during the window"""
+    peak = current = 0
+    for _, delta in _clipped_events(intervals, window_start, window_end):
+        current += delta
+        if current > peak:
+            peak = current
+    return peak
+
+
+def usage_profile(
+    intervals: Iterable[Interval],
+    window_start: datetime,
+    window_end: datetime
+) -> List[Tuple[datetime, int]]:
+    """
+    Return the usage step function over the window as ``(time, usage)``
+    breakpoints. Each usage level holds from its time until the next
+    breakpoint, the last one until ``window_end``.
+    """
+    profile = [(window_start, 0)]
+    current = 0
+    for time, delta in _clipped_events(intervals, window_start, window_end):
+        current += delta
+        if time == profile[-1][0]:
+            profile[-1] = (time, current)
+        else:
+            profile.append((time, current))
+    return profile
+
+
+def _offsets_nearest_zero(low: int, high: int, limit: int) -> List[int]:
+    """Up to ``limit`` integers in ``[low, high]`` ordered by distance from zero"""
+    if low > high:
+        return []
+    if low >= 0:
+        return list(range(low, min(high, low + limit - 1) + 1))
+    if high <= 0:
+        return list(range(high, max(low, high - limit + 1) - 1, -1))
+    candidates = range(max(low, -limit), min(high, limit) + 1)
+    return sorted(candidates, key=lambda offset: (abs(offset), offset))[:limit]
+
+
+def find_free_windows(
+    intervals: List[Interval],
+    capacity: int,
+    quantity: int,
+    duration: timedelta,
+    anchor: datetime,
+    step: timedelta,
+    horizon_start: datetime,
+    horizon_end: datetime,
+    limit: int = 10,
+    include_anchor: bool = False
+) -> List[Dict]:
+    """
+    Find the windows of ``duration`` nearest to ``anchor`` that can take
+    ``quantity`` more units.
+
+    Candidate starts are ``anchor + k * step`` inside the horizon. Rather
+    than testing each candidate, the usage step function is split into free
+    gaps (usage leaves room for ``quantity``) and the feasible ``k`` range of
+    every gap long enough for ``duration`` is computed directly.
+
+    Returns up to ``limit`` windows ordered by distance from the anchor:
+    [{'start_datetime': dt, 'end_datetime': dt, 'available_quantity': int}]
+    """
+    allowed_usage = capacity - quantity
+    if allowed_usage < 0 or duration <= timedelta(0) or step <= timedelta(0):
+        return []
+
+    gaps = []
+    gap_start = None
+    for time, usage in usage_profile(intervals, horizon_start, horizon_end):
+        if usage <= allowed_usage:
+            if gap_start is None:
+                gap_start = time
+        elif gap_start is not None:
+            gaps.append((gap_start, time))
+            gap_start = None
+    if gap_start is not None:
+        gaps.append((gap_start, horizon_end))
+
+    offsets = []
+    for gap_start, gap_end in gaps:
+        if gap_end - gap_start < duration:
+            continue
+        # Smallest k with anchor + k*step >= gap_start, largest with the
+        # window still ending inside the gap
+        low = -((anchor - gap_start) // step)
+        high = (gap_end - duration - anchor) // step
+        offsets.extend(_offsets_nearest_zero(low, high, limit + 1))
+
+    if not include_anchor:
+        offsets = [offset for offset in offsets if offset != 0]
+    offsets = sorted(set(offsets), key=lambda offset: (abs(offset), offset))[:limit]
+
+    windows = []
+    for offset in offsets:
+        start = anchor + step * offset
+        end = start + duration
+        windows.append({
+            'start_datetime': start,
+            'end_datetime': end,
+            'available_quantity': capacity - peak_usage(intervals, start, end)
+        })
+    return windows
+
+
+def bucket_usage(
+    intervals: Iterable[Interval],
+    range_start: datetime,
+    range_end: datetime,
+    bucket: timedelta
+) -> List[Tuple[datetime, int, int]]:
+    """
+    Return ``(bucket_start, min_usage, peak_usage)`` for consecutive buckets
+    of the given size covering the range.
+
+    The usage step function is built once and walked in step with the
+    buckets, so the cost is linear in reservations plus buckets, whatever
+    the length of the range.
+    """
+    profile = usage_profile(intervals, range_start, range_end)
+    rows = []
+    index = 0
+    bucket_start = range_start
+    while bucket_start < range_end:
+        bucket_end = min(bucket_start + bucket, range_end)
+
+        # Segment in force at the start of the bucket
+        while index + 1 < len(profile) and profile[index + 1][0] <= bucket_start:
+            index += 1
+        low = high = profile[index][1]
+
+        # Segments starting inside the bucket
+        cursor = index + 1
+        while cursor < len(profile) and profile[cursor][0] < bucket_end:
+            usage = profile[cursor][1]
+            if usage < low:
+                low = usage
+            if usage > high:
+                high = usage
+            cursor += 1
+
+        rows.append((bucket_start, low, high))
+        bucket_start = bucket_end
+    return rows
+
+
+def describe_conflict(item: ReservationItem) -> Dict:
+    """Conflict payload for a reservation item loaded via load_reservation_items"""
+    reservation = item.reservation
+    return {
+        'reservation_id': str(reservation.id),
+        'order_number': reservation.order.order_number,
+        'customer': reservation.order.customer.username,
+        'quantity': item.quantity,
+        'start_datetime': item.start_datetime.isoformat(),
+        'end_datetime': item.end_datetime.isoformat(),
+    }
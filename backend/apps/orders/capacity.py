@@ -0,0 +1,315 @@
+"""
+Materialized capacity table maintenance and lookups.
+
+ProductCapacityBucket holds, per product and hour/day bucket, the units held
+by reservations touching that bucket, split by reservation state. Rows are
+adjusted with atomic increments whenever reservations change, so questions
+like "which products have N units free between X and Y" become indexed range
+scans over the buckets instead of interval scans over ReservationItem.
+
+Bucket figures are conservative: a reservation counts against every bucket
+it touches, even partially. Exact answers still come from the sweep engine
+in apps.orders.availability.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import F, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.orders.models import ProductCapacityBucket, Reservation, ReservationItem
+
+BUCKET_SIZES = {
+    ProductCapacityBucket.Granularity.HOUR: timedelta(hours=1),
+    ProductCapacityBucket.Granularity.DAY: timedelta(days=1),
+}
+
+# Which counter a reservation in a given status occupies
+STATUS_COLUMNS = {
+    Reservation.Status.RESERVED: 'reserved_quantity',
+    Reservation.Status.ACTIVE: 'active_quantity',
+}
+
+MAINTENANCE_COLUMN = 'maintenance_quantity'
+
+# Availability windows longer than this are checked against day buckets
+LONG_WINDOW = timedelta(days=31)
+
+
+def floor_bucket(moment: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing ``moment``"""
+    if granularity == ProductCapacityBucket.Granularity.DAY:
+        local = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Floor in UTC: an hour floored in a +05:30 offset starts at :30 UTC
+    # and would never match the bucket of the same instant read back from
+    # the database
+    if timezone.is_aware(moment):
+        moment = moment.astimezone(dt_timezone.utc)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_starts(start: datetime, end: datetime, granularity: str) -> List[datetime]:
+    """Starts of every bucket touched by ``[start, end)``"""
+    size = BUCKET_SIZES[granularity]
+    starts = []
+    current = floor_bucket(start, granularity)
+    while current < end:
+        starts.append(current)
+        current += size
+    return starts
+
+
+class CapacityService:
+    """Maintain and query the materialized capacity table"""
+
+    @staticmethod
+    def column_for_status(status: Optional[str]) -> Optional[str]:
+        return STATUS_COLUMNS.get(status)
+
+    @staticmethod
+    def apply(product_id, start: datetime, end: datetime, column: str, delta: int):
+        """Add ``delta`` to ``column`` for every bucket the window touches, at every granularity"""
+        if not delta or start >= end:
+            return
+        CapacityService.apply_deltas({
+            (product_id, granularity, bucket_start): delta
+            for granularity in BUCKET_SIZES
+            for bucket_start in bucket_starts(start, end, granularity)
+        }, column)
+
+    @staticmethod
+    def apply_items(items: Iterable[ReservationItem], column: Optional[str], sign: int = 1):
+        """Apply a set of reservation items to one counter"""
+        if column is None:
+            return
+        deltas = defaultdict(int)
+        for item in items:
+            for granularity in BUCKET_SIZES:
+                for bucket_start in bucket_starts(item.start_datetime, item.end_datetime, granularity):
+                    deltas[(item.product_id, granularity, bucket_start)] += sign * item.quantity
+        CapacityService.apply_deltas(deltas, column)
+
+    @staticmethod
+    def apply_deltas(deltas: Dict, column: str):
+        """
+        Add per-bucket deltas, keyed ``(product_id, granularity, bucket_start)``.
+
+        Missing rows are created in one bulk insert (ignoring races with
+        concurrent creators). Consecutive buckets sharing a delta are merged
+        into ranges and every range with the same delta goes into a single
+        ``UPDATE ... SET col = col + delta``, so the query count depends on
+        the number of distinct deltas, not on the number of items.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        by_series = defaultdict(list)
+        for (product_id, granularity, bucket_start), delta in deltas.items():
+            by_series[(product_id, granularity)].append((bucket_start, delta))
+
+        ranges_by_delta = defaultdict(list)
+        for (product_id, granularity), buckets in by_series.items():
+            buckets.sort()
+            size = BUCKET_SIZES[granularity]
+            first, last, delta = buckets[0][0], buckets[0][0], buckets[0][1]
+            for bucket_start, bucket_delta in buckets[1:]:
+                if bucket_delta == delta and bucket_start - last == size:
+                    last = bucket_start
+                    continue
+                ranges_by_delta[delta].append((product_id, granularity, first, last))
+                first, last, delta = bucket_start, bucket_start, bucket_delta
+            ranges_by_delta[delta].append((product_id, granularity, first, last))
+
+        with transaction.atomic():
+            ProductCapacityBucket.objects.bulk_create(
+                [
+                    ProductCapacityBucket(
+                        product_id=product_id,
+                        granularity=granularity,
+                        bucket_start=bucket_start
+                    )
+                    for product_id, granularity, bucket_start in deltas
+                ],
+                batch_size=500,
+                ignore_conflicts=True
+            )
+
+            for delta, ranges in ranges_by_delta.items():
+                condition = Q()
+                for product_id, granularity, first, last in ranges:
+                    condition |= Q(
+                        product_id=product_id,
+                        granularity=granularity,
+                        bucket_start__gte=first,
+                        bucket_start__lte=last
+                    )
+                ProductCapacityBucket.objects.filter(condition).update(
+                    **{column: F(column) + delta}
+                )
+
+    @staticmethod
+    def move_reservation(reservation: Reservation, previous_status: Optional[str], new_status: Optional[str]):
+        """Move a reservation's items between counters after a status change"""
+        old_column = CapacityService.column_for_status(previous_status)
+        new_column = CapacityService.column_for_status(new_status)
+        if old_column == new_column:
+            return
+
+        items = list(reservation.items.all())
+        with transaction.atomic():
+            CapacityService.apply_items(items, old_column, -1)
+            CapacityService.apply_items(items, new_column, 1)
+
+    @staticmethod
+    def add_maintenance_window(product_id, start: datetime, end: datetime, quantity: int):
+        """Take ``quantity`` units out of service for the window"""
+        CapacityService.apply(product_id, start, end, MAINTENANCE_COLUMN, quantity)
+
+    @staticmethod
+    def remove_maintenance_window(product_id, start: datetime, end: datetime, quantity: int):
+        """Return units taken out with add_maintenance_window"""
+        CapacityService.apply(product_id, start, end, MAINTENANCE_COLUMN, -quantity)
+
+    @staticmethod
+    def used_quantity_expression():
+        return F('reserved_quantity') + F('active_quantity') + F('maintenance_quantity')
+
+    @staticmethod
+    def bucket_range(
+        product_ids: Optional[Iterable],
+        start: datetime,
+        end: datetime,
+        granularity: str = ProductCapacityBucket.Granularity.HOUR
+    ):
+        """Queryset of the buckets a window touches, optionally for some products"""
+        starts = bucket_starts(start, end, granularity)
+        queryset = ProductCapacityBucket.objects.filter(
+            granularity=granularity,
+            bucket_start__gte=starts[0] if starts else start,
+            bucket_start__lt=end
+        )
+        if product_ids is not None:
+            queryset = queryset.filter(product_id__in=list(product_ids))
+        return queryset
+
+    @staticmethod
+    def peak_usage(
+        product_ids: Iterable,
+        start: datetime,
+        end: datetime,
+        granularity: str = ProductCapacityBucket.Granularity.HOUR
+    ) -> Dict:
+        """
+        Peak units in use per product over the window, from one indexed
+        range scan. Products without buckets are absent (zero usage).
+        """
+        rows = CapacityService.bucket_range(
+            product_ids, start, end, granularity
+        ).values('product_id').annotate(
+            peak=Max(CapacityService.used_quantity_expression())
+        )
+        return {row['product_id']: row['peak'] or 0 for row in rows}
+
+    @staticmethod
+    def window_granularity(start: datetime, end: datetime) -> str:
+        """
+        Hour buckets give tight peaks; windows longer than
+        LONG_WINDOW use the coarser (conservative) day buckets to bound the scan.
+        """
+        if end - start > LONG_WINDOW:
+            return ProductCapacityBucket.Granularity.DAY
+        return ProductCapacityBucket.Granularity.HOUR
+
+    @staticmethod
+    def peak_usage_subquery(start: datetime, end: datetime, granularity: Optional[str] = None):
+        """
+        Correlated subquery (on the outer product ``pk``) giving the peak
+        units in use over the window, 0 when the product has no buckets.
+        """
+        granularity = granularity or CapacityService.window_granularity(start, end)
+        peaks = CapacityService.bucket_range(None, start, end, granularity).filter(
+            product_id=OuterRef('pk')
+        ).values('product_id').annotate(
+            peak=Max(CapacityService.used_quantity_expression())
+        ).values('peak')
+        return Coalesce(Subquery(peaks[:1], output_field=IntegerField()), 0)
+
+    @staticmethod
+    def filter_available(product_queryset, start: datetime, end: datetime, quantity: int = 1):
+        """
+        Products with at least ``quantity`` units free for the whole window,
+        decided in the same query as the rest of the product filters.
+        """
+        return product_queryset.annotate(
+            window_peak_usage=CapacityService.peak_usage_subquery(start, end)
+        ).filter(quantity_on_hand__gte=F('window_peak_usage') + quantity)
+
+    @staticmethod
+    def rebuild(product_ids: Optional[Iterable] = None, since: Optional[datetime] = None) -> Dict:
+        """
+        Recompute reserved/active counters from reservations.
+
+        Counters from ``since`` (default: the start of today) onwards are
+        reset and rebuilt with a single bulk upsert; maintenance counts
+        are kept. Buckets before ``since`` and rows left empty are deleted.
+
+        Returns {'products': int, 'buckets': int, 'pruned': int}
+        """
+        if since is None:
+            since = floor_bucket(timezone.now(), ProductCapacityBucket.Granularity.DAY)
+
+        items = ReservationItem.objects.filter(
+            end_datetime__gt=since,
+            reservation__status__in=list(STATUS_COLUMNS)
+        ).select_related('reservation').only(
+            'product', 'quantity', 'start_datetime', 'end_datetime', 'reservation__status'
+        )
+        scope = ProductCapacityBucket.objects.all()
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            items = items.filter(product_id__in=product_ids)
+            scope = scope.filter(product_id__in=product_ids)
+
+        totals = defaultdict(lambda: {'reserved_quantity': 0, 'active_quantity': 0})
+        products = set()
+        for item in items.iterator(chunk_size=2000):
+            column = STATUS_COLUMNS[item.reservation.status]
+            products.add(item.product_id)
+            for granularity in BUCKET_SIZES:
+                for bucket_start in bucket_starts(max(item.start_datetime, since), item.end_datetime, granularity):
+                    totals[(item.product_id, granularity, bucket_start)][column] += item.quantity
+
+        with transaction.atomic():
+            pruned, _ = scope.filter(bucket_start__lt=since).delete()
+            scope.filter(bucket_start__gte=since).update(reserved_quantity=0, active_quantity=0)
+
+            ProductCapacityBucket.objects.bulk_create(
+                [
+                    ProductCapacityBucket(
+                        product_id=product_id,
+                        granularity=granularity,
+                        bucket_start=bucket_start,
+                        **counters
+                    )
+                    for (product_id, granularity, bucket_start), counters in totals.items()
+                ],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['product', 'granularity', 'bucket_start'],
+                update_fields=['reserved_quantity', 'active_quantity']
+            )
+
+            emptied, _ = scope.filter(
+                reserved_quantity=0, active_quantity=0, maintenance_quantity=0
+            ).delete()
+
+        return {
+            'products': len(products),
+            'buckets': len(totals),
+            'pruned': pruned + emptied
+        }
@@ -0,0 +1,143 @@
+"""
+Quote to order conversion.
+
+Conversion works on quotes whose items are already loaded (prefetched by
+the caller), builds every order and order item in memory with line totals
+computed up front, and writes them with ``bulk_create``. Stock is reserved
+through ReservationAllocator in the same transaction, so a batch either
+converts completely or not at all.
+"""
+from typing import Iterable, List
+
+from django.db import transaction
+
+from apps.orders.allocation import AllocationError, ReservationAllocator
+from apps.orders.models import RentalItem, RentalOrder, RentalQuote
+from apps.pricing.versions import PriceListVersions
+from apps.sequences.services import SequenceService
+
+# Upper bound for one convert_batch request
+MAX_BATCH_QUOTES = 100
+
+
+class QuoteConversionService:
+    """Turn confirmed quotes into reserved rental orders"""
+
+    @staticmethod
+    def convert(quote: RentalQuote, user, **options) -> RentalOrder:
+        """Convert a single quote; see convert_many() for ``options``"""
+        return QuoteConversionService.convert_many([quote], user, **options)[0]
+
+    @staticmethod
+    def convert_many(
+        quotes: Iterable[RentalQuote],
+        user,
+        rental_start=None,
+        rental_end=None,
+        pickup_address: str = '',
+        return_address: str = ''
+    ) -> List[RentalOrder]:
+        """
+        Convert confirmed quotes to orders in one transaction.
+
+        ``quotes`` should come with ``items`` prefetched. When no rental
+        period is given, each order spans its quote's item windows.
+
+        Raises ValueError for quotes that are not confirmed or have no
+        items, and AllocationError (issues tagged with quote_number) when
+        stock is short; nothing is written in either case.
+        """
+        quotes = list(quotes)
+        quote_items = {quote.id: list(quote.items.all()) for quote in quotes}
+
+        invalid = [
+            quote.quote_number for quote in quotes
+            if quote.status != RentalQuote.Status.CONFIRMED or not quote_items[quote.id]
+        ]
+        if invalid:
+            raise ValueError(
+                f"Only confirmed quotes with items can be converted: {', '.join(invalid)}"
+            )
+
+        with transaction.atomic():
+            numbers = SequenceService.allocate_numbers(
+                'RO', RentalOrder, 'order_number', len(quotes)
+            )
+            orders = [
+                RentalOrder(
+                    order_number=number,
+                    quote=quote,
+                    customer_id=quote.customer_id,
+                    created_by=user,
+                    status=RentalOrder.Status.RESERVED,
+                    rental_start=rental_start or min(
+                        item.start_datetime for item in quote_items[quote.id]
+                    ),
+                    rental_end=rental_end or max(
+                        item.end_datetime for item in quote_items[quote.id]
+                    ),
+                    price_list_id=quote.price_list_id,
+                    price_list_version_id=(
+                        quote.price_list_version_id
+                        or PriceListVersions.current_version_id(quote.price_list_id)
+                    ),
+                    subtotal=quote.subtotal,
+                    discount_amount=quote.discount_amount,
+                    tax_amount=quote.tax_amount,
+                    total_amount=quote.total_amount,
+                    currency=quote.currency,
+                    pickup_address=pickup_address,
+                    return_address=return_address,
+                    notes=quote.notes
+                )
+                for quote, number in zip(quotes, numbers)
+            ]
+            RentalOrder.objects.bulk_create(orders)
+
+            order_items = [
+                QuoteConversionService.build_order_items(order, quote_items[quote.id])
+                for quote, order in zip(quotes, orders)
+            ]
+            RentalItem.objects.bulk_create(
+                [item for items in order_items for item in items],
+                batch_size=500
+            )
+
+            try:
+                ReservationAllocator.reserve(list(zip(orders, order_items)))
+            except AllocationError as e:
+                quote_numbers = {
+                    order.order_number: quote.quote_number
+                    for quote, order in zip(quotes, orders)
+                }
+                for issue in e.issues:
+                    issue['quote_number'] = quote_numbers[issue.pop('order_number')]
+                raise
+
+        return orders
+
+    @staticmethod
+    def build_order_items(order: RentalOrder, quote_items) -> List[RentalItem]:
+        """
+        Unsaved order items copied from quote items. Line totals are filled
+        in here, the way RentalItem.save() would, since bulk_create skips it.
+        """
+        items = []
+        for quote_item in quote_items:
+            item = RentalItem(
+                order=order,
+                product_id=quote_item.product_id,
+                quantity=quote_item.quantity,
+                rental_unit=quote_item.rental_unit,
+                unit_price=quote_item.unit_price,
+                discount_percent=quote_item.discount_percent,
+                discount_amount=quote_item.discount_amount,
+                line_total=quote_item.line_total,
+                start_datetime=quote_item.start_datetime,
+                end_datetime=quote_item.end_datetime,
+                notes=quote_item.notes
+            )
+            if not item.line_total:
+                item.calculate_line_total()
+            items.append(item)
+        return items
@@ -0,0 +1,47 @@
+"""
+Management command to rebuild the materialized product capacity table.
+Usage: python manage.py rebuild_capacity [--product 12 --product 15] [--since 2025-01-01]
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.capacity import CapacityService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild product capacity buckets from reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='products',
+            help='Only rebuild this product (may be given several times)'
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Rebuild buckets from this ISO date/datetime (default: start of today)'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be an ISO date or datetime')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        self.stdout.write("Rebuilding product capacity buckets...")
+
+        result = CapacityService.rebuild(product_ids=options['products'], since=since)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {result['buckets']} buckets for {result['products']} products "
+            f"({result['pruned']} stale buckets removed)"
+        ))
@@ -0,0 +1,69 @@
+"""
+Management command to re-price open quotes against the current price rules.
+Usage: python manage.py reprice_quotes [--product 12] [--category 3] [--price-list 2] [--dry-run]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.repricing import QuoteRepricingService
+
+
+class Command(BaseCommand):
+    help = 'Re-price DRAFT and SENT quotes in a price rule scope and report the changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='products',
+            help='Only quotes with a line on this product (may be given several times)'
+        )
+        parser.add_argument(
+            '--category',
+            action='append',
+            dest='categories',
+            help='Only quotes with a line in this category (may be given several times)'
+        )
+        parser.add_argument(
+            '--price-list',
+            action='append',
+            dest='price_lists',
+            help='Only quotes on this price list or without one (may be given several times)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the changes without writing them'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Re-pricing open quotes...")
+
+        report = QuoteRepricingService.run(
+            product_ids=options['products'],
+            category_ids=options['categories'],
+            price_list_ids=options['price_lists'],
+            dry_run=options['dry_run']
+        )
+
+        for diff in report['diffs']:
+            self.stdout.write(self.style.WARNING(
+                f"{diff['quote_number']}: {diff['total_before']} -> {diff['total_after']}"
+            ))
+            for item in diff['items']:
+                old_price, new_price = item['unit_price']
+                old_total, new_total = item['line_total']
+                self.stdout.write(
+                    f"  item {item['item_id']} (product {item['product_id']}): "
+                    f"unit {old_price} -> {new_price}, line {old_total} -> {new_total}"
+                )
+
+        summary = (
+            f"{report['changed_quotes']} of {report['quotes']} open quotes changed, "
+            f"{report['changed_items']} of {report['items']} lines, "
+            f"{report['unpriced_items']} lines without a rule kept; "
+            f"total {report['total_before']} -> {report['total_after']}"
+        )
+        if options['dry_run']:
+            summary += ' (dry run, nothing written)'
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_product_daily_rate'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCapacityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hourly'), ('DAY', 'Daily')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('reserved_quantity', models.IntegerField(default=0)),
+                ('active_quantity', models.IntegerField(default=0)),
+                ('maintenance_quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_buckets', to='catalog.product')),
+            ],
+            options={
+                'verbose_name': 'Product Capacity Bucket',
+                'verbose_name_plural': 'Product Capacity Buckets',
+                'db_table': 'product_capacity_buckets',
+                'ordering': ['product', 'granularity', 'bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'granularity', 'bucket_start'), name='unique_product_capacity_bucket')],
+            },
+        ),
+    ]
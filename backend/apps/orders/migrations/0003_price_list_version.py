@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_productcapacitybucket'),
+        ('pricing', '0003_pricelistversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentalquote',
+            name='price_list_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='pricing.pricelistversion'),
+        ),
+        migrations.AddField(
+            model_name='rentalorder',
+            name='price_list_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='pricing.pricelistversion'),
+        ),
+    ]
@@ -1,15 +1,36 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 import uuid
+from apps.sequences.services import SequenceService
 from apps.catalog.models import Product, ProductCategory
-from apps.pricing.models import PriceList
+from apps.pricing.models import PriceList, PriceListVersion
+from apps.pricing.versions import PriceListVersions
 from apps.accounts.models import UserProfile
+from utils.money import from_paise, to_paise
 
 User = get_user_model()
 
 
+def stamp_price_list_version(document):
+    """
+    Record the current version of a quote's or order's price list when the
+    document is created with a list or its list is changed. Documents from
+    before versioning keep a null stamp on later saves: stamping them with
+    today's version would claim they were priced against it. An existing
+    stamp is otherwise kept, also when the list itself is deleted later.
+    """
+    if document.price_list_id is None:
+        return
+    if document._state.adding:
+        if document.price_list_version_id is None:
+            document.price_list_version_id = PriceListVersions.current_version_id(document.price_list_id)
+    elif document.price_list_id != getattr(document, '_loaded_price_list_id', None):
+        document.price_list_version_id = PriceListVersions.current_version_id(document.price_list_id)
+    document._loaded_price_list_id = document.price_list_id
+
+
 class RentalQuote(models.Model):
     """Rental quotations before conversion to orders"""
     
@@ -30,6 +51,10 @@ class RentalQuote(models.Model):
     
     # Pricing
     price_list = models.ForeignKey(PriceList, on_delete=models.SET_NULL, null=True, blank=True)
+    # Snapshot of the list's rules the document was priced against
+    price_list_version = models.ForeignKey(
+        PriceListVersion, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='+'
+    )
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -58,19 +83,23 @@ class RentalQuote(models.Model):
     def __str__(self):
         return f"Quote {self.quote_number} - {self.customer.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price_list_id = instance.__dict__.get('price_list_id')
+        return instance
+
     def save(self, *args, **kwargs):
+        stamp_price_list_version(self)
         if not self.quote_number:
-            self.quote_number = self.generate_quote_number()
+            with transaction.atomic():
+                self.quote_number = self.generate_quote_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_quote_number(self):
         """Generate unique quote number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = RentalQuote.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"Q-{timestamp}-{count:04d}"
+        return SequenceService.next_number('Q', RentalQuote, 'quote_number')
 
 
 class RentalOrder(models.Model):
@@ -103,6 +132,10 @@ class RentalOrder(models.Model):
     
     # Pricing
     price_list = models.ForeignKey(PriceList, on_delete=models.SET_NULL, null=True, blank=True)
+    # Snapshot of the list's rules the document was priced against
+    price_list_version = models.ForeignKey(
+        PriceListVersion, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='+'
+    )
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -135,19 +168,23 @@ class RentalOrder(models.Model):
     def __str__(self):
         return f"Order {self.order_number} - {self.customer.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price_list_id = instance.__dict__.get('price_list_id')
+        return instance
+
     def save(self, *args, **kwargs):
+        stamp_price_list_version(self)
         if not self.order_number:
-            self.order_number = self.generate_order_number()
+            with transaction.atomic():
+                self.order_number = self.generate_order_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_order_number(self):
         """Generate unique order number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = RentalOrder.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"RO-{timestamp}-{count:04d}"
+        return SequenceService.next_number('RO', RentalOrder, 'order_number')
 
     @property
     def rental_duration_days(self):
@@ -205,8 +242,8 @@ class QuoteItem(models.Model):
     def calculate_line_total(self):
         """Calculate line total based on unit price and quantity"""
         if self.unit_price and self.quantity:
-            subtotal = self.unit_price * self.quantity
-            self.line_total = subtotal - self.discount_amount
+            subtotal = to_paise(self.unit_price) * self.quantity
+            self.line_total = from_paise(subtotal - to_paise(self.discount_amount))
         else:
             self.line_total = 0
 
@@ -257,8 +294,8 @@ class RentalItem(models.Model):
             delta = self.end_datetime - self.start_datetime
             rental_days = delta.days + (1 if delta.seconds > 0 else 0)
             
-            subtotal = self.unit_price * self.quantity * rental_days
-            self.line_total = subtotal - self.discount_amount
+            subtotal = to_paise(self.unit_price) * self.quantity * rental_days
+            self.line_total = from_paise(subtotal - to_paise(self.discount_amount))
         else:
             self.line_total = 0
 
@@ -360,3 +397,42 @@ class RentalContract(models.Model):
         if not self.contract_number:
             self.contract_number = f"RC-{self.order.order_number}"
         super().save(*args, **kwargs)
+
+
+class ProductCapacityBucket(models.Model):
+    """Materialized per-product stock usage by time bucket, kept in step with reservations"""
+    
+    class Granularity(models.TextChoices):
+        HOUR = "HOUR", "Hourly"
+        DAY = "DAY", "Daily"
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='capacity_buckets')
+    granularity = models.CharField(max_length=10, choices=Granularity.choices)
+    bucket_start = models.DateTimeField()
+    
+    # Units held by reservations touching the bucket, by reservation state
+    reserved_quantity = models.IntegerField(default=0)
+    active_quantity = models.IntegerField(default=0)
+    maintenance_quantity = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_capacity_buckets'
+        verbose_name = 'Product Capacity Bucket'
+        verbose_name_plural = 'Product Capacity Buckets'
+        ordering = ['product', 'granularity', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'granularity', 'bucket_start'],
+                name='unique_product_capacity_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.granularity} {self.bucket_start:%Y-%m-%d %H:%M}"
+
+    @property
+    def used_quantity(self):
+        """Units unavailable during the bucket"""
+        return self.reserved_quantity + self.active_quantity + self.maintenance_quantity
@@ -0,0 +1,295 @@
+"""
+Bulk re-pricing of open quotes.
+
+When price rules change, DRAFT and SENT quotes keep the unit prices they
+were created with. QuoteRepricingService finds the open quotes with a line
+in a changed rule's scope (its product, or the products of its category).
+It re-prices every line of those quotes with one calculate_batch() per
+price list version, then writes the changed lines and quote totals with
+``bulk_update``, one transaction per chunk of quotes. The result is a diff
+report.
+
+Quotes with a price list are priced against that list's current version
+(apps.pricing.versions) and stamped with it. Quotes without one resolve
+their list from the customer's group, the way the calculator does. A line
+no rule covers keeps its price. Otherwise the rule's discount replaces the
+line's discount_amount.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.accounts.models import UserProfile
+from apps.orders.models import QuoteItem, RentalQuote
+from apps.pricing.index import PricingIndex
+from apps.pricing.models import PriceList, PriceListVersion
+from apps.pricing.services import PricingService
+from apps.pricing.versions import PriceListVersions
+from utils.money import div_round, from_paise, to_paise
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = [RentalQuote.Status.DRAFT, RentalQuote.Status.SENT]
+
+DEFAULT_CHUNK_SIZE = 200
+UPDATE_BATCH_SIZE = 500
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class QuoteRepricingService:
+    """Re-price open quotes after price rule changes"""
+
+    @staticmethod
+    def affected_quote_ids(
+        product_ids: Optional[Iterable] = None,
+        category_ids: Optional[Iterable] = None,
+        price_list_ids: Optional[Iterable] = None
+    ) -> List:
+        """
+        Open quotes with a line on one of the products or in one of the
+        categories. Without a product or category scope, every open quote
+        is affected. ``price_list_ids`` limits the result to quotes on those
+        lists, plus quotes without a list (their customer group may resolve
+        to one of them).
+        """
+        quotes = RentalQuote.objects.filter(status__in=OPEN_STATUSES)
+        if price_list_ids is not None:
+            quotes = quotes.filter(Q(price_list_id__in=list(price_list_ids)) | Q(price_list__isnull=True))
+        if product_ids is not None or category_ids is not None:
+            quotes = quotes.filter(
+                Q(items__product_id__in=list(product_ids or []))
+                | Q(items__product__category_id__in=list(category_ids or []))
+            )
+        return list(quotes.order_by('pk').values_list('pk', flat=True).distinct())
+
+    @staticmethod
+    def run(
+        product_ids: Optional[Iterable] = None,
+        category_ids: Optional[Iterable] = None,
+        price_list_ids: Optional[Iterable] = None,
+        dry_run: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Dict:
+        """Re-price the open quotes in a rule scope; see affected_quote_ids() and reprice()"""
+        quote_ids = QuoteRepricingService.affected_quote_ids(product_ids, category_ids, price_list_ids)
+        return QuoteRepricingService.reprice(quote_ids, dry_run, chunk_size)
+
+    @staticmethod
+    def reprice(quote_ids: Iterable, dry_run: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+        """
+        Re-price every line of the given quotes (those still open) and save
+        what changed; nothing is written on a dry run.
+
+        Returns {
+            'quotes': int,
+            'changed_quotes': int,
+            'items': int,
+            'changed_items': int,
+            'unpriced_items': int,  # No rule covers the line; price kept
+            'total_before': Decimal,
+            'total_after': Decimal,
+            'diffs': [{
+                'quote_id', 'quote_number', 'price_list_version_id', 'total_before', 'total_after',
+                'items': [{'item_id', 'product_id', 'unit_price': [old, new],
+                           'discount_amount': [old, new], 'line_total': [old, new]}]
+            }]
+        }
+        """
+        report = {
+            'quotes': 0,
+            'changed_quotes': 0,
+            'items': 0,
+            'changed_items': 0,
+            'unpriced_items': 0,
+            'total_before': Decimal('0.00'),
+            'total_after': Decimal('0.00'),
+            'diffs': []
+        }
+        for chunk in _chunks(quote_ids, chunk_size):
+            QuoteRepricingService._reprice_chunk(chunk, dry_run, report)
+        return report
+
+    @staticmethod
+    def _reprice_chunk(quote_ids: List, dry_run: bool, report: Dict):
+        with transaction.atomic():
+            # Locked so a concurrent edit or conversion cannot interleave
+            quotes = list(
+                RentalQuote.objects.select_for_update().filter(
+                    pk__in=quote_ids, status__in=OPEN_STATUSES
+                ).order_by('pk')
+            )
+            if not quotes:
+                return
+
+            items = defaultdict(list)
+            for item in QuoteItem.objects.filter(quote_id__in=[quote.pk for quote in quotes]).order_by('pk'):
+                items[item.quote_id].append(item)
+
+            # Current versions straight from the rows: the process-wide
+            # pricing index may still lag behind the publish that queued us
+            list_versions = dict(PriceList.objects.filter(
+                pk__in={quote.price_list_id for quote in quotes if quote.price_list_id}
+            ).values_list('pk', 'current_version_id'))
+            for price_list_id, version_id in list_versions.items():
+                if version_id is None:
+                    version = PriceListVersions.publish_one(price_list_id)
+                    list_versions[price_list_id] = version.id if version is not None else None
+            versions = PriceListVersion.objects.in_bulk(
+                [version_id for version_id in list_versions.values() if version_id is not None]
+            )
+            customer_groups = dict(UserProfile.objects.filter(
+                user_id__in={quote.customer_id for quote in quotes if not list_versions.get(quote.price_list_id)}
+            ).values_list('user_id', 'customer_group_id'))
+
+            # One pricing batch per version (or customer group, for quotes without a list)
+            batches = defaultdict(list)
+            for quote in quotes:
+                version_id = list_versions.get(quote.price_list_id)
+                key = ('version', version_id) if version_id else ('group', customer_groups.get(quote.customer_id))
+                batches[key].extend(items[quote.pk])
+
+            # Likewise for the live rules that quotes without a list price by
+            index = PricingIndex.build() if any(kind == 'group' for kind, _ in batches) else None
+
+            priced = {}
+            for (kind, value), batch in batches.items():
+                results = PricingService.calculate_batch(
+                    [{
+                        'product_id': item.product_id,
+                        'start_datetime': item.start_datetime,
+                        'end_datetime': item.end_datetime,
+                        'quantity': item.quantity
+                    } for item in batch],
+                    customer_group=value if kind == 'group' else None,
+                    version=versions.get(value) if kind == 'version' else None,
+                    index=index if kind == 'group' else None
+                )
+                for item, result in zip(batch, results):
+                    priced[item.pk] = result
+
+            changed_items = []
+            changed_quotes = []
+            now = timezone.now()
+            for quote in quotes:
+                diff, quote_items = QuoteRepricingService._reprice_quote(
+                    quote, items[quote.pk], priced, list_versions.get(quote.price_list_id), report
+                )
+                if diff is None:
+                    continue
+                changed_items.extend(quote_items)
+                quote.updated_at = now
+                quote.metadata = {
+                    **(quote.metadata or {}),
+                    'repricing': {
+                        'repriced_at': now.isoformat(),
+                        'price_list_version_id': quote.price_list_version_id,
+                        'total_before': str(diff['total_before'])
+                    }
+                }
+                changed_quotes.append(quote)
+                report['diffs'].append(diff)
+
+            report['changed_items'] += len(changed_items)
+            report['changed_quotes'] += len(changed_quotes)
+            if dry_run:
+                return
+            QuoteItem.objects.bulk_update(
+                changed_items,
+                ['unit_price', 'discount_amount', 'line_total'],
+                batch_size=UPDATE_BATCH_SIZE
+            )
+            RentalQuote.objects.bulk_update(
+                changed_quotes,
+                ['subtotal', 'total_amount', 'price_list_version', 'metadata', 'updated_at'],
+                batch_size=UPDATE_BATCH_SIZE
+            )
+
+    @staticmethod
+    def _reprice_quote(quote: RentalQuote, items: List[QuoteItem], priced: Dict, version_id, report: Dict):
+        """
+        Apply the new prices to a quote and its items in memory.
+        Returns (diff, changed items), or (None, []) if nothing changed.
+        """
+        report['quotes'] += 1
+        report['items'] += len(items)
+        total_before = quote.total_amount
+
+        changed_items = []
+        item_diffs = []
+        subtotal = 0
+        for item in items:
+            result = priced[item.pk]
+            if 'error' in result or not result['applied_rules']:
+                report['unpriced_items'] += 1
+            else:
+                before = (item.unit_price, item.discount_amount, item.line_total)
+                item.unit_price = from_paise(div_round(to_paise(result['base_price']), item.quantity))
+                item.discount_amount = result['discount_amount']
+                item.calculate_line_total()
+                after = (item.unit_price, item.discount_amount, item.line_total)
+                if after != before:
+                    changed_items.append(item)
+                    item_diffs.append({
+                        'item_id': item.pk,
+                        'product_id': item.product_id,
+                        'unit_price': [before[0], after[0]],
+                        'discount_amount': [before[1], after[1]],
+                        'line_total': [before[2], after[2]]
+                    })
+            subtotal += to_paise(item.line_total)
+
+        new_subtotal = from_paise(subtotal)
+        new_total = from_paise(subtotal + to_paise(quote.tax_amount) - to_paise(quote.discount_amount))
+        version_changed = version_id is not None and version_id != quote.price_list_version_id
+        report['total_before'] += total_before
+        if not changed_items and not version_changed:
+            report['total_after'] += total_before
+            return None, []
+        report['total_after'] += new_total
+
+        quote.subtotal = new_subtotal
+        quote.total_amount = new_total
+        if version_id is not None:
+            quote.price_list_version_id = version_id
+        return {
+            'quote_id': quote.pk,
+            'quote_number': quote.quote_number,
+            'price_list_version_id': quote.price_list_version_id,
+            'total_before': total_before,
+            'total_after': new_total,
+            'items': item_diffs
+        }, changed_items
+
+
+def request_repricing(product_ids=None, category_ids=None, price_list_ids=None):
+    """Queue re-pricing of the open quotes in a rule scope once the current transaction commits"""
+    scope = {
+        'product_ids': sorted({int(pk) for pk in product_ids}) if product_ids else None,
+        'category_ids': sorted({int(pk) for pk in category_ids}) if category_ids else None,
+        'price_list_ids': sorted({int(pk) for pk in price_list_ids}) if price_list_ids else None,
+    }
+    if not any(scope.values()):
+        return
+
+    def queue():
+        try:
+            from .tasks import reprice_open_quotes
+            reprice_open_quotes.delay(**scope)
+        except Exception as e:
+            logger.warning(f"Could not queue quote re-pricing for {scope}: {str(e)}")
+
+    transaction.on_commit(queue)
@@ -1,11 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from .models import (
     RentalQuote, QuoteItem, RentalOrder, RentalItem,
     Reservation, ReservationItem, RentalContract
 )
 from apps.catalog.serializers import ProductSerializer
 from apps.accounts.serializers import UserProfileSerializer
+from apps.notifications.models import NotificationTemplate
+from apps.notifications.services import OutboxService
 
 User = get_user_model()
 
@@ -64,12 +67,12 @@ class RentalQuoteSerializer(serializers.ModelSerializer):
         model = RentalQuote
         fields = [
             'id', 'quote_number', 'customer', 'customer_id', 'created_by',
-            'status', 'valid_until', 'price_list', 'subtotal', 'discount_amount',
-            'tax_amount', 'total_amount', 'currency', 'notes', 'terms_conditions',
-            'metadata', 'created_at', 'updated_at', 'items'
+            'status', 'valid_until', 'price_list', 'price_list_version', 'subtotal',
+            'discount_amount', 'tax_amount', 'total_amount', 'currency', 'notes',
+            'terms_conditions', 'metadata', 'created_at', 'updated_at', 'items'
         ]
         read_only_fields = [
-            'id', 'quote_number', 'created_by', 'created_at', 'updated_at'
+            'id', 'quote_number', 'created_by', 'price_list_version', 'created_at', 'updated_at'
         ]
     
     def create(self, validated_data):
@@ -183,7 +186,7 @@ class RentalOrderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order_number', 'quote', 'quote_number', 'customer', 'customer_id',
             'created_by', 'status', 'rental_start', 'rental_end',
-            'actual_pickup_at', 'actual_return_at', 'price_list',
+            'actual_pickup_at', 'actual_return_at', 'price_list', 'price_list_version',
             'subtotal', 'discount_amount', 'tax_amount', 'deposit_amount',
             'late_fee_amount', 'total_amount', 'currency', 'pickup_address',
             'return_address', 'notes', 'internal_notes', 'created_at',
@@ -192,86 +195,39 @@ class RentalOrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             'id', 'order_number', 'created_by', 'actual_pickup_at',
-            'actual_return_at', 'late_fee_amount', 'created_at', 'updated_at',
-            'rental_duration_days', 'is_overdue'
+            'actual_return_at', 'price_list_version', 'late_fee_amount', 'created_at',
+            'updated_at', 'rental_duration_days', 'is_overdue'
         ]
     
     def create(self, validated_data):
         items_data = self.context['request'].data.get('items', [])
-        order = RentalOrder.objects.create(**validated_data)
         
-        total_amount = 0
-        for item_data in items_data:
-            item_serializer = RentalItemSerializer(data=item_data)
-            if item_serializer.is_valid():
-                item = item_serializer.save(order=order)
-                total_amount += item.line_total
-            else:
-                raise serializers.ValidationError(item_serializer.errors)
-        
-        order.subtotal = total_amount
-        order.total_amount = total_amount + order.tax_amount - order.discount_amount
-        order.save()
-        
-        # Send order confirmation email - use synchronous sending for immediate delivery
-        try:
-            from utils.email_service import email_service
+        with transaction.atomic():
+            order = RentalOrder.objects.create(**validated_data)
+            
+            total_amount = 0
+            for item_data in items_data:
+                item_serializer = RentalItemSerializer(data=item_data)
+                if item_serializer.is_valid():
+                    item = item_serializer.save(order=order)
+                    total_amount += item.line_total
+                else:
+                    raise serializers.ValidationError(item_serializer.errors)
             
+            order.subtotal = total_amount
+            order.total_amount = total_amount + order.tax_amount - order.discount_amount
+            order.save()
+            
+            # Confirmation email goes through the outbox: it is committed
+            # with the order and sent by the worker, not inside the request
             if order.customer.email:
-                context = {
-                    'order': {
-                        'id': str(order.id),
-                        'order_number': order.order_number,
-                        'created_at': order.created_at.strftime('%Y-%m-%d %H:%M'),
-                        'start_date': order.rental_start.strftime('%Y-%m-%d'),
-                        'end_date': order.rental_end.strftime('%Y-%m-%d'),
-                        'total_amount': str(order.total_amount),
-                        'status': order.status,
-                        'items': [
-                            {
-                                'product_name': item.product.name,
-                                'quantity': item.quantity,
-                                'rate': str(item.unit_price),
-                                'subtotal': str(item.line_total)
-                            }
-                            for item in order.items.all()
-                        ]
-                    },
-                    'user': {
-                        'first_name': order.customer.first_name or 'Valued Customer',
-                        'last_name': order.customer.last_name or '',
-                        'email': order.customer.email
-                    }
-                }
-                
-                # Send email synchronously for immediate delivery
-                email_success = email_service.send_notification_email(
-                    to_email=order.customer.email,
-                    subject=f"Order Confirmation - #{order.order_number}",
-                    template_name='order_confirmation',
-                    context=context,
-                    user=order.customer,
-                    notification_type='ORDER_CONFIRMATION'
-                )
-                
-                # Log the email attempt
-                from apps.notifications.models import NotificationLog
-                NotificationLog.objects.create(
+                OutboxService.enqueue(
+                    NotificationTemplate.NotificationType.ORDER_CONFIRMATION,
                     user=order.customer,
-                    channel='EMAIL',
-                    status='SENT' if email_success else 'FAILED',
-                    metadata={
-                        'order_id': str(order.id),
-                        'template': 'order_confirmation',
-                        'method': 'synchronous'
-                    }
+                    recipient=order.customer.email,
+                    order=order,
+                    payload={'order_id': str(order.id)}
                 )
-                
-        except Exception as e:
-            # Log the error but don't fail the order creation
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to send order confirmation email for order {order.id}: {str(e)}")
         
         return order
     
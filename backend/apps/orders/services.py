@@ -1,9 +1,25 @@
-from django.db.models import Q, Sum
+from collections import defaultdict
+from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from apps.catalog.models import Product
-from apps.orders.models import RentalItem, ReservationItem
+from apps.orders.models import RentalItem
+from apps.orders.availability import (
+    load_reservation_items, to_intervals, peak_usage, describe_conflict,
+    find_free_windows, bucket_usage
+)
+
+# Spacing of candidate start times for alternative date searches
+SEARCH_GRANULARITIES = {
+    'hour': timezone.timedelta(hours=1),
+    'day': timezone.timedelta(days=1),
+}
+
+# Bucket sizes for availability calendars
+CALENDAR_GRANULARITIES = SEARCH_GRANULARITIES
+
+MAX_CALENDAR_DAYS = 366
 
 
 class AvailabilityService:
@@ -42,28 +58,18 @@ class AvailabilityService:
             }
         
         # Get total stock for product
-        total_stock = product.stock_quantity
-        
-        # Find overlapping reservations
-        # Two periods overlap if: NOT (end1 <= start2 OR start1 >= end2)
-        # Simplified: start1 < end2 AND end1 > start2
-        overlapping_reservations = ReservationItem.objects.filter(
-            product_id=product_id,
-            start_datetime__lt=end_datetime,
-            end_datetime__gt=start_datetime,
-            reservation__status__in=['RESERVED', 'ACTIVE']
-        )
+        total_stock = product.quantity_on_hand
         
-        # Exclude current order if specified (for updates)
-        if exclude_order_id:
-            overlapping_reservations = overlapping_reservations.exclude(
-                reservation__order_id=exclude_order_id
-            )
+        # Load overlapping reservations once, with order/customer joined
+        overlapping_items = load_reservation_items(
+            [product.id], start_datetime, end_datetime, exclude_order_id
+        )
         
-        # Calculate reserved quantity
-        reserved_quantity = overlapping_reservations.aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
+        # Reserved quantity is the peak concurrent usage inside the window;
+        # reservations that overlap the window but not each other do not stack
+        reserved_quantity = peak_usage(
+            to_intervals(overlapping_items), start_datetime, end_datetime
+        )
         
         # Calculate available quantity
         available_quantity = max(0, total_stock - reserved_quantity)
@@ -72,16 +78,7 @@ class AvailabilityService:
         is_available = available_quantity >= quantity
         
         # Get conflict details
-        conflicts = []
-        for res_item in overlapping_reservations:
-            conflicts.append({
-                'reservation_id': str(res_item.reservation.id),
-                'order_number': res_item.reservation.order.order_number,
-                'customer': res_item.reservation.order.customer.username,
-                'quantity': res_item.quantity,
-                'start_datetime': res_item.start_datetime.isoformat(),
-                'end_datetime': res_item.end_datetime.isoformat(),
-            })
+        conflicts = [describe_conflict(item) for item in overlapping_items]
         
         return {
             'available': is_available,
@@ -95,29 +92,103 @@ class AvailabilityService:
     def batch_check_availability(
         items: List[Dict],  # [{'product_id': str, 'start_datetime': dt, 'end_datetime': dt, 'quantity': int}]
         exclude_order_id: Optional[str] = None
-    ) -> Dict[str, Dict]:
+    ) -> List[Dict]:
         """
-        Check availability for multiple products/periods at once
+        Check availability for every line of a basket at once
         
-        Returns:
-        {
-            'product_id_1': availability_result,
-            'product_id_2': availability_result,
+        Stock for all products and every overlapping reservation item across
+        the union of the requested windows are loaded up front (one query
+        each); lines are then evaluated in memory. Lines for the same product
+        compete with each other as well as with existing reservations.
+        
+        Returns one result per input line, in input order:
+        [
+            {
+                'line': int,
+                'product_id': str,
+                'requested_quantity': int,
+                'available': bool,
+                'available_quantity': int,
+                'total_stock': int,
+                'reserved_quantity': int,  # Peak existing reservations in the line window
+                'basket_quantity': int,    # Peak demand from the other basket lines
+                'conflicts': List[dict]
+            },
             ...
-        }
+        ]
         """
-        results = {}
-        
-        for item in items:
-            product_id = item['product_id']
-            results[product_id] = AvailabilityService.check_availability(
-                product_id=product_id,
-                start_datetime=item['start_datetime'],
-                end_datetime=item['end_datetime'],
-                quantity=item['quantity'],
-                exclude_order_id=exclude_order_id
+        if not items:
+            return []
+        
+        product_ids = {str(item['product_id']) for item in items}
+        window_start = min(item['start_datetime'] for item in items)
+        window_end = max(item['end_datetime'] for item in items)
+        
+        products = {
+            str(pk): product
+            for pk, product in Product.objects.in_bulk(list(product_ids)).items()
+        }
+        
+        reserved_by_product = defaultdict(list)
+        for res_item in load_reservation_items(
+            product_ids, window_start, window_end, exclude_order_id
+        ):
+            reserved_by_product[str(res_item.product_id)].append(res_item)
+        
+        basket_by_product = defaultdict(list)
+        for index, item in enumerate(items):
+            basket_by_product[str(item['product_id'])].append(
+                (index, (item['start_datetime'], item['end_datetime'], item['quantity']))
             )
         
+        results = []
+        for index, item in enumerate(items):
+            product_id = str(item['product_id'])
+            start, end, quantity = item['start_datetime'], item['end_datetime'], item['quantity']
+            product = products.get(product_id)
+            
+            if product is None:
+                results.append({
+                    'line': index,
+                    'product_id': product_id,
+                    'requested_quantity': quantity,
+                    'available': False,
+                    'available_quantity': 0,
+                    'total_stock': 0,
+                    'reserved_quantity': 0,
+                    'basket_quantity': 0,
+                    'conflicts': [],
+                    'error': 'Product not found'
+                })
+                continue
+            
+            overlapping = [
+                res_item for res_item in reserved_by_product[product_id]
+                if res_item.start_datetime < end and res_item.end_datetime > start
+            ]
+            reserved_intervals = to_intervals(overlapping)
+            basket_intervals = [
+                interval for other, interval in basket_by_product[product_id]
+                if other != index
+            ]
+            
+            total_stock = product.quantity_on_hand
+            reserved_quantity = peak_usage(reserved_intervals, start, end)
+            combined_quantity = peak_usage(reserved_intervals + basket_intervals, start, end)
+            available_quantity = max(0, total_stock - combined_quantity)
+            
+            results.append({
+                'line': index,
+                'product_id': product_id,
+                'requested_quantity': quantity,
+                'available': available_quantity >= quantity,
+                'available_quantity': available_quantity,
+                'total_stock': total_stock,
+                'reserved_quantity': reserved_quantity,
+                'basket_quantity': peak_usage(basket_intervals, start, end),
+                'conflicts': [describe_conflict(res_item) for res_item in overlapping]
+            })
+        
         return results
     
     @staticmethod
@@ -126,12 +197,19 @@ class AvailabilityService:
         preferred_start: datetime,
         preferred_end: datetime,
         quantity: int = 1,
-        search_days: int = 30
+        search_days: int = 30,
+        granularity: str = 'day',
+        limit: int = 10
     ) -> List[Dict]:
         """
         Find alternative available dates if preferred dates are not available
         
-        Returns list of available periods:
+        Reservations for the whole search horizon are loaded once and the
+        nearest feasible windows of the same duration are read off the usage
+        step function. ``granularity`` ('hour' or 'day') is the spacing of
+        candidate start times around the preferred start.
+        
+        Returns list of available periods, nearest first:
         [
             {
                 'start_datetime': datetime,
@@ -140,103 +218,149 @@ class AvailabilityService:
             }
         ]
         """
+        step = SEARCH_GRANULARITIES.get(granularity)
+        if step is None:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        
         try:
             product = Product.objects.get(id=product_id)
         except Product.DoesNotExist:
             return []
         
-        alternatives = []
-        duration = preferred_end - preferred_start
+        if timezone.is_naive(preferred_start):
+            preferred_start = timezone.make_aware(preferred_start)
+        if timezone.is_naive(preferred_end):
+            preferred_end = timezone.make_aware(preferred_end)
         
-        # Check dates within search range
-        for days_offset in range(-search_days, search_days + 1):
-            if days_offset == 0:  # Skip the original preferred dates
-                continue
-                
-            test_start = preferred_start + timezone.timedelta(days=days_offset)
-            test_end = test_start + duration
-            
-            # Skip past dates
-            if test_start < timezone.now():
-                continue
-            
-            availability = AvailabilityService.check_availability(
-                product_id=product_id,
-                start_datetime=test_start,
-                end_datetime=test_end,
-                quantity=quantity
-            )
-            
-            if availability['available']:
-                alternatives.append({
-                    'start_datetime': test_start,
-                    'end_datetime': test_end,
-                    'available_quantity': availability['available_quantity']
-                })
+        search_range = timezone.timedelta(days=search_days)
+        horizon_start = max(preferred_start - search_range, timezone.now())
+        horizon_end = preferred_end + search_range
+        if horizon_start >= horizon_end:
+            return []
         
-        # Sort by proximity to preferred start date
-        alternatives.sort(key=lambda x: abs((x['start_datetime'] - preferred_start).days))
+        intervals = to_intervals(load_reservation_items(
+            [product.id], horizon_start, horizon_end, with_conflict_details=False
+        ))
+        
+        return find_free_windows(
+            intervals,
+            capacity=product.quantity_on_hand,
+            quantity=quantity,
+            duration=preferred_end - preferred_start,
+            anchor=preferred_start,
+            step=step,
+            horizon_start=horizon_start,
+            horizon_end=horizon_end,
+            limit=limit
+        )
+    
+    @staticmethod
+    def _calendar_range(start_date, end_date, granularity: str) -> Tuple[datetime, datetime, timezone.timedelta]:
+        """Resolve calendar bounds to aware midnights and the bucket size"""
+        bucket = CALENDAR_GRANULARITIES.get(granularity)
+        if bucket is None:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+        if isinstance(end_date, datetime):
+            end_date = end_date.date()
+        
+        if end_date < start_date:
+            raise ValueError("end_date must not be before start_date")
+        if (end_date - start_date).days + 1 > MAX_CALENDAR_DAYS:
+            raise ValueError(f"Calendar range is limited to {MAX_CALENDAR_DAYS} days")
+        
+        range_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        range_end = timezone.make_aware(
+            datetime.combine(end_date + timezone.timedelta(days=1), datetime.min.time())
+        )
+        return range_start, range_end, bucket
+    
+    @staticmethod
+    def _build_calendar(product, intervals, range_start, range_end, bucket, granularity) -> Dict[str, Dict]:
+        total_stock = product.quantity_on_hand
+        calendar = {}
+        
+        for bucket_start, low, peak in bucket_usage(intervals, range_start, range_end, bucket):
+            key = bucket_start.date().isoformat() if granularity == 'day' else bucket_start.isoformat()
+            calendar[key] = {
+                'available_quantity': max(0, total_stock - peak),
+                'max_available_quantity': max(0, total_stock - low),
+                'reserved_quantity': peak,
+                'total_stock': total_stock
+            }
         
-        return alternatives[:10]  # Return top 10 alternatives
+        return calendar
     
     @staticmethod
     def get_product_calendar(
         product_id: str,
         start_date: datetime,
-        end_date: datetime
+        end_date: datetime,
+        granularity: str = 'day'
     ) -> Dict[str, Dict]:
         """
         Get availability calendar for a product over a date range
         
-        Returns:
+        Reservations for the whole range are fetched once and bucketed in
+        memory, so the query count does not grow with the range. Ranges of
+        up to a year are supported at 'day' or 'hour' granularity.
+        
+        Returns (keys are dates for 'day', ISO datetimes for 'hour'):
         {
             'YYYY-MM-DD': {
-                'available_quantity': int,
-                'reserved_quantity': int,
+                'available_quantity': int,      # Lowest availability in the bucket
+                'max_available_quantity': int,  # Highest availability in the bucket
+                'reserved_quantity': int,       # Peak concurrent reservations
                 'total_stock': int
             }
         }
         """
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            return {}
+        calendars = AvailabilityService.get_products_calendar(
+            [product_id], start_date, end_date, granularity
+        )
+        return calendars.get(str(product_id), {})
+    
+    @staticmethod
+    def get_products_calendar(
+        product_ids: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        granularity: str = 'day'
+    ) -> Dict[str, Dict[str, Dict]]:
+        """
+        Availability calendars for several products (e.g. a catalog grid)
+        from two queries in total
         
-        calendar = {}
-        current_date = start_date.date()
-        end_date = end_date.date()
+        Returns:
+        {
+            'product_id': calendar,  # Same shape as get_product_calendar
+            ...
+        }
+        """
+        range_start, range_end, bucket = AvailabilityService._calendar_range(
+            start_date, end_date, granularity
+        )
         
-        while current_date <= end_date:
-            day_start = timezone.make_aware(
-                datetime.combine(current_date, datetime.min.time())
-            )
-            day_end = timezone.make_aware(
-                datetime.combine(current_date, datetime.max.time())
-            )
-            
-            # Get reservations for this day
-            reservations = ReservationItem.objects.filter(
-                product_id=product_id,
-                start_datetime__lt=day_end,
-                end_datetime__gt=day_start,
-                reservation__status__in=['RESERVED', 'ACTIVE']
+        products = Product.objects.in_bulk(list(product_ids))
+        if not products:
+            return {}
+        
+        intervals_by_product = defaultdict(list)
+        for res_item in load_reservation_items(
+            products.keys(), range_start, range_end, with_conflict_details=False
+        ):
+            intervals_by_product[res_item.product_id].append(
+                (res_item.start_datetime, res_item.end_datetime, res_item.quantity)
             )
-            
-            reserved_quantity = reservations.aggregate(
-                total=Sum('quantity')
-            )['total'] or 0
-            
-            available_quantity = max(0, product.stock_quantity - reserved_quantity)
-            
-            calendar[current_date.isoformat()] = {
-                'available_quantity': available_quantity,
-                'reserved_quantity': reserved_quantity,
-                'total_stock': product.stock_quantity
-            }
-            
-            current_date += timezone.timedelta(days=1)
         
-        return calendar
+        return {
+            str(pk): AvailabilityService._build_calendar(
+                product, intervals_by_product[pk], range_start, range_end, bucket, granularity
+            )
+            for pk, product in products.items()
+        }
     
     @staticmethod
     def get_upcoming_returns(days_ahead: int = 7) -> List[Dict]:
@@ -304,21 +428,27 @@ class AvailabilityService:
         from apps.orders.models import RentalOrder
         
         try:
-            order = RentalOrder.objects.get(id=order_id)
+            order = RentalOrder.objects.prefetch_related('items__product').get(id=order_id)
         except RentalOrder.DoesNotExist:
             return {'has_conflicts': True, 'conflicts': ['Order not found'], 'resolvable': False}
         
+        order_items = list(order.items.all())
+        results = AvailabilityService.batch_check_availability(
+            [
+                {
+                    'product_id': item.product_id,
+                    'start_datetime': item.start_datetime,
+                    'end_datetime': item.end_datetime,
+                    'quantity': item.quantity
+                }
+                for item in order_items
+            ],
+            exclude_order_id=order_id
+        )
+        
         conflicts = []
         
-        for item in order.items.all():
-            availability = AvailabilityService.check_availability(
-                product_id=str(item.product.id),
-                start_datetime=item.start_datetime,
-                end_datetime=item.end_datetime,
-                quantity=item.quantity,
-                exclude_order_id=order_id
-            )
-            
+        for item, availability in zip(order_items, results):
             if not availability['available']:
                 conflicts.append({
                     'product_id': str(item.product.id),
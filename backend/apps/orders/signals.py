@@ -0,0 +1,99 @@
+"""
+Keep the materialized capacity table and the product stock counters (via
+the inventory ledger) in step with reservations.
+
+Only changes made through ``save()``/``delete()`` are seen here; code that
+writes reservation items with ``bulk_create`` or ``update()`` must call
+CapacityService and InventoryLedger itself.
+
+A ledger entry that would take a drifted counter below zero is logged
+rather than raised, so it never blocks a reservation change; the nightly
+reconciliation rebuilds the counter.
+"""
+import logging
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.catalog.inventory import InventoryError, InventoryLedger
+from apps.orders.models import Reservation, ReservationItem
+from apps.orders.capacity import CapacityService
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_reservation_status(sender, instance, **kwargs):
+    instance._capacity_previous_status = None
+    if not instance._state.adding:
+        instance._capacity_previous_status = Reservation.objects.filter(
+            pk=instance.pk
+        ).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Reservation)
+def sync_reservation_capacity(sender, instance, created, **kwargs):
+    # New reservations have no items yet; they are counted as items are added
+    if created or kwargs.get('raw'):
+        return
+    previous_status = getattr(instance, '_capacity_previous_status', None)
+    if previous_status != instance.status:
+        CapacityService.move_reservation(instance, previous_status, instance.status)
+        try:
+            InventoryLedger.move_reservation(instance, previous_status, instance.status)
+        except InventoryError as e:
+            logger.warning(f"Reservation {instance.pk} not posted to the ledger: {str(e)}")
+
+
+@receiver(pre_save, sender=ReservationItem)
+def remember_reservation_item(sender, instance, **kwargs):
+    instance._capacity_previous = None
+    if not instance._state.adding:
+        instance._capacity_previous = ReservationItem.objects.filter(
+            pk=instance.pk
+        ).values('product_id', 'start_datetime', 'end_datetime', 'quantity').first()
+
+
+@receiver(post_save, sender=ReservationItem)
+def sync_reservation_item_capacity(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    status = instance.reservation.status
+    column = CapacityService.column_for_status(status)
+    if column is None:
+        return
+
+    previous = getattr(instance, '_capacity_previous', None)
+    if previous:
+        CapacityService.apply(
+            previous['product_id'], previous['start_datetime'], previous['end_datetime'],
+            column, -previous['quantity']
+        )
+    CapacityService.apply_items([instance], column)
+
+    entries = InventoryLedger.reservation_entries([instance], None, status)
+    if previous:
+        entries += InventoryLedger.reservation_entries(
+            [ReservationItem(
+                reservation_id=instance.reservation_id,
+                product_id=previous['product_id'],
+                quantity=previous['quantity']
+            )],
+            status, None
+        )
+    try:
+        InventoryLedger.post(entries)
+    except InventoryError as e:
+        logger.warning(f"Reservation {instance.reservation_id} item not posted to the ledger: {str(e)}")
+
+
+@receiver(post_delete, sender=ReservationItem)
+def release_reservation_item_capacity(sender, instance, **kwargs):
+    status = Reservation.objects.filter(
+        pk=instance.reservation_id
+    ).values_list('status', flat=True).first()
+    CapacityService.apply_items([instance], CapacityService.column_for_status(status), -1)
+    try:
+        InventoryLedger.move_items([instance], status, None)
+    except InventoryError as e:
+        logger.warning(f"Reservation {instance.reservation_id} item release not posted to the ledger: {str(e)}")
@@ -0,0 +1,38 @@
+"""
+Celery tasks for orders: re-pricing open quotes after price rule changes.
+"""
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reprice_open_quotes(product_ids=None, category_ids=None, price_list_ids=None):
+    """Re-price the open quotes in a changed rule's scope and log the diff"""
+    from apps.orders.repricing import QuoteRepricingService
+
+    report = QuoteRepricingService.run(
+        product_ids=product_ids,
+        category_ids=category_ids,
+        price_list_ids=price_list_ids
+    )
+    for diff in report['diffs'][:50]:
+        logger.info(
+            f"Re-priced quote {diff['quote_number']}: {diff['total_before']} -> {diff['total_after']} "
+            f"({len(diff['items'])} lines changed)"
+        )
+    logger.info(
+        f"Re-priced {report['changed_quotes']} of {report['quotes']} open quotes, "
+        f"{report['changed_items']} lines changed, {report['unpriced_items']} without a rule"
+    )
+    return {
+        'quotes': report['quotes'],
+        'changed_quotes': report['changed_quotes'],
+        'items': report['items'],
+        'changed_items': report['changed_items'],
+        'unpriced_items': report['unpriced_items'],
+        'total_before': str(report['total_before']),
+        'total_after': str(report['total_after'])
+    }
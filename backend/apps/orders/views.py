@@ -5,25 +5,21 @@ from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.db import transaction
 from django.db.models import Q
+from django.core.exceptions import ValidationError as DjangoValidationError
 from datetime import datetime, timedelta
 from .models import (
-    RentalQuote, QuoteItem, RentalOrder, RentalItem,
-    Reservation, ReservationItem, RentalContract
+    RentalQuote, QuoteItem, RentalOrder,
+    Reservation, RentalContract
 )
 from .serializers import (
     RentalQuoteSerializer, RentalOrderSerializer, ReservationSerializer,
     RentalContractSerializer, AvailabilitySerializer
 )
 from .services import AvailabilityService
+from .allocation import AllocationError
+from .conversion import MAX_BATCH_QUOTES, QuoteConversionService
 from apps.pricing.services import PricingService
 
-# Import email notification tasks
-try:
-    from apps.notifications.tasks import send_order_confirmation_email
-except ImportError:
-    send_order_confirmation_email = None
-
-
 class RentalQuoteViewSet(viewsets.ModelViewSet):
     queryset = RentalQuote.objects.all()
     serializer_class = RentalQuoteSerializer
@@ -51,95 +47,87 @@ class RentalQuoteViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            with transaction.atomic():
-                # Create rental order
-                order = RentalOrder.objects.create(
-                    quote=quote,
-                    customer=quote.customer,
-                    created_by=request.user,
-                    rental_start=request.data.get('rental_start'),
-                    rental_end=request.data.get('rental_end'),
-                    price_list=quote.price_list,
-                    subtotal=quote.subtotal,
-                    discount_amount=quote.discount_amount,
-                    tax_amount=quote.tax_amount,
-                    total_amount=quote.total_amount,
-                    currency=quote.currency,
-                    pickup_address=request.data.get('pickup_address', ''),
-                    return_address=request.data.get('return_address', ''),
-                    notes=quote.notes
-                )
-                
-                # Copy quote items to order items
-                for quote_item in quote.items.all():
-                    RentalItem.objects.create(
-                        order=order,
-                        product=quote_item.product,
-                        quantity=quote_item.quantity,
-                        rental_unit=quote_item.rental_unit,
-                        unit_price=quote_item.unit_price,
-                        discount_percent=quote_item.discount_percent,
-                        discount_amount=quote_item.discount_amount,
-                        line_total=quote_item.line_total,
-                        start_datetime=quote_item.start_datetime,
-                        end_datetime=quote_item.end_datetime,
-                        notes=quote_item.notes
-                    )
-                
-                # Check availability and create reservations
-                availability_issues = []
-                for order_item in order.items.all():
-                    availability = AvailabilityService.check_availability(
-                        str(order_item.product.id),
-                        order_item.start_datetime,
-                        order_item.end_datetime,
-                        order_item.quantity
-                    )
-                    
-                    if not availability['available']:
-                        availability_issues.append({
-                            'product': order_item.product.name,
-                            'issue': f"Insufficient quantity. Available: {availability['available_quantity']}, Requested: {order_item.quantity}"
-                        })
-                
-                if availability_issues:
-                    return Response(
-                        {'error': 'Availability issues', 'details': availability_issues},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Create reservation
-                reservation = Reservation.objects.create(
-                    order=order,
-                    return_due_at=order.rental_end,
-                    pickup_location=order.pickup_address,
-                    return_location=order.return_address
-                )
-                
-                # Create reservation items
-                for order_item in order.items.all():
-                    ReservationItem.objects.create(
-                        reservation=reservation,
-                        product=order_item.product,
-                        quantity=order_item.quantity,
-                        start_datetime=order_item.start_datetime,
-                        end_datetime=order_item.end_datetime
-                    )
-                
-                order.status = RentalOrder.Status.RESERVED
-                order.save()
-                
-                return Response({
-                    'message': 'Quote converted to order successfully',
-                    'order_id': str(order.id),
-                    'order_number': order.order_number
-                })
-                
+            order = QuoteConversionService.convert(
+                quote,
+                request.user,
+                rental_start=request.data.get('rental_start'),
+                rental_end=request.data.get('rental_end'),
+                pickup_address=request.data.get('pickup_address', ''),
+                return_address=request.data.get('return_address', '')
+            )
+        except AllocationError as e:
+            return Response(
+                {'error': 'Availability issues', 'details': e.issues},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {'error': f'Failed to convert quote: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        return Response({
+            'message': 'Quote converted to order successfully',
+            'order_id': str(order.id),
+            'order_number': order.order_number
+        })
+    
+    @action(detail=False, methods=['post'])
+    def convert_batch(self, request):
+        """Convert several confirmed quotes to orders in one transaction"""
+        quote_ids = request.data.get('quote_ids') or []
+        if not isinstance(quote_ids, list) or not quote_ids:
+            return Response({'error': 'quote_ids list required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(quote_ids) > MAX_BATCH_QUOTES:
+            return Response(
+                {'error': f'At most {MAX_BATCH_QUOTES} quotes per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            quotes = {str(quote.id): quote for quote in self.get_queryset().filter(id__in=quote_ids)}
+        except (ValueError, DjangoValidationError):
+            return Response({'error': 'Invalid quote id'}, status=status.HTTP_400_BAD_REQUEST)
+        missing = [str(quote_id) for quote_id in quote_ids if str(quote_id) not in quotes]
+        if missing:
+            return Response(
+                {'error': 'Quotes not found', 'quote_ids': missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            orders = QuoteConversionService.convert_many(
+                [quotes[quote_id] for quote_id in dict.fromkeys(map(str, quote_ids))],
+                request.user,
+                pickup_address=request.data.get('pickup_address', ''),
+                return_address=request.data.get('return_address', '')
+            )
+        except AllocationError as e:
+            return Response(
+                {'error': 'Availability issues', 'details': e.issues},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to convert quotes: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response({
+            'message': f'{len(orders)} quotes converted to orders successfully',
+            'orders': [
+                {
+                    'quote_id': str(order.quote_id),
+                    'order_id': str(order.id),
+                    'order_number': order.order_number
+                }
+                for order in orders
+            ]
+        })
     
     @action(detail=True, methods=['post'])
     def send_quote(self, request, pk=None):
@@ -204,11 +192,8 @@ class RentalOrderViewSet(viewsets.ModelViewSet):
         return queryset.select_related('customer', 'created_by', 'quote', 'price_list').prefetch_related('items__product', 'reservations')
     
     def perform_create(self, serializer):
-        order = serializer.save(created_by=self.request.user)
-        
-        # Send order confirmation email
-        if send_order_confirmation_email and order.customer.email:
-            send_order_confirmation_email.delay(order.id)
+        # The serializer queues the confirmation email in the order's outbox
+        serializer.save(created_by=self.request.user)
     
     @action(detail=True, methods=['post'])
     def confirm_pickup(self, request, pk=None):
@@ -221,15 +206,17 @@ class RentalOrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = RentalOrder.Status.PICKED_UP
-        order.actual_pickup_at = timezone.now()
-        order.save()
-        
-        # Update reservations
-        for reservation in order.reservations.all():
-            reservation.status = Reservation.Status.ACTIVE
-            reservation.actual_pickup_at = timezone.now()
-            reservation.save()
+        # Reservation status and the stock counters move together
+        with transaction.atomic():
+            order.status = RentalOrder.Status.PICKED_UP
+            order.actual_pickup_at = timezone.now()
+            order.save()
+            
+            # Update reservations
+            for reservation in order.reservations.all():
+                reservation.status = Reservation.Status.ACTIVE
+                reservation.actual_pickup_at = timezone.now()
+                reservation.save()
         
         return Response({'message': 'Pickup confirmed successfully'})
     
@@ -247,32 +234,24 @@ class RentalOrderViewSet(viewsets.ModelViewSet):
         return_condition = request.data.get('condition', 'good')
         damage_notes = request.data.get('damage_notes', '')
         
-        order.status = RentalOrder.Status.RETURNED
-        order.actual_return_at = timezone.now()
-        order.save()
-        
-        # Update reservations
-        for reservation in order.reservations.all():
-            reservation.status = Reservation.Status.COMPLETED
-            reservation.actual_return_at = timezone.now()
-            reservation.save()
-        
-        # Calculate late fees if overdue
-        if order.is_overdue:
-            from apps.pricing.services import PricingService
-            pricing_service = PricingService()
-            
-            for item in order.items.all():
-                late_fee = pricing_service.calculate_late_fee(
-                    str(item.product.id),
-                    order.rental_end,
-                    timezone.now(),
-                    item.quantity
-                )
-                order.late_fee_amount += late_fee['total_late_fee']
-            
-            order.total_amount += order.late_fee_amount
+        with transaction.atomic():
+            order.status = RentalOrder.Status.RETURNED
+            order.actual_return_at = timezone.now()
             order.save()
+            
+            # Update reservations
+            for reservation in order.reservations.all():
+                reservation.status = Reservation.Status.COMPLETED
+                reservation.actual_return_at = timezone.now()
+                reservation.save()
+        
+        # Settle the late fee as of the return; the nightly run only accrues it
+        from apps.pricing.late_fees import LateFeeEngine
+        late_fee = LateFeeEngine().order_fee(order, order.actual_return_at)
+        if late_fee or order.late_fee_amount:
+            order.late_fee_amount = late_fee
+            order.total_amount += late_fee
+            order.save(update_fields=['late_fee_amount', 'total_amount', 'updated_at'])
         
         return Response({
             'message': 'Return confirmed successfully',
@@ -383,12 +362,16 @@ class AvailabilityViewSet(viewsets.ViewSet):
                     'product_id': item['product_id'],
                     'start_datetime': datetime.fromisoformat(item['start_datetime'].replace('Z', '+00:00')),
                     'end_datetime': datetime.fromisoformat(item['end_datetime'].replace('Z', '+00:00')),
-                    'quantity': item.get('quantity', 1)
+                    'quantity': int(item.get('quantity', 1))
                 })
             
+            # One result per line; lines for the same product share stock
             results = AvailabilityService.batch_check_availability(processed_items)
             
-            return Response({'results': results})
+            return Response({
+                'results': results,
+                'all_available': all(result['available'] for result in results)
+            })
             
         except Exception as e:
             return Response(
@@ -402,6 +385,7 @@ class AvailabilityViewSet(viewsets.ViewSet):
         product_id = request.query_params.get('product_id')
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+        granularity = request.query_params.get('granularity', 'day')
         
         if not all([product_id, start_date, end_date]):
             return Response(
@@ -414,11 +398,59 @@ class AvailabilityViewSet(viewsets.ViewSet):
             end_dt = datetime.fromisoformat(end_date)
             
             calendar = AvailabilityService.get_product_calendar(
-                product_id, start_dt, end_dt
+                product_id, start_dt, end_dt, granularity
             )
             
             return Response({'calendar': calendar})
             
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {'error': f'Calendar generation failed: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['get'])
+    def grid_calendar(self, request):
+        """Get availability calendars for several products (catalog grid)"""
+        product_ids = request.query_params.get('product_ids', '')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        granularity = request.query_params.get('granularity', 'day')
+        
+        product_ids = [pid.strip() for pid in product_ids.split(',') if pid.strip()]
+        
+        if not all([product_ids, start_date, end_date]):
+            return Response(
+                {'error': 'product_ids, start_date, and end_date are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(product_ids) > 100:
+            return Response(
+                {'error': 'At most 100 products per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            calendars = AvailabilityService.get_products_calendar(
+                product_ids,
+                datetime.fromisoformat(start_date),
+                datetime.fromisoformat(end_date),
+                granularity
+            )
+            
+            return Response({'calendars': calendars})
+            
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': f'Calendar generation failed: {str(e)}'},
@@ -433,6 +465,8 @@ class AvailabilityViewSet(viewsets.ViewSet):
         preferred_end = request.data.get('preferred_end')
         quantity = request.data.get('quantity', 1)
         search_days = request.data.get('search_days', 30)
+        granularity = request.data.get('granularity', 'day')
+        limit = request.data.get('limit', 10)
         
         if not all([product_id, preferred_start, preferred_end]):
             return Response(
@@ -445,11 +479,17 @@ class AvailabilityViewSet(viewsets.ViewSet):
             end_dt = datetime.fromisoformat(preferred_end.replace('Z', '+00:00'))
             
             alternatives = AvailabilityService.find_alternative_dates(
-                product_id, start_dt, end_dt, quantity, search_days
+                product_id, start_dt, end_dt, int(quantity), int(search_days),
+                granularity=granularity, limit=min(int(limit), 50)
             )
             
             return Response({'alternatives': alternatives})
             
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': f'Alternative date search failed: {str(e)}'},
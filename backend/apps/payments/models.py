@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 import uuid
+from apps.sequences.services import SequenceService
 from apps.invoicing.models import Invoice
 
 User = get_user_model()
@@ -144,17 +145,14 @@ class Payment(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.payment_number:
-            self.payment_number = self.generate_payment_number()
+            with transaction.atomic():
+                self.payment_number = self.generate_payment_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_payment_number(self):
         """Generate unique payment number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = Payment.objects.filter(
-            created_at__date=timezone.now().date()
-        ).count() + 1
-        return f"PAY-{timestamp}-{count:04d}"
+        return SequenceService.next_number('PAY', Payment, 'payment_number')
 
     @property
     def net_amount(self):
@@ -252,17 +250,14 @@ class PaymentRefund(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.refund_number:
-            self.refund_number = self.generate_refund_number()
+            with transaction.atomic():
+                self.refund_number = self.generate_refund_number()
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def generate_refund_number(self):
         """Generate unique refund number"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d')
-        count = PaymentRefund.objects.filter(
-            requested_at__date=timezone.now().date()
-        ).count() + 1
-        return f"REF-{timestamp}-{count:04d}"
+        return SequenceService.next_number('REF', PaymentRefund, 'refund_number')
 
 
 class WebhookEvent(models.Model):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PriceList, PriceRule, LateFeeRule
+from .models import PriceList, PriceListVersion, PriceRule, LateFeeRule, ProductPriceTable
 
 
 class PriceRuleInline(admin.TabularInline):
@@ -90,3 +90,29 @@ class LateFeeRuleAdmin(admin.ModelAdmin):
             'fields': ('is_active',)
         })
     )
+
+
+@admin.register(ProductPriceTable)
+class ProductPriceTableAdmin(admin.ModelAdmin):
+    list_display = ('product', 'price_list', 'from_daily_rate', 'quantity_tiers', 'valid_on', 'built_at')
+    list_filter = ('price_list', 'quantity_tiers', 'valid_on')
+    search_fields = ('product__sku', 'product__name')
+    raw_id_fields = ('product',)
+    readonly_fields = ('version', 'valid_on', 'quantity_tiers', 'prices', 'from_daily_rate', 'built_at')
+
+
+@admin.register(PriceListVersion)
+class PriceListVersionAdmin(admin.ModelAdmin):
+    """Versions are immutable; they are published by apps.pricing.versions"""
+    list_display = ('price_list', 'number', 'content_hash', 'rule_count', 'created_at')
+    list_filter = ('price_list', 'created_at')
+    search_fields = ('price_list__name', 'content_hash')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PricingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pricing'
+    
+    def ready(self):
+        # Import signal handlers when app is ready
+        try:
+            import apps.pricing.signals
+        except ImportError:
+            pass
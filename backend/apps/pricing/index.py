@@ -0,0 +1,222 @@
+"""
+Compiled in-memory index of active price lists and price rules.
+
+Price list and rule resolution used to cost a multi-``Q`` query per lookup.
+The index loads every active PriceList and PriceRule once, groups lists by
+customer group and rules by product and category (each bucket pre-sorted in
+resolution order), and answers lookups with a dictionary access followed by
+a short scan over the sorted bucket.
+
+Each process keeps one index. It is tagged with a version stamp stored in
+the shared cache; pricing signals bump the stamp on every change, and a
+process whose index carries an older stamp rebuilds it on its next lookup.
+Code that changes pricing rows with ``update()``/``bulk_create`` must call
+invalidate_pricing_index() itself.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date as date_type
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PriceList, PriceListVersion, PriceRule
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'pricing:index-version'
+
+# How often (seconds) a process re-reads the shared version stamp
+VERSION_CHECK_INTERVAL = 1.0
+
+
+def _valid_on(obj, date: date_type) -> bool:
+    return (obj.valid_from is None or obj.valid_from <= date) and \
+        (obj.valid_to is None or obj.valid_to >= date)
+
+
+class PricingIndex:
+    """Lookup structure over active price lists and rules"""
+
+    def __init__(
+        self,
+        price_lists: List[PriceList],
+        rules: List[PriceRule],
+        version: Optional[str] = None,
+        version_hashes: Optional[Dict[int, str]] = None
+    ):
+        self.version = version
+        self.price_lists = {price_list.id: price_list for price_list in price_lists}
+        # Content hash of each list's current version (apps.pricing.versions)
+        self.version_hashes = version_hashes or {}
+
+        # Resolution order: priority, then default lists, then id for stability
+        ordered = sorted(
+            price_lists,
+            key=lambda price_list: (-price_list.priority, not price_list.is_default, price_list.id)
+        )
+        self._lists_by_group = defaultdict(list)
+        for price_list in ordered:
+            self._lists_by_group[price_list.customer_group_id].append(price_list)
+        self._group_candidates = {}
+
+        # Fallback mirrors the Meta ordering of PriceList
+        defaults = sorted(
+            (price_list for price_list in price_lists if price_list.is_default),
+            key=lambda price_list: (-price_list.priority, price_list.name)
+        )
+        self.default_price_list = defaults[0] if defaults else None
+
+        # Within a scope, higher duration and quantity requirements win
+        rule_order = sorted(
+            rules,
+            key=lambda rule: (-rule.min_duration_hours, -rule.min_quantity, rule.id)
+        )
+        self.rules = {rule.id: rule for rule in rules}
+        self._product_rules = defaultdict(list)
+        self._category_rules = defaultdict(list)
+        for rule in rule_order:
+            if rule.product_id is not None:
+                self._product_rules[(rule.price_list_id, rule.product_id)].append(rule)
+            elif rule.category_id is not None:
+                self._category_rules[(rule.price_list_id, rule.category_id)].append(rule)
+
+    @classmethod
+    def build(cls, version: Optional[str] = None) -> 'PricingIndex':
+        """Load the active pricing rows (three queries) and compile them"""
+        price_lists = list(PriceList.objects.filter(is_active=True))
+        # Rules of inactive lists stay resolvable for callers holding such a list
+        rules = list(PriceRule.objects.filter(is_active=True))
+        version_hashes = dict(PriceListVersion.objects.filter(
+            pk__in=[price_list.current_version_id for price_list in price_lists if price_list.current_version_id]
+        ).values_list('pk', 'content_hash'))
+        return cls(price_lists, rules, version, version_hashes)
+
+    def _candidates(self, customer_group_id) -> List[PriceList]:
+        """Lists a customer group may use, in resolution order"""
+        if customer_group_id is None:
+            return self._lists_by_group.get(None, [])
+
+        candidates = self._group_candidates.get(customer_group_id)
+        if candidates is None:
+            candidates = sorted(
+                self._lists_by_group.get(None, []) + self._lists_by_group.get(customer_group_id, []),
+                key=lambda price_list: (-price_list.priority, not price_list.is_default, price_list.id)
+            )
+            self._group_candidates[customer_group_id] = candidates
+        return candidates
+
+    def price_list_for(self, customer_group=None, date: Optional[date_type] = None) -> Optional[PriceList]:
+        """
+        Highest priority list valid on ``date`` for the group (general lists
+        included), falling back to the default list.
+        """
+        if date is None:
+            date = timezone.now().date()
+        customer_group_id = getattr(customer_group, 'pk', customer_group)
+
+        for price_list in self._candidates(customer_group_id):
+            if _valid_on(price_list, date):
+                return price_list
+        return self.default_price_list
+
+    def version_hash(self, price_list: Optional[PriceList]) -> Optional[str]:
+        """Content hash of the list's current version, or None if unpublished"""
+        if price_list is None:
+            return None
+        return self.version_hashes.get(price_list.current_version_id)
+
+    def rule_buckets(self, product, price_list: PriceList) -> List[List[PriceRule]]:
+        """Rules of ``price_list`` that may apply to the product, product rules first"""
+        buckets = [self._product_rules.get((price_list.id, product.id), [])]
+        if product.category_id is not None:
+            buckets.append(self._category_rules.get((price_list.id, product.category_id), []))
+        return buckets
+
+    def rule_for(
+        self,
+        product,
+        price_list: Optional[PriceList],
+        duration_hours: float,
+        quantity: int = 1,
+        date: Optional[date_type] = None
+    ) -> Optional[PriceRule]:
+        """
+        Most specific rule of ``price_list`` for the product: product rules
+        before category rules, then higher minimum duration and quantity.
+        """
+        if price_list is None:
+            return None
+        if date is None:
+            date = timezone.now().date()
+
+        for rules in self.rule_buckets(product, price_list):
+            for rule in rules:
+                if (
+                    rule.min_duration_hours <= duration_hours
+                    and rule.min_quantity <= quantity
+                    and _valid_on(rule, date)
+                ):
+                    return rule
+        return None
+
+
+_index: Optional[PricingIndex] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _shared_version() -> Optional[str]:
+    try:
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(VERSION_CACHE_KEY)
+        return version
+    except Exception as e:
+        logger.warning(f"Could not read pricing index version: {str(e)}")
+        return None
+
+
+def get_pricing_index() -> PricingIndex:
+    """The process-wide index, rebuilt when the shared version moved on"""
+    global _index, _checked_at
+
+    now = time.monotonic()
+    index = _index
+    if index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return index
+
+    version = _shared_version()
+    if index is not None and version is not None and index.version == version:
+        _checked_at = now
+        return index
+
+    with _lock:
+        if _index is None or version is None or _index.version != version:
+            _index = PricingIndex.build(version)
+        _checked_at = now
+        return _index
+
+
+def _bump_version():
+    global _index
+    _index = None
+    try:
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not bump pricing index version: {str(e)}")
+
+
+def invalidate_pricing_index():
+    """
+    Drop this process's index and bump the shared version stamp once the
+    current transaction commits, so no process rebuilds from rows that are
+    not visible yet.
+    """
+    transaction.on_commit(_bump_version)
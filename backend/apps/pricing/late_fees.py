@@ -0,0 +1,246 @@
+"""
+Batch late-fee engine.
+
+LateFeeRuleIndex loads every active LateFeeRule once and files it under its
+scope, keeping the highest-priority rule per product, per category and
+globally. The rule for a rental line is then a few dictionary lookups: the
+product's own rule, else the nearest category rule walking up the category
+tree, else the global rule.
+
+LateFeeEngine prices every overdue RentalItem of a set of orders in one
+pass over a single ``values()`` query and writes the per-order totals to
+RentalOrder.late_fee_amount with one ``UPDATE ... CASE`` per batch. The
+nightly overdue run, return confirmation and the pricing API share it, so
+an order is charged the same way everywhere.
+
+Fees per line: PERCENTAGE charges a share of the line total; FIXED_PER_DAY
+(partial days rounded up) and FIXED_PER_HOUR charge per unit rented. Grace
+hours are not charged, ``max_fee_days`` limits the charged duration and
+``max_fee_amount`` caps the line's fee. Fees are computed in integer paise
+(utils.money).
+"""
+import math
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Case, DecimalField, Value, When
+from django.utils import timezone
+
+from apps.catalog.tree import get_category_tree
+from apps.orders.models import RentalItem, RentalOrder
+from utils.money import from_paise, percent_of, prorate, to_paise
+
+from .models import LateFeeRule
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+
+# Orders whose items are still out with the customer
+OVERDUE_STATUSES = [
+    RentalOrder.Status.PICKED_UP,
+    RentalOrder.Status.ACTIVE,
+    RentalOrder.Status.RETURN_SCHEDULED,
+]
+
+DEFAULT_CHUNK_SIZE = 1000
+UPDATE_BATCH_SIZE = 500
+
+ZERO = Decimal('0.00')
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def late_fee_for_rule(rule: LateFeeRule, late_seconds: float, rental_amount, quantity: int = 1) -> Decimal:
+    """Fee under ``rule`` for a line returned ``late_seconds`` after it was due"""
+    grace_seconds = rule.grace_period_hours * SECONDS_PER_HOUR
+    if late_seconds <= grace_seconds:
+        return ZERO
+    # Started seconds count, so a partial day still rounds up to a day
+    chargeable = math.ceil(late_seconds - grace_seconds)
+    if rule.max_fee_days:
+        chargeable = min(chargeable, rule.max_fee_days * SECONDS_PER_DAY)
+
+    if rule.fee_type == LateFeeRule.FeeType.PERCENTAGE:
+        fee = percent_of(to_paise(rental_amount), rule.fee_value)
+    elif rule.fee_type == LateFeeRule.FeeType.FIXED_PER_DAY:
+        fee = to_paise(rule.fee_value) * -(-chargeable // SECONDS_PER_DAY) * quantity
+    elif rule.fee_type == LateFeeRule.FeeType.FIXED_PER_HOUR:
+        fee = prorate(to_paise(rule.fee_value), chargeable * quantity, SECONDS_PER_HOUR)
+    else:
+        return ZERO
+
+    if rule.max_fee_amount:
+        fee = min(fee, to_paise(rule.max_fee_amount))
+    return from_paise(fee)
+
+
+class LateFeeRuleIndex:
+    """Best active late-fee rule per scope"""
+
+    def __init__(self, rules: Iterable[LateFeeRule]):
+        self.product_rules = {}
+        self.category_rules = {}
+        self.global_rule = None
+        for rule in sorted(rules, key=lambda rule: (-rule.priority, rule.id)):
+            if rule.product_id is not None:
+                self.product_rules.setdefault(rule.product_id, rule)
+            elif rule.category_id is not None:
+                self.category_rules.setdefault(rule.category_id, rule)
+            elif self.global_rule is None:
+                self.global_rule = rule
+
+    @classmethod
+    def load(cls) -> 'LateFeeRuleIndex':
+        return cls(LateFeeRule.objects.filter(is_active=True))
+
+
+class LateFeeEngine:
+    """Price late returns for many rental lines against one rule index"""
+
+    def __init__(self, index: Optional[LateFeeRuleIndex] = None):
+        self.index = index or LateFeeRuleIndex.load()
+        self._category_nodes = None
+        self._rules_by_category = {}
+
+    def _category_rule(self, category_id) -> Optional[LateFeeRule]:
+        """Nearest rule on the category or one of its ancestors, memoized"""
+        if category_id is None or not self.index.category_rules:
+            return None
+        if category_id in self._rules_by_category:
+            return self._rules_by_category[category_id]
+
+        if self._category_nodes is None:
+            self._category_nodes = get_category_tree().nodes
+        rule = None
+        seen = set()
+        current = category_id
+        while current is not None and current not in seen:
+            seen.add(current)
+            rule = self.index.category_rules.get(current)
+            if rule is not None:
+                break
+            node = self._category_nodes.get(current)
+            current = node['parent'] if node else None
+        self._rules_by_category[category_id] = rule
+        return rule
+
+    def rule_for(self, product_id, category_id=None) -> Optional[LateFeeRule]:
+        """Product rule, else nearest category rule, else the global rule"""
+        return (
+            self.index.product_rules.get(product_id)
+            or self._category_rule(category_id)
+            or self.index.global_rule
+        )
+
+    def fee_for(self, product_id, category_id, due_at, returned_at, rental_amount, quantity: int = 1) -> Decimal:
+        """Late fee for one line due at ``due_at`` and returned (or still out) at ``returned_at``"""
+        if returned_at <= due_at:
+            return ZERO
+        rule = self.rule_for(product_id, category_id)
+        if rule is None:
+            return ZERO
+        return late_fee_for_rule(rule, (returned_at - due_at).total_seconds(), rental_amount, quantity)
+
+    def assess(self, order_ids: Iterable, as_of=None) -> Dict:
+        """
+        Late fees of the given orders' items as of ``as_of`` (default: now),
+        without saving anything.
+
+        Returns {order_id: {
+            'late_fee': Decimal,
+            'items': [{'item_id', 'product_id', 'rule_id', 'late_hours', 'late_fee'}]
+        }}
+        """
+        as_of = as_of or timezone.now()
+        order_ids = list(order_ids)
+        results = {order_id: {'late_fee': ZERO, 'items': []} for order_id in order_ids}
+
+        lines = RentalItem.objects.filter(
+            order_id__in=order_ids,
+            end_datetime__lt=as_of
+        ).values(
+            'id', 'order_id', 'product_id', 'product__category_id',
+            'quantity', 'line_total', 'end_datetime'
+        )
+        for line in lines.iterator(chunk_size=2000):
+            rule = self.rule_for(line['product_id'], line['product__category_id'])
+            if rule is None:
+                continue
+            late_seconds = (as_of - line['end_datetime']).total_seconds()
+            fee = late_fee_for_rule(rule, late_seconds, line['line_total'], line['quantity'])
+            result = results[line['order_id']]
+            result['late_fee'] += fee
+            result['items'].append({
+                'item_id': line['id'],
+                'product_id': line['product_id'],
+                'rule_id': rule.id,
+                'late_hours': round(late_seconds / SECONDS_PER_HOUR, 2),
+                'late_fee': fee
+            })
+        return results
+
+    def run(self, orders=None, as_of=None, persist: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+        """
+        Assess ``orders`` (a queryset; default: every overdue open rental)
+        and write changed totals to RentalOrder.late_fee_amount. Orders
+        that left the overdue statuses meanwhile are not touched, so a fee
+        settled at return is never overwritten by the nightly run.
+
+        Returns {
+            'orders': int,
+            'items': int,
+            'updated': int,
+            'total_late_fees': Decimal,
+            'fees': {order_id: Decimal}
+        }
+        """
+        as_of = as_of or timezone.now()
+        if orders is None:
+            orders = RentalOrder.objects.filter(status__in=OVERDUE_STATUSES, rental_end__lt=as_of)
+
+        report = {'orders': 0, 'items': 0, 'updated': 0, 'total_late_fees': ZERO, 'fees': {}}
+        current = orders.order_by('pk').values_list('pk', 'late_fee_amount')
+        for chunk in _chunks(current.iterator(chunk_size=chunk_size), chunk_size):
+            stored = dict(chunk)
+            results = self.assess(stored, as_of)
+
+            changed = {}
+            for order_id, result in results.items():
+                report['orders'] += 1
+                report['items'] += len(result['items'])
+                report['total_late_fees'] += result['late_fee']
+                report['fees'][order_id] = result['late_fee']
+                if result['late_fee'] != stored[order_id]:
+                    changed[order_id] = result['late_fee']
+
+            if persist:
+                report['updated'] += LateFeeEngine.persist(changed)
+        return report
+
+    @staticmethod
+    def persist(fees: Dict) -> int:
+        """Write ``{order_id: fee}`` to open orders, one UPDATE per batch"""
+        updated = 0
+        for batch in _chunks(fees.items(), UPDATE_BATCH_SIZE):
+            updated += RentalOrder.objects.filter(
+                pk__in=[order_id for order_id, _ in batch],
+                status__in=OVERDUE_STATUSES
+            ).update(
+                late_fee_amount=Case(
+                    *[When(pk=order_id, then=Value(fee)) for order_id, fee in batch],
+                    output_field=DecimalField(max_digits=12, decimal_places=2)
+                )
+            )
+        return updated
+
+    def order_fee(self, order: RentalOrder, returned_at=None) -> Decimal:
+        """Total late fee of one order returned at ``returned_at`` (default: now)"""
+        return self.assess([order.pk], returned_at)[order.pk]['late_fee']
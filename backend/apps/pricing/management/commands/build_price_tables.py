@@ -0,0 +1,36 @@
+"""
+Management command to rebuild the precomputed price tables.
+Usage: python manage.py build_price_tables [--product 12 --product 15] [--price-list 3]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.pricing.tables import PriceTables
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed product price tables for the standard duration buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='products',
+            help='Only rebuild this product (may be given several times)'
+        )
+        parser.add_argument(
+            '--price-list',
+            action='append',
+            dest='price_lists',
+            help='Only rebuild this price list (may be given several times)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Building price tables...")
+
+        written = PriceTables.build(
+            product_ids=options['products'],
+            price_list_ids=options['price_lists']
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} price tables"))
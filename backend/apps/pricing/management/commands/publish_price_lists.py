@@ -0,0 +1,29 @@
+"""
+Management command to publish versions of price lists whose rules changed.
+Usage: python manage.py publish_price_lists [--price-list 3 --price-list 4]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.pricing.versions import PriceListVersions
+
+
+class Command(BaseCommand):
+    help = 'Compile price lists into immutable versions, creating one wherever the content changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--price-list',
+            action='append',
+            dest='price_lists',
+            help='Only publish this price list (may be given several times)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Publishing price list versions...")
+
+        versions = PriceListVersions.publish(options['price_lists'])
+
+        for version in versions.values():
+            self.stdout.write(f"{version}: {version.rule_count} rules")
+        self.stdout.write(self.style.SUCCESS(f"{len(versions)} price lists are current"))
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_inventory_ledger'),
+        ('pricing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valid_on', models.DateField()),
+                ('quantity_tiers', models.BooleanField(default=False)),
+                ('prices', models.JSONField(default=dict)),
+                ('from_daily_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_tables', to='pricing.pricelist')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_tables', to='catalog.product')),
+            ],
+            options={
+                'verbose_name': 'Product Price Table',
+                'verbose_name_plural': 'Product Price Tables',
+                'db_table': 'product_price_tables',
+                'constraints': [models.UniqueConstraint(fields=('product', 'price_list'), name='unique_product_price_table')],
+            },
+        ),
+    ]
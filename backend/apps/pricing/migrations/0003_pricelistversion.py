@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-16 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0002_productpricetable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceListVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('payload', models.JSONField()),
+                ('rule_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('price_list', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='pricing.pricelist')),
+            ],
+            options={
+                'verbose_name': 'Price List Version',
+                'verbose_name_plural': 'Price List Versions',
+                'db_table': 'price_list_versions',
+                'ordering': ['price_list', '-number'],
+                'constraints': [models.UniqueConstraint(fields=('price_list', 'number'), name='unique_price_list_version')],
+            },
+        ),
+        migrations.AddField(
+            model_name='pricelist',
+            name='current_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pricing.pricelistversion'),
+        ),
+        migrations.AddField(
+            model_name='productpricetable',
+            name='version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_tables', to='pricing.pricelistversion'),
+        ),
+    ]
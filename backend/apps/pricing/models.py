@@ -27,6 +27,16 @@ class PriceList(models.Model):
     # Priority (higher number = higher priority)
     priority = models.PositiveIntegerField(default=10)
     
+    # Latest compiled snapshot of the list and its rules; see apps.pricing.versions
+    current_version = models.ForeignKey(
+        'PriceListVersion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
+    
     # Status
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -241,3 +251,72 @@ class LateFeeRule(models.Model):
         # Cannot specify both product and category
         if self.product and self.category:
             raise ValidationError("Cannot specify both product and category")
+
+
+class PriceListVersion(models.Model):
+    """
+    Immutable compiled snapshot of a price list and its active rules,
+    identified by the hash of its content; see apps.pricing.versions.
+    """
+    # Kept when the list is deleted so priced quotes and orders stay auditable
+    price_list = models.ForeignKey(PriceList, on_delete=models.SET_NULL, null=True, related_name='versions')
+    number = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=64, db_index=True)
+    # {'format', 'list': {...}, 'rule_fields': [...], 'rules': [[...], ...]}
+    payload = models.JSONField()
+    rule_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'price_list_versions'
+        verbose_name = 'Price List Version'
+        verbose_name_plural = 'Price List Versions'
+        ordering = ['price_list', '-number']
+        constraints = [
+            models.UniqueConstraint(fields=['price_list', 'number'], name='unique_price_list_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.payload['list']['name']} v{self.number} ({self.content_hash[:12]})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Price list versions are immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Price list versions are immutable")
+
+
+class ProductPriceTable(models.Model):
+    """
+    Precomputed unit prices of a product under one price list for the
+    standard duration buckets; see apps.pricing.tables.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_tables')
+    price_list = models.ForeignKey(PriceList, on_delete=models.CASCADE, related_name='price_tables')
+    # Version of the list the table was computed from
+    version = models.ForeignKey(
+        PriceListVersion, on_delete=models.SET_NULL, null=True, blank=True, related_name='price_tables'
+    )
+
+    # Day the rule and list validity windows were evaluated for
+    valid_on = models.DateField()
+    # Some rule in scope needs a minimum quantity above 1: quote other quantities live
+    quantity_tiers = models.BooleanField(default=False)
+    # {bucket: [base_paise, final_paise, price_rule_id]} for one unit
+    prices = models.JSONField(default=dict)
+    # Cheapest per-day price over the day-or-longer buckets ("from X/day")
+    from_daily_rate = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_price_tables'
+        verbose_name = 'Product Price Table'
+        verbose_name_plural = 'Product Price Tables'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'price_list'], name='unique_product_price_table'),
+        ]
+
+    def __str__(self):
+        return f"Price table of {self.product_id} under {self.price_list_id}"
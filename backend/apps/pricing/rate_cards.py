@@ -0,0 +1,49 @@
+"""
+Batched rate cards for product listings.
+
+A rate card holds a product's headline hourly/daily/weekly/monthly rates,
+taken from its own active price rules. Each rate comes from the first rule
+(in PriceRule's default ordering) that sets it, and the cards for a whole
+page of products are loaded with a single query.
+"""
+from typing import Dict, Iterable
+
+from django.db.models import Q
+
+from .models import PriceRule
+
+# Serializer field -> PriceRule rate field
+RATE_FIELDS = {
+    'hourly_rate': 'rate_hour',
+    'daily_rate': 'rate_day',
+    'weekly_rate': 'rate_week',
+    'monthly_rate': 'rate_month',
+}
+
+
+def load_rate_cards(product_ids: Iterable) -> Dict:
+    """
+    Return {product_id: {'daily_rate': Decimal, ...}}; rates no rule sets
+    are absent and every requested product gets an entry.
+    """
+    product_ids = list(product_ids)
+    cards = {product_id: {} for product_id in product_ids}
+    if not product_ids:
+        return cards
+
+    has_rate = Q()
+    for rate_field in RATE_FIELDS.values():
+        has_rate |= Q(**{f'{rate_field}__isnull': False})
+
+    rows = PriceRule.objects.filter(
+        has_rate, product_id__in=product_ids, is_active=True
+    ).order_by(
+        'product_id', '-min_duration_hours', '-min_quantity', 'id'
+    ).values_list('product_id', *RATE_FIELDS.values())
+
+    for product_id, *rates in rows:
+        card = cards[product_id]
+        for name, rate in zip(RATE_FIELDS, rates):
+            if rate is not None:
+                card.setdefault(name, rate)
+    return cards
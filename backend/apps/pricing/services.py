@@ -1,8 +1,34 @@
-from datetime import timedelta
 from decimal import Decimal
 from django.utils import timezone
-from .models import PriceList, PriceRule, LateFeeRule
+from django.utils.dateparse import parse_datetime
+from .models import PriceRule
+from .index import get_pricing_index
+from .versions import PriceListVersions
+from apps.accounts.models import UserProfile
 from apps.catalog.models import Product
+from utils.money import from_paise, percent_of, prorate, to_paise
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+
+# (unit, PriceRule rate field, length in seconds), largest first
+BILLING_UNITS = (
+    ('months', 'rate_month', 30 * SECONDS_PER_DAY),
+    ('weeks', 'rate_week', 7 * SECONDS_PER_DAY),
+    ('days', 'rate_day', SECONDS_PER_DAY),
+)
+
+
+def parse_pricing_datetime(value):
+    """Accept a datetime or an ISO 8601 string; naive values are made aware"""
+    if isinstance(value, str):
+        parsed = parse_datetime(value.replace('Z', '+00:00'))
+        if parsed is None:
+            raise ValueError(f"Invalid datetime: {value}")
+        value = parsed
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
 
 
 class PricingService:
@@ -11,86 +37,17 @@ class PricingService:
     @staticmethod
     def get_applicable_price_list(customer_group=None, date=None):
         """Get the most applicable price list for a customer group and date"""
-        if date is None:
-            date = timezone.now().date()
-        
-        # Start with all active price lists
-        price_lists = PriceList.objects.filter(is_active=True)
-        
-        # Filter by customer group
-        if customer_group:
-            price_lists = price_lists.filter(
-                models.Q(customer_group=customer_group) | 
-                models.Q(customer_group__isnull=True)
-            )
-        else:
-            # If no customer group, only consider general price lists
-            price_lists = price_lists.filter(customer_group__isnull=True)
-        
-        # Filter by validity dates
-        price_lists = price_lists.filter(
-            models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=date)
-        ).filter(
-            models.Q(valid_to__isnull=True) | models.Q(valid_to__gte=date)
-        )
-        
-        # Order by priority and return the first one
-        price_list = price_lists.order_by('-priority', '-is_default').first()
-        
-        if not price_list:
-            # Fallback to default price list
-            price_list = PriceList.objects.filter(
-                is_default=True, 
-                is_active=True
-            ).first()
-        
-        return price_list
+        return get_pricing_index().price_list_for(customer_group, date)
     
     @staticmethod
     def get_applicable_price_rule(product, price_list, duration_hours, quantity=1, date=None):
         """Get the most applicable price rule for a product"""
-        if date is None:
-            date = timezone.now().date()
-        
-        if not price_list:
-            return None
-        
-        # Get all rules for this price list
-        rules = price_list.rules.filter(is_active=True)
-        
-        # Filter by product or category
-        rules = rules.filter(
-            models.Q(product=product) | 
-            models.Q(category=product.category)
-        )
-        
-        # Filter by validity dates
-        rules = rules.filter(
-            models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=date)
-        ).filter(
-            models.Q(valid_to__isnull=True) | models.Q(valid_to__gte=date)
-        )
-        
-        # Filter by minimum requirements
-        rules = rules.filter(
-            min_duration_hours__lte=duration_hours,
-            min_quantity__lte=quantity
-        )
-        
-        # Order by specificity and requirements
-        rule = rules.order_by(
-            '-product_id',  # Product-specific rules first
-            '-min_duration_hours',  # Higher duration requirements first
-            '-min_quantity'  # Higher quantity requirements first
-        ).first()
-        
-        return rule
+        return get_pricing_index().rule_for(product, price_list, duration_hours, quantity, date)
     
     @staticmethod
     def calculate_base_price(product, start_datetime, end_datetime, quantity=1):
         """Calculate base rental price without discounts"""
-        duration = end_datetime - start_datetime
-        total_hours = Decimal(str(duration.total_seconds() / 3600))
+        seconds = int((end_datetime - start_datetime).total_seconds())
         
         # Get customer group from context (this could be passed as parameter)
         price_list = PricingService.get_applicable_price_list()
@@ -99,63 +56,41 @@ class PricingService:
             return Decimal('0.00')
         
         rule = PricingService.get_applicable_price_rule(
-            product, price_list, float(total_hours), quantity
+            product, price_list, seconds / SECONDS_PER_HOUR, quantity
         )
         
-        if not rule:
-            return Decimal('0.00')
-        
-        # Calculate price based on best fitting time unit
-        total_price = Decimal('0.00')
-        remaining_hours = total_hours
-        
-        # Try to use larger units first for better pricing
-        if rule.rate_month and remaining_hours >= 24 * 30:  # ~30 days
-            months = remaining_hours // (24 * 30)
-            total_price += Decimal(str(rule.rate_month)) * months
-            remaining_hours -= months * 24 * 30
-        
-        if rule.rate_week and remaining_hours >= 24 * 7:  # 7 days
-            weeks = remaining_hours // (24 * 7)
-            total_price += Decimal(str(rule.rate_week)) * weeks
-            remaining_hours -= weeks * 24 * 7
-        
-        if rule.rate_day and remaining_hours >= 24:  # 1 day
-            days = remaining_hours // 24
-            total_price += Decimal(str(rule.rate_day)) * days
-            remaining_hours -= days * 24
-        
-        if rule.rate_hour and remaining_hours > 0:
-            total_price += Decimal(str(rule.rate_hour)) * remaining_hours
-        
-        # Apply quantity multiplier
-        total_price *= Decimal(str(quantity))
-        
-        return total_price.quantize(Decimal('0.01'))
+        return PricingService.line_base_price(rule, seconds, quantity)[1]
     
     @staticmethod
-    def apply_discount(base_price, rule):
-        """Apply discount from price rule"""
+    def price_for_rule(rule, total_hours, quantity=1):
+        """Base price of a rental under ``rule``, using the largest time units first"""
+        seconds = int(round(total_hours * SECONDS_PER_HOUR))
+        return PricingService.line_base_price(rule, seconds, quantity)[1]
+    
+    @staticmethod
+    def discount_paise(base_paise, rule):
+        """Discount of ``rule`` on a base price in paise, never more than the price"""
         if not rule or not rule.discount_type or not rule.discount_value:
-            return base_price
-        
-        discount_value = Decimal(str(rule.discount_value))
+            return 0
         
         if rule.discount_type == PriceRule.DiscountType.PERCENTAGE:
-            discount_amount = base_price * discount_value / Decimal('100')
+            discount = percent_of(base_paise, rule.discount_value)
         else:  # FIXED
-            discount_amount = discount_value
+            discount = to_paise(rule.discount_value)
         
         # Ensure discount doesn't exceed base price
-        discount_amount = min(discount_amount, base_price)
-        
-        return (base_price - discount_amount).quantize(Decimal('0.01'))
+        return min(discount, base_paise)
+    
+    @staticmethod
+    def apply_discount(base_price, rule):
+        """Apply discount from price rule"""
+        base_paise = to_paise(base_price)
+        return from_paise(base_paise - PricingService.discount_paise(base_paise, rule))
     
     @staticmethod
     def calculate_rental_price(product, start_datetime, end_datetime, quantity=1, customer_group=None):
         """Calculate final rental price including discounts"""
-        duration = end_datetime - start_datetime
-        total_hours = Decimal(str(duration.total_seconds() / 3600))
+        seconds = int((end_datetime - start_datetime).total_seconds())
         
         price_list = PricingService.get_applicable_price_list(customer_group)
         
@@ -170,83 +105,233 @@ class PricingService:
             }
         
         rule = PricingService.get_applicable_price_rule(
-            product, price_list, float(total_hours), quantity
-        )
-        
-        base_price = PricingService.calculate_base_price(
-            product, start_datetime, end_datetime, quantity
+            product, price_list, seconds / SECONDS_PER_HOUR, quantity
         )
         
-        final_price = PricingService.apply_discount(base_price, rule) if rule else base_price
-        discount_amount = base_price - final_price
+        _, base_paise = PricingService.line_base_paise(rule, seconds, quantity)
+        discount_paise = PricingService.discount_paise(base_paise, rule)
         
         return {
-            'base_price': base_price,
-            'discount_amount': discount_amount,
-            'final_price': final_price,
+            'base_price': from_paise(base_paise),
+            'discount_amount': from_paise(discount_paise),
+            'final_price': from_paise(base_paise - discount_paise),
             'currency': price_list.currency,
             'price_list': price_list,
             'price_rule': rule,
-            'duration_hours': float(total_hours),
+            'duration_hours': seconds / SECONDS_PER_HOUR,
             'quantity': quantity
         }
     
     @staticmethod
-    def calculate_late_fee(product, rental_end_datetime, actual_return_datetime, rental_amount):
-        """Calculate late return fees"""
-        if actual_return_datetime <= rental_end_datetime:
-            return Decimal('0.00')
-        
-        # Get applicable late fee rule
-        late_fee_rules = LateFeeRule.objects.filter(is_active=True).filter(
-            models.Q(product=product) | 
-            models.Q(category=product.category) |
-            models.Q(product__isnull=True, category__isnull=True)  # Global rules
-        ).order_by('-priority', '-product_id', '-category_id')
-        
-        rule = late_fee_rules.first()
-        if not rule:
-            return Decimal('0.00')
-        
-        # Calculate late duration
-        late_duration = actual_return_datetime - rental_end_datetime
-        
-        # Apply grace period
-        if late_duration.total_seconds() <= rule.grace_period_hours * 3600:
-            return Decimal('0.00')
-        
-        actual_late_duration = late_duration - timedelta(hours=rule.grace_period_hours)
-        
-        # Calculate fee based on rule type
-        fee_amount = Decimal('0.00')
-        
-        if rule.fee_type == LateFeeRule.FeeType.PERCENTAGE:
-            fee_amount = rental_amount * Decimal(str(rule.fee_value)) / Decimal('100')
-        
-        elif rule.fee_type == LateFeeRule.FeeType.FIXED_PER_DAY:
-            late_days = actual_late_duration.days
-            if actual_late_duration.seconds > 0:
-                late_days += 1  # Round up partial days
+    def decompose_duration(seconds, rule):
+        """
+        Split a duration (integer seconds) into the rule's billing units,
+        largest first, the way price_for_rule does. Units the rule has no
+        rate for are skipped; leftover seconds are billed per hour.
+        
+        Returns {'months': int, 'weeks': int, 'days': int, 'seconds': int}
+        """
+        units = {'months': 0, 'weeks': 0, 'days': 0, 'seconds': 0}
+        remaining = seconds
+        for unit, rate_field, unit_seconds in BILLING_UNITS:
+            if getattr(rule, rate_field) and remaining >= unit_seconds:
+                units[unit], remaining = divmod(remaining, unit_seconds)
+        units['seconds'] = remaining
+        return units
+    
+    @staticmethod
+    def calculate_batch(lines, customer_group=None, date=None, version=None, index=None):
+        """
+        Price many lines at once
+        
+        Products are loaded in one query and price lists/rules come from the
+        compiled pricing index, so the whole batch costs a single query
+        however many lines it has. Durations are handled as integer seconds
+        and amounts as integer paise (utils.money).
+        
+        With a PriceListVersion, lines are priced against that snapshot of
+        its list (apps.pricing.versions) instead of the live rules, and
+        customer_group is ignored. Otherwise ``index`` may supply a freshly
+        built PricingIndex in place of the process-wide one.
+        
+        lines: [{'product_id': int, 'start_datetime': dt, 'end_datetime': dt, 'quantity': int}]
+        
+        Returns one result per line, in input order:
+        [
+            {
+                'line': int,
+                'product_id': int,
+                'quantity': int,
+                'duration_hours': float,
+                'duration_days': int,  # Partial days count as a day
+                'units': {'months': int, 'weeks': int, 'days': int, 'hours': Decimal},
+                'base_price': Decimal,
+                'discount_amount': Decimal,
+                'subtotal': Decimal,
+                'total_price': Decimal,
+                'currency': str,
+                'applied_rules': [{'price_list_id': int, 'price_list_version_id': int, 'price_rule_id': int}]
+            },
+            ...
+        ]
+        Lines that cannot be priced carry an 'error' key instead.
+        """
+        if version is not None:
+            index = PriceListVersions.index_for(version)
+            price_list = PriceListVersions.price_list_of(version)
+        else:
+            index = index or get_pricing_index()
+            price_list = index.price_list_for(customer_group, date)
+        currency = price_list.currency if price_list else 'INR'
+        
+        product_ids = set()
+        for line in lines:
+            try:
+                product_ids.add(int(line['product_id']))
+            except (TypeError, ValueError):
+                pass
+        products = Product.objects.only('id', 'category_id').in_bulk(list(product_ids))
+        
+        rules = {}
+        results = []
+        for position, line in enumerate(lines):
+            quantity = int(line.get('quantity', 1))
+            try:
+                product = products.get(int(line['product_id']))
+            except (TypeError, ValueError):
+                product = None
+            seconds = int((line['end_datetime'] - line['start_datetime']).total_seconds())
             
-            if rule.max_fee_days:
-                late_days = min(late_days, rule.max_fee_days)
+            if product is None or seconds <= 0 or quantity < 1:
+                results.append({
+                    'line': position,
+                    'product_id': line['product_id'],
+                    'quantity': quantity,
+                    'error': 'Product not found' if product is None else 'Invalid duration or quantity'
+                })
+                continue
             
-            fee_amount = Decimal(str(rule.fee_value)) * Decimal(str(late_days))
-        
-        elif rule.fee_type == LateFeeRule.FeeType.FIXED_PER_HOUR:
-            late_hours = actual_late_duration.total_seconds() / 3600
-            if rule.max_fee_days:
-                max_hours = rule.max_fee_days * 24
-                late_hours = min(late_hours, max_hours)
+            duration_hours = seconds / SECONDS_PER_HOUR
+            rule_key = (product.id, duration_hours, quantity)
+            if rule_key not in rules:
+                rules[rule_key] = index.rule_for(product, price_list, duration_hours, quantity, date)
+            rule = rules[rule_key]
             
-            fee_amount = Decimal(str(rule.fee_value)) * Decimal(str(late_hours))
-        
-        # Apply maximum fee cap if specified
-        if rule.max_fee_amount:
-            fee_amount = min(fee_amount, Decimal(str(rule.max_fee_amount)))
+            units, base_price = PricingService.line_base_price(rule, seconds, quantity)
+            results.append(PricingService.line_result(
+                position, product.id, quantity, seconds, units, base_price, rule, price_list, currency
+            ))
         
-        return fee_amount.quantize(Decimal('0.01'))
-
-
-# Import models for Q objects
-from django.db import models
+        return results
+    
+    @staticmethod
+    def line_base_paise(rule, seconds, quantity=1):
+        """
+        Unit split and base price in paise of ``seconds`` under ``rule``.
+        Whole units are exact; the hourly remainder of all ``quantity``
+        units is rounded once. Returns (units, base_paise); see
+        decompose_duration().
+        """
+        if not rule:
+            return {'months': 0, 'weeks': 0, 'days': 0, 'seconds': seconds}, 0
+        units = PricingService.decompose_duration(seconds, rule)
+        base_paise = 0
+        for unit, rate_field, _ in BILLING_UNITS:
+            if units[unit]:
+                base_paise += to_paise(getattr(rule, rate_field)) * units[unit]
+        base_paise *= quantity
+        if rule.rate_hour and units['seconds']:
+            base_paise += prorate(to_paise(rule.rate_hour), units['seconds'] * quantity, SECONDS_PER_HOUR)
+        return units, base_paise
+    
+    @staticmethod
+    def line_base_price(rule, seconds, quantity=1):
+        """Unit split and base price of ``seconds`` under ``rule``; see line_base_paise()"""
+        units, base_paise = PricingService.line_base_paise(rule, seconds, quantity)
+        return units, from_paise(base_paise)
+    
+    @staticmethod
+    def line_result(position, product_id, quantity, seconds, units, base_price, rule, price_list, currency):
+        """One calculate_batch() result from a priced line"""
+        base_paise = to_paise(base_price)
+        discount_paise = PricingService.discount_paise(base_paise, rule)
+        days, remainder = divmod(seconds, SECONDS_PER_DAY)
+        return {
+            'line': position,
+            'product_id': product_id,
+            'quantity': quantity,
+            'duration_hours': seconds / SECONDS_PER_HOUR,
+            'duration_days': days + (1 if remainder else 0),
+            'units': {
+                'months': units['months'],
+                'weeks': units['weeks'],
+                'days': units['days'],
+                'hours': Decimal(units['seconds']) / SECONDS_PER_HOUR,
+            },
+            'base_price': from_paise(base_paise),
+            'discount_amount': from_paise(discount_paise),
+            'subtotal': from_paise(base_paise),
+            'total_price': from_paise(base_paise - discount_paise),
+            'currency': currency,
+            'applied_rules': [
+                {
+                    'price_list_id': price_list.id,
+                    'price_list_version_id': price_list.current_version_id,
+                    'price_rule_id': rule.id
+                }
+            ] if rule else []
+        }
+    
+    @staticmethod
+    def customer_group_for(customer_id):
+        """Customer group id of a user, or None"""
+        if not customer_id:
+            return None
+        return UserProfile.objects.filter(
+            user_id=customer_id
+        ).values_list('customer_group_id', flat=True).first()
+    
+    @staticmethod
+    def calculate_product_price(product_id, start_date, end_date, customer_id=None, quantity=1, rental_unit='DAY'):
+        """
+        Price one product for a rental window; dates may be datetimes or
+        ISO 8601 strings. Same result shape as calculate_batch().
+        
+        Standard durations are answered from the precomputed price tables
+        (apps.pricing.tables); anything else is computed live.
+        """
+        from .tables import PriceTables
+        
+        start_datetime = parse_pricing_datetime(start_date)
+        end_datetime = parse_pricing_datetime(end_date)
+        customer_group = PricingService.customer_group_for(customer_id)
+        
+        result = PriceTables.quote(product_id, start_datetime, end_datetime, quantity, customer_group)
+        if result is not None:
+            return result
+        
+        result = PricingService.calculate_batch(
+            [{
+                'product_id': product_id,
+                'start_datetime': start_datetime,
+                'end_datetime': end_datetime,
+                'quantity': quantity
+            }],
+            customer_group=customer_group
+        )[0]
+        if 'error' in result:
+            raise ValueError(result['error'])
+        return result
+    
+    @staticmethod
+    def calculate_late_fee(product, rental_end_datetime, actual_return_datetime, rental_amount, quantity=1):
+        """Calculate the late return fee of one rental line; see apps.pricing.late_fees"""
+        from .late_fees import LateFeeEngine
+        return LateFeeEngine().fee_for(
+            product.id,
+            product.category_id,
+            rental_end_datetime,
+            actual_return_datetime,
+            rental_amount,
+            quantity
+        )
@@ -0,0 +1,81 @@
+"""
+Invalidate the compiled pricing index whenever price lists or rules change,
+publish new versions of the affected lists, queue incremental rebuilds of
+their price tables and re-price the open quotes in a changed rule's scope.
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from apps.catalog.models import Product
+from apps.orders.repricing import request_repricing
+
+from .index import invalidate_pricing_index
+from .models import PriceList, PriceRule
+from .tables import request_rebuild
+from .versions import request_publish
+
+
+@receiver(post_save, sender=PriceList)
+@receiver(post_delete, sender=PriceList)
+@receiver(post_save, sender=PriceRule)
+@receiver(post_delete, sender=PriceRule)
+def pricing_changed(sender, instance, raw=False, **kwargs):
+    invalidate_pricing_index()
+    if raw:
+        return
+    if sender is PriceList:
+        request_publish([instance.pk])
+    else:
+        previous = getattr(instance, '_table_previous_scope', None) or {}
+        request_publish([instance.price_list_id, previous.get('price_list_id')])
+
+
+@receiver(pre_save, sender=PriceRule)
+def remember_rule_scope(sender, instance, **kwargs):
+    instance._table_previous_scope = None
+    if not instance._state.adding:
+        instance._table_previous_scope = PriceRule.objects.filter(
+            pk=instance.pk
+        ).values('price_list_id', 'product_id', 'category_id').first()
+
+
+@receiver(post_save, sender=PriceRule)
+@receiver(post_delete, sender=PriceRule)
+def rule_tables_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = [{
+        'price_list_id': instance.price_list_id,
+        'product_id': instance.product_id,
+        'category_id': instance.category_id
+    }]
+    previous = getattr(instance, '_table_previous_scope', None)
+    if previous and previous != scopes[0]:
+        scopes.append(previous)
+
+    for scope in scopes:
+        if scope['product_id'] is None and scope['category_id'] is None:
+            # A rule without scope matches nothing (see PricingIndex.rule_for)
+            continue
+        rule_scope = {
+            'product_ids': [scope['product_id']] if scope['product_id'] else None,
+            'category_ids': [scope['category_id']] if scope['category_id'] else None,
+            'price_list_ids': [scope['price_list_id']]
+        }
+        request_rebuild(**rule_scope)
+        request_repricing(**rule_scope)
+
+
+@receiver(post_save, sender=PriceList)
+def price_list_tables_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    request_rebuild(price_list_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def product_tables_changed(sender, instance, raw=False, **kwargs):
+    # The category decides which category rules apply
+    if raw:
+        return
+    request_rebuild(product_ids=[instance.pk])
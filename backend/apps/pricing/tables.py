@@ -0,0 +1,312 @@
+"""
+Precomputed price tables per product, price list and duration bucket.
+
+For every active product and price list, the price of one unit for each
+standard duration (DURATION_BUCKETS, 1 hour to 90 days) is computed in the
+background from the compiled pricing index and stored as one compact
+ProductPriceTable row, mirrored in the cache. Amounts are integer paise.
+
+The calculator answers standard durations from the table and the catalog
+shows "from X/day" badges from it, both without touching the database
+when the cache is warm. Odd durations, products with quantity-tiered rules
+(for quantities above 1) and tables built for another day fall back to
+live computation.
+
+Tables record the price list version (apps.pricing.versions) they were
+computed from, and their cache keys carry its content hash: once a list
+changes, lookups stop matching the old tables and price live until the
+rebuild lands.
+
+Tables are rebuilt incrementally (as a Celery task, after commit) when a
+price rule, price list or product changes, and in full every night since
+rule validity windows move with the date.
+"""
+import logging
+from collections import OrderedDict
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.catalog.models import Product
+from utils.money import from_paise, to_paise
+
+from .index import PricingIndex, get_pricing_index
+from .models import PriceList, ProductPriceTable
+from .versions import PriceListVersions
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600
+
+# Bucket key -> duration in hours
+DURATION_BUCKETS = OrderedDict([
+    ('1h', 1), ('2h', 2), ('4h', 4), ('8h', 8), ('12h', 12),
+    ('1d', 24), ('2d', 48), ('3d', 72), ('5d', 120),
+    ('7d', 7 * 24), ('14d', 14 * 24), ('21d', 21 * 24),
+    ('30d', 30 * 24), ('60d', 60 * 24), ('90d', 90 * 24),
+])
+BUCKETS_BY_SECONDS = {hours * SECONDS_PER_HOUR: key for key, hours in DURATION_BUCKETS.items()}
+
+CACHE_PREFIX = 'pricing:table'
+# Tables are rebuilt nightly; entries outlive one cycle
+CACHE_TIMEOUT = 26 * 60 * 60
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def bucket_for(seconds: int) -> Optional[str]:
+    """Bucket key of a standard duration, or None"""
+    return BUCKETS_BY_SECONDS.get(seconds)
+
+
+def table_cache_key(version_hash, product_id) -> str:
+    """Keyed on the price list version, so a new version never reads stale tables"""
+    return f"{CACHE_PREFIX}:{version_hash}:{product_id}"
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class PriceTables:
+    """Build, load and quote from the precomputed price tables"""
+
+    @staticmethod
+    def compute(product, price_list, index: PricingIndex, date) -> Dict:
+        """
+        Table payload of one product under one price list:
+        {'valid_on': str, 'quantity_tiers': bool, 'prices': {bucket: [base, final, rule_id]}, 'from_daily': int|None}
+        """
+        from .services import PricingService
+
+        prices = {}
+        from_daily = None
+        for key, hours in DURATION_BUCKETS.items():
+            rule = index.rule_for(product, price_list, hours, 1, date)
+            if rule is None:
+                continue
+            _, base = PricingService.line_base_paise(rule, hours * SECONDS_PER_HOUR, 1)
+            final = base - PricingService.discount_paise(base, rule)
+            prices[key] = [base, final, rule.id]
+            if hours >= 24:
+                per_day = -(-final * 24 // hours)  # Rounded up to the paisa
+                from_daily = per_day if from_daily is None else min(from_daily, per_day)
+
+        quantity_tiers = any(
+            rule.min_quantity > 1
+            for rules in index.rule_buckets(product, price_list)
+            for rule in rules
+        )
+        return {
+            'valid_on': date.isoformat(),
+            'quantity_tiers': quantity_tiers,
+            'prices': prices,
+            'from_daily': from_daily
+        }
+
+    @staticmethod
+    def build(
+        product_ids: Optional[Iterable] = None,
+        category_ids: Optional[Iterable] = None,
+        price_list_ids: Optional[Iterable] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> int:
+        """
+        (Re)build the tables of the given products, products of the given
+        categories and/or price lists; everything when no scope is given.
+        Rows are upserted per chunk and mirrored in the cache. A full
+        build also drops tables of lists that are no longer active.
+
+        Returns the number of tables written.
+        """
+        # Lists that were never published (e.g. created before versioning) have no table key yet
+        unpublished = PriceList.objects.filter(is_active=True, current_version__isnull=True)
+        PriceListVersions.publish(unpublished.values_list('pk', flat=True))
+
+        # A fresh index: the process-wide one may lag behind a change for a second
+        index = PricingIndex.build()
+        date = timezone.now().date()
+
+        price_lists = [
+            price_list for price_list in index.price_lists.values()
+            if index.version_hash(price_list) is not None
+        ]
+        if price_list_ids is not None:
+            wanted = {int(pk) for pk in price_list_ids}
+            price_lists = [price_list for price_list in price_lists if price_list.id in wanted]
+
+        products = Product.objects.filter(is_active=True).only('id', 'category_id').order_by('id')
+        if product_ids is not None or category_ids is not None:
+            scope = Q(pk__in=list(product_ids or [])) | Q(category_id__in=list(category_ids or []))
+            products = products.filter(scope)
+
+        written = 0
+        for chunk in _chunks(products.iterator(chunk_size=chunk_size), chunk_size):
+            rows = []
+            payloads = {}
+            for product in chunk:
+                for price_list in price_lists:
+                    payload = PriceTables.compute(product, price_list, index, date)
+                    payloads[table_cache_key(index.version_hash(price_list), product.id)] = payload
+                    rows.append(ProductPriceTable(
+                        product_id=product.id,
+                        price_list_id=price_list.id,
+                        version_id=price_list.current_version_id,
+                        valid_on=date,
+                        quantity_tiers=payload['quantity_tiers'],
+                        prices=payload['prices'],
+                        from_daily_rate=(
+                            from_paise(payload['from_daily']) if payload['from_daily'] is not None else None
+                        )
+                    ))
+            ProductPriceTable.objects.bulk_create(
+                rows,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['product', 'price_list'],
+                update_fields=['version', 'valid_on', 'quantity_tiers', 'prices', 'from_daily_rate', 'built_at']
+            )
+            try:
+                cache.set_many(payloads, CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Could not cache price tables: {str(e)}")
+            written += len(rows)
+
+        if product_ids is None and category_ids is None and price_list_ids is None:
+            ProductPriceTable.objects.exclude(
+                price_list_id__in=[price_list.id for price_list in price_lists]
+            ).delete()
+        return written
+
+    @staticmethod
+    def load(product_ids: Iterable, price_list, index: Optional[PricingIndex] = None) -> Dict:
+        """
+        {product_id: payload} of the list's current version from the cache,
+        then one query for misses (which are cached again). Products
+        without a table for that version are absent.
+        """
+        product_ids = list(product_ids)
+        version_hash = (index or get_pricing_index()).version_hash(price_list)
+        if not product_ids or version_hash is None:
+            return {}
+
+        keys = {table_cache_key(version_hash, product_id): product_id for product_id in product_ids}
+        try:
+            cached = cache.get_many(list(keys))
+        except Exception as e:
+            logger.warning(f"Could not read cached price tables: {str(e)}")
+            cached = {}
+        tables = {keys[key]: payload for key, payload in cached.items()}
+
+        missing = [product_id for product_id in product_ids if product_id not in tables]
+        if missing:
+            found = {}
+            rows = ProductPriceTable.objects.filter(
+                product_id__in=missing,
+                price_list_id=price_list.id,
+                version_id=price_list.current_version_id
+            )
+            for row in rows:
+                payload = {
+                    'valid_on': row.valid_on.isoformat(),
+                    'quantity_tiers': row.quantity_tiers,
+                    'prices': row.prices,
+                    'from_daily': to_paise(row.from_daily_rate) if row.from_daily_rate is not None else None
+                }
+                tables[row.product_id] = payload
+                found[table_cache_key(version_hash, row.product_id)] = payload
+            if found:
+                try:
+                    cache.set_many(found, CACHE_TIMEOUT)
+                except Exception as e:
+                    logger.warning(f"Could not cache price tables: {str(e)}")
+        return tables
+
+    @staticmethod
+    def from_daily_rates(product_ids: Iterable, customer_group=None) -> Dict:
+        """{product_id: Decimal} "from X/day" prices under the customer's price list"""
+        index = get_pricing_index()
+        price_list = index.price_list_for(customer_group)
+        if price_list is None:
+            return {}
+        today = timezone.now().date().isoformat()
+        return {
+            product_id: from_paise(table['from_daily'])
+            for product_id, table in PriceTables.load(product_ids, price_list, index).items()
+            if table['from_daily'] is not None and table['valid_on'] == today
+        }
+
+    @staticmethod
+    def quote(product_id, start_datetime, end_datetime, quantity: int = 1, customer_group=None) -> Optional[Dict]:
+        """
+        calculate_batch()-shaped result for a standard duration from the
+        table, or None when the line has to be priced live.
+        """
+        from .services import PricingService
+
+        seconds = int((end_datetime - start_datetime).total_seconds())
+        bucket = bucket_for(seconds)
+        if bucket is None or quantity < 1:
+            return None
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+
+        index = get_pricing_index()
+        date = timezone.now().date()
+        price_list = index.price_list_for(customer_group, date)
+        if price_list is None:
+            return None
+
+        table = PriceTables.load([product_id], price_list, index).get(product_id)
+        if table is None or table['valid_on'] != date.isoformat():
+            return None
+        if quantity > 1 and table['quantity_tiers']:
+            return None
+
+        entry = table['prices'].get(bucket)
+        if entry is None:
+            # No rule covers this duration
+            units, base_price, rule = {'months': 0, 'weeks': 0, 'days': 0, 'seconds': seconds}, Decimal('0.00'), None
+        else:
+            base_paise, _, rule_id = entry
+            rule = index.rules.get(rule_id)
+            if rule is None:
+                return None
+            units = PricingService.decompose_duration(seconds, rule)
+            base_price = from_paise(base_paise * quantity)
+
+        return PricingService.line_result(
+            0, product_id, quantity, seconds, units, base_price, rule, price_list, price_list.currency
+        )
+
+
+def request_rebuild(product_ids=None, category_ids=None, price_list_ids=None):
+    """Queue an incremental rebuild once the current transaction commits"""
+    scope = {
+        'product_ids': sorted({int(pk) for pk in product_ids}) if product_ids else None,
+        'category_ids': sorted({int(pk) for pk in category_ids}) if category_ids else None,
+        'price_list_ids': sorted({int(pk) for pk in price_list_ids}) if price_list_ids else None,
+    }
+    if not any(scope.values()):
+        return
+
+    def queue():
+        try:
+            from .tasks import rebuild_price_tables
+            rebuild_price_tables.delay(**scope)
+        except Exception as e:
+            logger.warning(f"Could not queue price table rebuild, leaving it to the nightly run: {str(e)}")
+
+    transaction.on_commit(queue)
@@ -0,0 +1,22 @@
+"""
+Celery tasks for the precomputed price tables.
+"""
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rebuild_price_tables(product_ids=None, category_ids=None, price_list_ids=None):
+    """Rebuild price tables for a scope; everything when no scope is given"""
+    from apps.pricing.tables import PriceTables
+
+    written = PriceTables.build(
+        product_ids=product_ids,
+        category_ids=category_ids,
+        price_list_ids=price_list_ids
+    )
+    logger.info(f"Rebuilt {written} price tables")
+    return written
@@ -0,0 +1,237 @@
+"""
+Immutable, content-hashed price list versions.
+
+A version is the compiled form of one price list and its active rules: the
+list's pricing attributes plus one row per rule, with rates and discount
+values in integer hundredths (utils.money) and dates as ISO strings,
+identified by the SHA-256 of its canonical JSON. Versions are numbered per
+list and never change once written.
+
+A version is published after every commit that touches a list or its rules
+(the pricing signals and bulk imports call request_publish()). Publishing
+content that hashes to the current version is a no-op, so re-saving an
+unchanged rule does not create a version.
+
+Quotes and orders record the version they were priced against, and the
+price table cache is keyed on the version hash, so a new version simply
+stops matching old entries. index_for() turns a version back into a
+PricingIndex without reading the rule tables; the result is memoized,
+since a version never changes. Audits and re-pricing resolve rules
+through it.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Max
+
+from utils.money import from_paise, to_paise
+
+from .index import PricingIndex, get_pricing_index, invalidate_pricing_index
+from .models import PriceList, PriceListVersion, PriceRule
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1
+
+LIST_FIELDS = (
+    'id', 'name', 'currency', 'customer_group_id', 'is_default', 'priority', 'valid_from', 'valid_to',
+)
+RULE_FIELDS = (
+    'id', 'product_id', 'category_id', 'valid_from', 'valid_to',
+    'rate_hour', 'rate_day', 'rate_week', 'rate_month', 'discount_type', 'discount_value',
+    'min_duration_hours', 'min_quantity',
+)
+# Two-place decimals, stored as integer hundredths
+DECIMAL_FIELDS = {'rate_hour', 'rate_day', 'rate_week', 'rate_month', 'discount_value'}
+DATE_FIELDS = {'valid_from', 'valid_to'}
+
+# Compiled versions kept per process
+COMPILED_CACHE_SIZE = 64
+
+
+def _encode(name, value):
+    if value is None:
+        return None
+    if name in DECIMAL_FIELDS:
+        return to_paise(value)
+    if name in DATE_FIELDS:
+        return value.isoformat()
+    return value
+
+
+def _decode(name, value):
+    if value is None:
+        return None
+    if name in DECIMAL_FIELDS:
+        return from_paise(value)
+    if name in DATE_FIELDS:
+        return date.fromisoformat(value)
+    return value
+
+
+def compile_price_list(price_list: PriceList, rules: Iterable[PriceRule]) -> Dict:
+    """Version payload of a list and its (active) rules"""
+    return {
+        'format': FORMAT,
+        'list': {name: _encode(name, getattr(price_list, name)) for name in LIST_FIELDS},
+        'rule_fields': list(RULE_FIELDS),
+        'rules': [
+            [_encode(name, getattr(rule, name)) for name in RULE_FIELDS]
+            for rule in sorted(rules, key=lambda rule: rule.id)
+        ]
+    }
+
+
+def content_hash(payload: Dict) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+class PriceListVersions:
+    """Publish price list versions and resolve prices against them"""
+
+    @staticmethod
+    def publish_one(price_list_id) -> Optional[PriceListVersion]:
+        """
+        Compile the list and store a new version if its content changed.
+        The list row is locked while compiling so concurrent publishers
+        number versions in order. Returns the current version, or None
+        when the list does not exist.
+        """
+        with transaction.atomic():
+            price_list = PriceList.objects.select_for_update().filter(pk=price_list_id).first()
+            if price_list is None:
+                return None
+            payload = compile_price_list(
+                price_list, PriceRule.objects.filter(price_list_id=price_list.id, is_active=True)
+            )
+            digest = content_hash(payload)
+
+            current = None
+            if price_list.current_version_id is not None:
+                current = PriceListVersion.objects.filter(pk=price_list.current_version_id).first()
+            if current is not None and current.content_hash == digest:
+                return current
+
+            latest = PriceListVersion.objects.filter(
+                price_list_id=price_list.id
+            ).aggregate(number=Max('number'))['number']
+            version = PriceListVersion.objects.create(
+                price_list=price_list,
+                number=(latest or 0) + 1,
+                content_hash=digest,
+                payload=payload,
+                rule_count=len(payload['rules'])
+            )
+            # update() skips the pricing signals, which would publish again
+            PriceList.objects.filter(pk=price_list.id).update(current_version=version)
+
+        invalidate_pricing_index()
+        return version
+
+    @staticmethod
+    def publish(price_list_ids: Optional[Iterable] = None) -> Dict:
+        """
+        Publish the given lists (default: every list).
+
+        Returns {price_list_id: PriceListVersion} of their current versions.
+        """
+        if price_list_ids is None:
+            price_list_ids = PriceList.objects.values_list('pk', flat=True)
+        versions = {}
+        for price_list_id in sorted({int(pk) for pk in price_list_ids}):
+            version = PriceListVersions.publish_one(price_list_id)
+            if version is not None:
+                versions[price_list_id] = version
+        return versions
+
+    @staticmethod
+    def current_version_id(price_list_id) -> Optional[int]:
+        """Id of the list's current version, publishing a first one if needed"""
+        if price_list_id is None:
+            return None
+        price_list = get_pricing_index().price_lists.get(price_list_id)
+        if price_list is not None and price_list.current_version_id is not None:
+            return price_list.current_version_id
+
+        version_id = PriceList.objects.filter(pk=price_list_id).values_list('current_version_id', flat=True).first()
+        if version_id is None:
+            version = PriceListVersions.publish_one(price_list_id)
+            version_id = version.id if version is not None else None
+        return version_id
+
+    @staticmethod
+    def restore(version: PriceListVersion) -> PricingIndex:
+        """Build a PricingIndex over the version's list and rules, without queries"""
+        payload = version.payload
+        price_list = PriceList(
+            is_active=True,
+            current_version_id=version.id,
+            **{name: _decode(name, payload['list'][name]) for name in LIST_FIELDS}
+        )
+        rules = [
+            PriceRule(
+                price_list_id=price_list.id,
+                is_active=True,
+                **{name: _decode(name, value) for name, value in zip(payload['rule_fields'], row)}
+            )
+            for row in payload['rules']
+        ]
+        return PricingIndex([price_list], rules, version.content_hash, {version.id: version.content_hash})
+
+    @staticmethod
+    def index_for(version: PriceListVersion) -> PricingIndex:
+        """Compiled index of a version, memoized per process"""
+        with _compiled_lock:
+            index = _compiled.get(version.pk)
+            if index is not None:
+                _compiled.move_to_end(version.pk)
+                return index
+
+        index = PriceListVersions.restore(version)
+        with _compiled_lock:
+            _compiled[version.pk] = index
+            while len(_compiled) > COMPILED_CACHE_SIZE:
+                _compiled.popitem(last=False)
+        return index
+
+    @staticmethod
+    def price_list_of(version: PriceListVersion) -> PriceList:
+        """The (unsaved) list of a version's compiled index"""
+        return PriceListVersions.index_for(version).price_lists[version.payload['list']['id']]
+
+
+_pending = threading.local()
+
+
+def _publish_pending():
+    price_list_ids = getattr(_pending, 'ids', None)
+    if not price_list_ids:
+        return
+    _pending.ids = set()
+    try:
+        PriceListVersions.publish(price_list_ids)
+    except Exception as e:
+        logger.warning(f"Could not publish price list versions {sorted(price_list_ids)}: {str(e)}")
+
+
+def request_publish(price_list_ids: Iterable):
+    """
+    Publish the lists once the current transaction commits. Requests made
+    within one transaction are collected and published together.
+    """
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.update(int(pk) for pk in price_list_ids if pk is not None)
+    transaction.on_commit(_publish_pending)
@@ -3,7 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+import math
 from datetime import datetime
+from decimal import Decimal
 
 from .models import (
     PriceList, PriceRule, LateFeeRule
@@ -14,11 +16,14 @@ from .serializers import (
 )
 
 try:
-    from .services import PricingService
+    from .services import PricingService, parse_pricing_datetime
     pricing_service = PricingService()
 except ImportError:
     pricing_service = None
 
+# Upper bound for one batch_calculate request
+MAX_BATCH_LINES = 500
+
 
 class PriceListViewSet(viewsets.ModelViewSet):
     queryset = PriceList.objects.all()
@@ -161,56 +166,44 @@ class PricingViewSet(viewsets.ViewSet):
                     'success': False,
                     'error': 'Items array is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
+            if len(items) > MAX_BATCH_LINES:
+                return Response({
+                    'success': False,
+                    'error': f'At most {MAX_BATCH_LINES} items per request'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            results = []
-            total_amount = 0
+            lines = [
+                {
+                    'product_id': item['product_id'],
+                    'start_datetime': parse_pricing_datetime(item['start_datetime']),
+                    'end_datetime': parse_pricing_datetime(item['end_datetime']),
+                    'quantity': int(item.get('quantity', 1))
+                }
+                for item in items
+            ]
+            results = PricingService.calculate_batch(
+                lines,
+                customer_group=PricingService.customer_group_for(request.data.get('customer_id'))
+            )
             
-            for item in items:
-                # Use the same calculation logic as above
-                if pricing_service:
-                    result = pricing_service.calculate_product_price(
-                        product_id=item['product_id'],
-                        start_date=item['start_datetime'],
-                        end_date=item['end_datetime'],
-                        customer_id=request.data.get('customer_id'),
-                        quantity=item.get('quantity', 1)
-                    )
-                else:
-                    # Basic calculation fallback
-                    from apps.catalog.models import Product
-                    product = get_object_or_404(Product, id=item['product_id'])
-                    
-                    start_date = datetime.fromisoformat(item['start_datetime'].replace('Z', '+00:00'))
-                    end_date = datetime.fromisoformat(item['end_datetime'].replace('Z', '+00:00'))
-                    days = (end_date - start_date).days or 1
-                    quantity = item.get('quantity', 1)
-                    
-                    base_rate = product.rental_rate_per_day or 100
-                    total_price = base_rate * days * quantity
-                    
-                    result = {
-                        'product_id': item['product_id'],
-                        'base_price': base_rate,
-                        'quantity': quantity,
-                        'duration_days': days,
-                        'subtotal': total_price,
-                        'total_price': total_price,
-                        'currency': 'INR'
-                    }
-                
-                results.append(result)
-                total_amount += result.get('total_price', 0)
+            total_amount = sum(
+                (result['total_price'] for result in results if 'error' not in result),
+                Decimal('0.00')
+            )
+            currency = next(
+                (result['currency'] for result in results if 'error' not in result), 'INR'
+            )
             
             return Response({
                 'success': True,
                 'data': {
                     'items': results,
                     'total_amount': total_amount,
-                    'currency': 'INR'
+                    'currency': currency
                 }
             })
             
-        except Exception as e:
+        except (KeyError, TypeError, ValueError) as e:
             return Response({
                 'success': False,
                 'error': str(e)
@@ -229,36 +222,22 @@ class PricingViewSet(viewsets.ViewSet):
                     'error': 'order_id and actual_return_date are required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            if pricing_service:
-                result = pricing_service.calculate_late_fee(
-                    order_id=order_id,
-                    actual_return_date=return_date
-                )
-            else:
-                # Basic late fee calculation
-                from apps.orders.models import RentalOrder
-                order = get_object_or_404(RentalOrder, id=order_id)
-                
-                expected_return = order.end_date
-                actual_return = datetime.fromisoformat(return_date.replace('Z', '+00:00')).date()
-                
-                if actual_return > expected_return:
-                    overdue_days = (actual_return - expected_return).days
-                    daily_late_fee = 50  # Default late fee
-                    total_late_fee = daily_late_fee * overdue_days
-                    
-                    result = {
-                        'overdue_days': overdue_days,
-                        'daily_late_fee': daily_late_fee,
-                        'total_late_fee': total_late_fee,
-                        'currency': 'INR'
-                    }
-                else:
-                    result = {
-                        'overdue_days': 0,
-                        'total_late_fee': 0,
-                        'currency': 'INR'
-                    }
+            from apps.orders.models import RentalOrder
+            from .late_fees import SECONDS_PER_DAY, LateFeeEngine
+            order = get_object_or_404(RentalOrder, id=order_id)
+            returned_at = parse_pricing_datetime(return_date)
+            
+            assessment = LateFeeEngine().assess([order.pk], returned_at)[order.pk]
+            overdue_seconds = max((returned_at - order.rental_end).total_seconds(), 0)
+            result = {
+                'overdue_days': math.ceil(overdue_seconds / SECONDS_PER_DAY),
+                'total_late_fee': float(assessment['late_fee']),
+                'items': [
+                    {**item, 'late_fee': float(item['late_fee'])}
+                    for item in assessment['items']
+                ],
+                'currency': order.currency
+            }
             
             return Response({
                 'success': True,
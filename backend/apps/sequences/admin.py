@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import DocumentSequence
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    """Admin interface for document sequences"""
+    list_display = ['prefix', 'period', 'last_value', 'updated_at']
+    list_filter = ['prefix', 'period']
+    search_fields = ['prefix']
+    readonly_fields = ['updated_at']
+    date_hierarchy = 'period'
@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class DocumentSequence(models.Model):
+    """Per-prefix, per-day counter behind document numbers (Q-, RO-, INV-, ...)"""
+    prefix = models.CharField(max_length=16)
+    period = models.DateField()
+    last_value = models.PositiveBigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'document_sequences'
+        verbose_name = 'Document Sequence'
+        verbose_name_plural = 'Document Sequences'
+        ordering = ['-period', 'prefix']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['prefix', 'period'],
+                name='unique_document_sequence_period'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}-{self.period:%Y%m%d}: {self.last_value}"
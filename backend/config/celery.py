@@ -30,6 +30,22 @@ app.conf.beat_schedule = {
         'task': 'apps.notifications.tasks.check_overdue_returns',
         'schedule': crontab(hour=10, minute=0),  # Run daily at 10:00 AM
     },
+    'drain-notification-outbox': {
+        'task': 'apps.notifications.tasks.drain_notification_outbox',
+        'schedule': 60.0,  # Every minute; commits also trigger a drain
+    },
+    'reconcile-inventory': {
+        'task': 'apps.catalog.tasks.reconcile_inventory',
+        'schedule': crontab(hour=2, minute=0),  # Run daily at 2:00 AM
+    },
+    'snapshot-inventory': {
+        'task': 'apps.catalog.tasks.snapshot_inventory',
+        'schedule': crontab(hour=2, minute=30),  # After reconciliation
+    },
+    'rebuild-price-tables': {
+        'task': 'apps.pricing.tasks.rebuild_price_tables',
+        'schedule': crontab(hour=0, minute=15),  # Daily, once rule validity windows have moved
+    },
 }
 
 app.conf.timezone = 'UTC'
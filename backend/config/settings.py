@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'drf_spectacular',
     
     # Local apps
+    'apps.sequences',
     'apps.accounts',
     'apps.catalog',
     'apps.pricing',
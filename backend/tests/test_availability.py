@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.catalog.models import Product
+from apps.orders.availability import find_free_windows, peak_usage, usage_profile
+from apps.orders.services import AvailabilityService
+
+
+def at(hour, day=1):
+    return datetime(2026, 1, day, hour)
+
+
+class PeakUsageTests(SimpleTestCase):
+
+    def test_touching_intervals_do_not_stack(self):
+        intervals = [(at(8), at(10), 2), (at(10), at(12), 3)]
+        self.assertEqual(peak_usage(intervals, at(0), at(23)), 3)
+
+    def test_overlapping_intervals_stack(self):
+        intervals = [(at(8), at(11), 2), (at(10), at(12), 3)]
+        self.assertEqual(peak_usage(intervals, at(0), at(23)), 5)
+
+    def test_disjoint_overlaps_of_window_do_not_stack(self):
+        intervals = [(at(6), at(9), 4), (at(15), at(20), 4)]
+        self.assertEqual(peak_usage(intervals, at(8), at(16)), 4)
+
+    def test_interval_touching_window_edge_is_outside(self):
+        intervals = [(at(6), at(8), 5), (at(16), at(18), 5)]
+        self.assertEqual(peak_usage(intervals, at(8), at(16)), 0)
+
+    def test_zero_length_window(self):
+        intervals = [(at(6), at(18), 5)]
+        self.assertEqual(peak_usage(intervals, at(10), at(10)), 0)
+
+    def test_zero_length_interval(self):
+        intervals = [(at(10), at(10), 5)]
+        self.assertEqual(peak_usage(intervals, at(0), at(23)), 0)
+
+    def test_profile_merges_simultaneous_events(self):
+        intervals = [(at(8), at(10), 2), (at(10), at(12), 3)]
+        self.assertEqual(
+            usage_profile(intervals, at(0), at(23)),
+            [(at(0), 0), (at(8), 2), (at(10), 3), (at(12), 0)]
+        )
+
+
+class FindFreeWindowsTests(SimpleTestCase):
+
+    def search(self, intervals, **kwargs):
+        options = {
+            'capacity': 2,
+            'quantity': 1,
+            'duration': timedelta(days=1),
+            'anchor': at(0, day=10),
+            'step': timedelta(days=1),
+            'horizon_start': at(0, day=1),
+            'horizon_end': at(0, day=20),
+            'limit': 3,
+        }
+        options.update(kwargs)
+        return find_free_windows(intervals, **options)
+
+    def starts(self, windows):
+        return [window['start_datetime'] for window in windows]
+
+    def test_nearest_windows_around_anchor(self):
+        windows = self.search([], include_anchor=True)
+        self.assertEqual(self.starts(windows), [at(0, 10), at(0, 9), at(0, 11)])
+        self.assertTrue(all(window['available_quantity'] == 2 for window in windows))
+
+    def test_anchor_excluded_by_default(self):
+        self.assertEqual(self.search([])[0]['start_datetime'], at(0, 9))
+
+    def test_window_may_start_when_blocking_rental_ends(self):
+        # Fully booked from day 5 to day 12; day 12 starts exactly at the release
+        intervals = [(at(0, 5), at(0, 12), 2)]
+        windows = self.search(intervals, limit=2)
+        self.assertEqual(self.starts(windows), [at(0, 12), at(0, 13)])
+
+    def test_window_may_end_when_blocking_rental_starts(self):
+        intervals = [(at(0, 10), at(0, 20), 2)]
+        windows = self.search(intervals, limit=1)
+        self.assertEqual(self.starts(windows), [at(0, 9)])
+        self.assertEqual(windows[0]['end_datetime'], at(0, 10))
+
+    def test_gap_shorter_than_duration_is_skipped(self):
+        intervals = [(at(0, 1), at(12, 9), 2), (at(0, 10), at(0, 20), 2)]
+        self.assertEqual(self.search(intervals), [])
+
+    def test_partial_usage_reported(self):
+        intervals = [(at(0, 9), at(0, 10), 1)]
+        windows = self.search(intervals, limit=2)
+        self.assertEqual(self.starts(windows), [at(0, 9), at(0, 11)])
+        self.assertEqual([window['available_quantity'] for window in windows], [1, 2])
+
+    def test_zero_duration_or_step_finds_nothing(self):
+        self.assertEqual(self.search([], duration=timedelta(0)), [])
+        self.assertEqual(self.search([], step=timedelta(0)), [])
+
+    def test_quantity_above_capacity_finds_nothing(self):
+        self.assertEqual(self.search([], quantity=3), [])
+
+
+class BatchCheckAvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.drill = Product.objects.create(sku='DRL-1', name='Drill', quantity_on_hand=3)
+        cls.saw = Product.objects.create(sku='SAW-1', name='Saw', quantity_on_hand=1)
+        cls.start = timezone.make_aware(at(0, 10))
+
+    def line(self, product, start_day, end_day, quantity):
+        return {
+            'product_id': str(product.pk),
+            'start_datetime': self.start + timedelta(days=start_day),
+            'end_datetime': self.start + timedelta(days=end_day),
+            'quantity': quantity,
+        }
+
+    def test_lines_for_the_same_product_compete(self):
+        results = AvailabilityService.batch_check_availability([
+            self.line(self.drill, 0, 2, 2),
+            self.line(self.drill, 1, 3, 2),
+            self.line(self.saw, 0, 1, 1),
+        ])
+        self.assertEqual([result['basket_quantity'] for result in results], [2, 2, 0])
+        self.assertEqual([result['available_quantity'] for result in results], [1, 1, 1])
+        self.assertEqual([result['available'] for result in results], [False, False, True])
+
+    def test_touching_basket_lines_do_not_compete(self):
+        results = AvailabilityService.batch_check_availability([
+            self.line(self.drill, 0, 1, 3),
+            self.line(self.drill, 1, 2, 3),
+        ])
+        self.assertTrue(all(result['available'] for result in results))
+        self.assertEqual([result['basket_quantity'] for result in results], [0, 0])
+
+    def test_unknown_product(self):
+        result = AvailabilityService.batch_check_availability([{
+            'product_id': '999999',
+            'start_datetime': self.start,
+            'end_datetime': self.start + timedelta(days=1),
+            'quantity': 1,
+        }])[0]
+        self.assertFalse(result['available'])
+        self.assertEqual(result['error'], 'Product not found')
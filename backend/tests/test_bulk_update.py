@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.catalog.models import Product, ProductCategory
+
+User = get_user_model()
+
+
+class ProductBulkUpdateTests(TestCase):
+    url = '/api/catalog/products/bulk_update/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        cls.tools = ProductCategory.objects.create(name='Tools')
+        cls.drill = Product.objects.create(sku='DRL-1', name='Cordless Drill')
+        cls.ladder = Product.objects.create(sku='LAD-1', name='Step Ladder')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def post(self, **data):
+        data['product_ids'] = [self.drill.id, self.ladder.id]
+        return self.client.post(self.url, data, format='json')
+
+    @mock.patch('apps.catalog.views.request_rebuild')
+    def test_rebuilds_price_tables(self, request_rebuild):
+        for payload in ({'action': 'deactivate'}, {'action': 'update_category', 'category': self.tools.id}):
+            request_rebuild.reset_mock()
+            response = self.post(**payload)
+            self.assertEqual(response.status_code, 200)
+            request_rebuild.assert_called_once()
+            self.assertEqual(
+                set(request_rebuild.call_args.kwargs['product_ids']),
+                {self.drill.id, self.ladder.id}
+            )
+
+    @mock.patch('apps.catalog.views.invalidate_category_tree')
+    def test_invalidates_category_tree(self, invalidate_category_tree):
+        for payload in ({'action': 'activate'}, {'action': 'update_category', 'category': self.tools.id}):
+            invalidate_category_tree.reset_mock()
+            response = self.post(**payload)
+            self.assertEqual(response.status_code, 200)
+            invalidate_category_tree.assert_called_once_with()
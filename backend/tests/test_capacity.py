@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+
+from apps.catalog.models import Product
+from apps.orders.capacity import bucket_starts, floor_bucket
+from apps.orders.models import ProductCapacityBucket, RentalOrder, Reservation, ReservationItem
+
+User = get_user_model()
+
+IST = dt_timezone(timedelta(hours=5, minutes=30))
+HOUR = ProductCapacityBucket.Granularity.HOUR
+DAY = ProductCapacityBucket.Granularity.DAY
+
+
+class FloorBucketTests(SimpleTestCase):
+
+    def test_hour_floors_the_instant_not_the_offset(self):
+        moment = datetime(2026, 3, 1, 10, 45, tzinfo=IST)
+        floored = floor_bucket(moment, HOUR)
+        self.assertEqual(floored, datetime(2026, 3, 1, 5, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(floored, floor_bucket(moment.astimezone(dt_timezone.utc), HOUR))
+
+    def test_day_floors_in_the_current_timezone(self):
+        moment = datetime(2026, 3, 1, 2, 0, tzinfo=IST)
+        self.assertEqual(floor_bucket(moment, DAY), datetime(2026, 2, 28, tzinfo=dt_timezone.utc))
+
+    def test_bucket_starts_cover_the_window(self):
+        start = datetime(2026, 3, 1, 10, 45, tzinfo=IST)
+        starts = bucket_starts(start, start + timedelta(hours=2), HOUR)
+        self.assertEqual(
+            starts,
+            [datetime(2026, 3, 1, hour, tzinfo=dt_timezone.utc) for hour in (5, 6, 7)]
+        )
+
+
+class CapacityBucketSignalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='customer', password='x')
+        cls.product = Product.objects.create(sku='CAM-1', name='Camera', quantity_on_hand=5)
+
+    def reservation(self):
+        start = datetime(2026, 3, 1, 10, 45, tzinfo=IST)
+        order = RentalOrder.objects.create(
+            customer=self.user, created_by=self.user,
+            rental_start=start, rental_end=start + timedelta(hours=3)
+        )
+        return Reservation.objects.create(order=order, return_due_at=order.rental_end)
+
+    def buckets(self, granularity=HOUR):
+        return ProductCapacityBucket.objects.filter(product=self.product, granularity=granularity)
+
+    def held(self):
+        return {
+            granularity: self.buckets(granularity).aggregate(total=Sum('reserved_quantity'))['total'] or 0
+            for granularity in (HOUR, DAY)
+        }
+
+    def test_offset_datetimes_return_buckets_to_zero(self):
+        reservation = self.reservation()
+        start = datetime(2026, 3, 1, 10, 45, tzinfo=IST)
+        item = ReservationItem.objects.create(
+            reservation=reservation, product=self.product, quantity=2,
+            start_datetime=start, end_datetime=start + timedelta(hours=2)
+        )
+        # 05:15-07:15 UTC touches the 05, 06 and 07 UTC hours
+        self.assertEqual(
+            sorted(self.buckets().filter(reserved_quantity=2).values_list('bucket_start', flat=True)),
+            [datetime(2026, 3, 1, hour, tzinfo=dt_timezone.utc) for hour in (5, 6, 7)]
+        )
+
+        # Edited through a fresh load (UTC from the database), with new offset values
+        item = ReservationItem.objects.get(pk=item.pk)
+        item.start_datetime = datetime(2026, 3, 1, 12, 15, tzinfo=IST)
+        item.end_datetime = datetime(2026, 3, 1, 13, 45, tzinfo=IST)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(
+            sorted(self.buckets().filter(reserved_quantity=3).values_list('bucket_start', flat=True)),
+            [datetime(2026, 3, 1, hour, tzinfo=dt_timezone.utc) for hour in (6, 7, 8)]
+        )
+        self.assertFalse(self.buckets().exclude(reserved_quantity__in=[0, 3]).exists())
+
+        item.delete()
+        self.assertEqual(self.held(), {HOUR: 0, DAY: 0})
+        self.assertFalse(self.buckets().exclude(reserved_quantity=0).exists())
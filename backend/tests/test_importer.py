@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.catalog.importer import CatalogImporter
+from apps.catalog.models import Product, ProductCategory, ProductSearchDocument
+
+
+class ProductImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tools = ProductCategory.objects.create(name='Tools')
+        cls.existing = Product.objects.create(sku='DRL-1', name='Drill', quantity_on_hand=2)
+
+    def run_import(self, records):
+        return CatalogImporter('products').run(enumerate(records, start=2))
+
+    def test_upserts_and_side_effects(self):
+        with mock.patch('apps.pricing.tables.request_rebuild') as request_rebuild:
+            report = self.run_import([
+                {'sku': 'DRL-1', 'category': 'Tools', 'quantity_on_hand': '5'},
+                {'sku': 'SAW-1', 'name': 'Saw', 'category': str(self.tools.pk), 'quantity_on_hand': '3'},
+            ])
+
+        self.assertEqual((report['created'], report['updated'], report['failed']), (1, 1, 0))
+        saw = Product.objects.get(sku='SAW-1')
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.category, self.tools)
+        self.assertEqual(self.existing.quantity_on_hand, 5)
+        self.assertEqual(saw.quantity_on_hand, 3)
+
+        # Bulk upserts fire no signals: the importer refreshes search
+        # documents and price tables itself
+        self.assertEqual(ProductSearchDocument.objects.get(product=self.existing).body, 'Tools')
+        request_rebuild.assert_called_once()
+        self.assertEqual(
+            sorted(request_rebuild.call_args.kwargs['product_ids']),
+            sorted([self.existing.pk, saw.pk])
+        )
+
+    def test_new_product_without_name_fails(self):
+        report = self.run_import([{'sku': 'NEW-1'}])
+        self.assertEqual(report['failed'], 1)
+        self.assertFalse(Product.objects.filter(sku='NEW-1').exists())
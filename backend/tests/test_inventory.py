@@ -0,0 +1,191 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.catalog.inventory import InventoryError, InventoryLedger
+from apps.catalog.models import InventoryLedgerEntry, InventorySnapshot, Product
+from apps.deliveries.models import StockMovement
+from apps.orders.models import RentalOrder, Reservation, ReservationItem
+
+User = get_user_model()
+
+
+class InventoryTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='staff', password='x')
+        cls.product = Product.objects.create(sku='TNT-1', name='Tent', quantity_on_hand=10)
+
+    def counters(self, product=None):
+        product = product or self.product
+        return dict(zip(
+            ['quantity_on_hand', 'quantity_reserved', 'quantity_rented'],
+            Product.objects.filter(pk=product.pk).values_list(
+                'quantity_on_hand', 'quantity_reserved', 'quantity_rented'
+            ).get()
+        ))
+
+    def reserve(self, quantity, status=Reservation.Status.RESERVED, product=None):
+        start = timezone.now() + timedelta(days=1)
+        order = RentalOrder.objects.create(
+            customer=self.user, created_by=self.user,
+            rental_start=start, rental_end=start + timedelta(days=2)
+        )
+        reservation = Reservation.objects.create(order=order, status=status, return_due_at=order.rental_end)
+        ReservationItem.objects.create(
+            reservation=reservation, product=product or self.product, quantity=quantity,
+            start_datetime=order.rental_start, end_datetime=order.rental_end
+        )
+        return reservation
+
+
+class LedgerPostingTests(InventoryTestCase):
+
+    def test_new_product_opens_its_balance(self):
+        entry = InventoryLedgerEntry.objects.get(product=self.product)
+        self.assertEqual(entry.kind, InventoryLedgerEntry.Kind.OPENING)
+        self.assertEqual(entry.on_hand_delta, 10)
+
+    def test_post_applies_deltas(self):
+        InventoryLedger.record(self.product.pk, InventoryLedgerEntry.Kind.ADJUSTMENT, on_hand=-3, reserved=2)
+        self.assertEqual(self.counters(), {'quantity_on_hand': 7, 'quantity_reserved': 2, 'quantity_rented': 0})
+
+    def test_post_below_zero_writes_nothing(self):
+        before = InventoryLedgerEntry.objects.count()
+        with self.assertRaises(InventoryError):
+            InventoryLedger.post([
+                InventoryLedgerEntry(product=self.product, kind=InventoryLedgerEntry.Kind.ADJUSTMENT, on_hand_delta=1),
+                InventoryLedgerEntry(product=self.product, kind=InventoryLedgerEntry.Kind.RELEASE, reserved_delta=-1),
+            ])
+        self.assertEqual(InventoryLedgerEntry.objects.count(), before)
+        self.assertEqual(self.counters()['quantity_on_hand'], 10)
+
+    def test_reservation_lifecycle(self):
+        reservation = self.reserve(4)
+        self.assertEqual(self.counters()['quantity_reserved'], 4)
+
+        reservation.status = Reservation.Status.ACTIVE
+        reservation.save()
+        self.assertEqual(self.counters(), {'quantity_on_hand': 10, 'quantity_reserved': 0, 'quantity_rented': 4})
+
+        reservation.status = Reservation.Status.COMPLETED
+        reservation.save()
+        self.assertEqual(self.counters(), {'quantity_on_hand': 10, 'quantity_reserved': 0, 'quantity_rented': 0})
+
+    def test_drifted_counter_does_not_block_status_change(self):
+        # A reservation from before the ledger: the counter never saw it
+        reservation = self.reserve(4)
+        Product.objects.filter(pk=self.product.pk).update(quantity_reserved=0)
+
+        reservation.status = Reservation.Status.ACTIVE
+        with self.assertLogs('apps.orders.signals', level='WARNING'):
+            reservation.save()
+
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, Reservation.Status.ACTIVE)
+        self.assertEqual(self.counters()['quantity_rented'], 0)
+
+    def test_damage_movement_writes_off_stock(self):
+        StockMovement.objects.create(
+            movement_number='SM-1', movement_type=StockMovement.MovementType.DAMAGE,
+            product=self.product, quantity=-2, handled_by=self.user
+        )
+        self.assertEqual(self.counters()['quantity_on_hand'], 8)
+
+
+class SnapshotTests(InventoryTestCase):
+
+    def test_balances_start_from_latest_snapshot(self):
+        self.reserve(3)
+        self.assertEqual(InventoryLedger.take_snapshots([self.product.pk]), 1)
+        self.assertEqual(InventoryLedger.take_snapshots([self.product.pk]), 0)
+
+        InventoryLedger.record(self.product.pk, InventoryLedgerEntry.Kind.ADJUSTMENT, on_hand=5)
+        self.assertEqual(InventoryLedger.balances([self.product.pk])[self.product.pk], self.counters())
+
+        # Entries up to the snapshot are not summed again: only the snapshot counts
+        InventorySnapshot.objects.filter(product=self.product).update(quantity_on_hand=100)
+        self.assertEqual(InventoryLedger.balances([self.product.pk])[self.product.pk]['quantity_on_hand'], 105)
+
+    def test_new_snapshot_supersedes_old(self):
+        InventoryLedger.take_snapshots([self.product.pk])
+        InventoryLedger.record(self.product.pk, InventoryLedgerEntry.Kind.ADJUSTMENT, on_hand=-4)
+        InventoryLedger.take_snapshots([self.product.pk])
+        latest = InventorySnapshot.objects.filter(product=self.product).first()
+        self.assertEqual(latest.quantity_on_hand, 6)
+        self.assertEqual(InventoryLedger.balances([self.product.pk])[self.product.pk]['quantity_on_hand'], 6)
+
+
+class ReconcileTests(InventoryTestCase):
+
+    def test_no_drift(self):
+        self.reserve(2)
+        report = InventoryLedger.reconcile([self.product.pk])
+        self.assertEqual(report['drifted'], 0)
+
+    def test_reports_drift_without_fixing(self):
+        self.reserve(2)
+        Product.objects.filter(pk=self.product.pk).update(quantity_reserved=0)
+
+        report = InventoryLedger.reconcile([self.product.pk], fix=False)
+
+        self.assertEqual(report['drifted'], 1)
+        self.assertEqual(report['drift'][0]['counters']['quantity_reserved'], 0)
+        self.assertEqual(report['drift'][0]['expected']['quantity_reserved'], 2)
+        self.assertEqual(self.counters()['quantity_reserved'], 0)
+
+    def test_fix_rebuilds_counters_and_ledger(self):
+        self.reserve(2)
+        self.reserve(1, status=Reservation.Status.ACTIVE)
+        Product.objects.filter(pk=self.product.pk).update(quantity_reserved=7, quantity_rented=0)
+        # A write-off that never reached the ledger
+        StockMovement.objects.bulk_create([StockMovement(
+            movement_number='SM-2', movement_type=StockMovement.MovementType.LOSS,
+            product=self.product, quantity=-1
+        )])
+
+        report = InventoryLedger.reconcile([self.product.pk])
+
+        expected = {'quantity_on_hand': 9, 'quantity_reserved': 2, 'quantity_rented': 1}
+        self.assertEqual(report['movements_posted'], 1)
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(InventoryLedger.balances([self.product.pk])[self.product.pk], expected)
+        self.assertEqual(InventoryLedger.reconcile([self.product.pk])['drifted'], 0)
+        self.assertEqual(InventoryLedger.reconcile([self.product.pk])['movements_posted'], 0)
+
+
+class OpeningMigrationTests(InventoryTestCase):
+
+    def test_opens_from_reservations_not_stale_counters(self):
+        migration = import_module('apps.catalog.migrations.0006_inventory_ledger')
+        other = Product.objects.create(sku='TNT-2', name='Tent XL')
+        self.reserve(2)
+        self.reserve(3, status=Reservation.Status.ACTIVE)
+        self.reserve(1, status=Reservation.Status.CANCELLED, product=other)
+        StockMovement.objects.bulk_create([StockMovement(
+            movement_number='SM-3', movement_type=StockMovement.MovementType.DAMAGE,
+            product=self.product, quantity=-1
+        )])
+
+        # The state before the ledger existed: no entries, counters never synced
+        InventoryLedgerEntry.objects.all().delete()
+        Product.objects.update(quantity_reserved=0, quantity_rented=0)
+
+        migration.open_balances(django_apps, None)
+
+        expected = {'quantity_on_hand': 9, 'quantity_reserved': 2, 'quantity_rented': 3}
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(InventoryLedger.balances([self.product.pk])[self.product.pk], expected)
+        self.assertFalse(InventoryLedgerEntry.objects.filter(product=other).exists())
+        self.assertEqual(InventoryLedger.reconcile()['drifted'], 0)
+
+        # The first pickup of a pre-existing reservation now posts cleanly
+        reservation = Reservation.objects.get(status=Reservation.Status.RESERVED)
+        reservation.status = Reservation.Status.ACTIVE
+        reservation.save()
+        self.assertEqual(self.counters()['quantity_rented'], 5)
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from apps.invoicing.models import InvoiceLine
+from apps.orders.models import QuoteItem, RentalItem
+from utils.money import div_round, from_paise, multiply, percent_of, prorate, to_paise
+
+
+class ToPaiseTests(SimpleTestCase):
+
+    def test_types(self):
+        self.assertEqual(to_paise(Decimal('12.34')), 1234)
+        self.assertEqual(to_paise(12), 1200)
+        self.assertEqual(to_paise('12.3'), 1230)
+        self.assertEqual(to_paise(None), 0)
+
+    def test_float_uses_shortest_repr(self):
+        # 1.005 is 1.00499999... in binary; str() keeps it at 1.005
+        self.assertEqual(to_paise(1.005), 101)
+        self.assertEqual(to_paise(0.1 + 0.2), 30)
+
+    def test_sub_paisa_rounds_half_away_from_zero(self):
+        self.assertEqual(to_paise(Decimal('0.005')), 1)
+        self.assertEqual(to_paise(Decimal('0.0049')), 0)
+        self.assertEqual(to_paise(Decimal('-0.005')), -1)
+        self.assertEqual(to_paise(Decimal('-2.675')), -268)
+
+    def test_round_trip(self):
+        self.assertEqual(from_paise(to_paise(Decimal('99.99'))), Decimal('99.99'))
+        self.assertEqual(from_paise(-5), Decimal('-0.05'))
+        self.assertEqual(str(from_paise(1200)), '12.00')
+
+
+class DivRoundTests(SimpleTestCase):
+
+    def test_exact(self):
+        self.assertEqual(div_round(10, 5), 2)
+        self.assertEqual(div_round(0, 7), 0)
+
+    def test_half_rounds_away_from_zero(self):
+        self.assertEqual(div_round(5, 2), 3)
+        self.assertEqual(div_round(-5, 2), -3)
+        self.assertEqual(div_round(5, -2), -3)
+        self.assertEqual(div_round(-5, -2), 3)
+        self.assertEqual(div_round(1, 2), 1)
+        self.assertEqual(div_round(-1, 2), -1)
+
+    def test_below_and_above_half(self):
+        self.assertEqual(div_round(7, 3), 2)
+        self.assertEqual(div_round(8, 3), 3)
+        self.assertEqual(div_round(-7, 3), -2)
+        self.assertEqual(div_round(-8, 3), -3)
+
+
+class ScalingTests(SimpleTestCase):
+
+    def test_percent_of(self):
+        self.assertEqual(percent_of(10000, Decimal('18.00')), 1800)
+        # 18% of 0.25 is 0.045: rounds up to 5 paise
+        self.assertEqual(percent_of(25, Decimal('18')), 5)
+        self.assertEqual(percent_of(-25, Decimal('18')), -5)
+        self.assertEqual(percent_of(333, Decimal('12.5')), 42)
+        self.assertEqual(percent_of(1000, 0), 0)
+
+    def test_prorate(self):
+        # An hourly rate of 100.00 for 90 minutes
+        self.assertEqual(prorate(10000, 5400, 3600), 15000)
+        self.assertEqual(prorate(100, 1, 3), 33)
+        self.assertEqual(prorate(100, 2, 3), 67)
+        self.assertEqual(prorate(1, 1, 2), 1)
+        self.assertEqual(prorate(-1, 1, 2), -1)
+
+    def test_multiply(self):
+        self.assertEqual(multiply(1999, 3), 5997)
+        self.assertEqual(multiply(1999, Decimal('1.5')), 2999)
+        self.assertEqual(multiply(1000, Decimal('0.33')), 330)
+
+
+class LineTotalTests(SimpleTestCase):
+
+    def test_invoice_line_percent_discount_and_tax(self):
+        line = InvoiceLine(
+            quantity=Decimal('3'), unit_price=Decimal('33.33'),
+            discount_percent=Decimal('10'), tax_rate=Decimal('18')
+        )
+        taxable = line.calculate_amounts()
+        # 99.99 less 10.00 (9.999 rounded) is 89.99; tax 16.1982 rounds to 16.20
+        self.assertEqual(taxable, 8999)
+        self.assertEqual(line.tax_amount, Decimal('16.20'))
+        self.assertEqual(line.line_total, Decimal('106.19'))
+
+    def test_invoice_line_fixed_discount_wins(self):
+        line = InvoiceLine(
+            quantity=Decimal('1.5'), unit_price=Decimal('10.01'),
+            discount_percent=Decimal('50'), discount_amount=Decimal('1.00'), tax_rate=Decimal('5')
+        )
+        # 15.015 rounds to 15.02; less 1.00; 5% tax of 14.02 is 0.701 -> 0.70
+        self.assertEqual(line.calculate_amounts(), 1402)
+        self.assertEqual(line.tax_amount, Decimal('0.70'))
+        self.assertEqual(line.line_total, Decimal('14.72'))
+
+    def test_rental_item_counts_started_days(self):
+        start = datetime(2026, 1, 1, 9)
+        item = RentalItem(
+            quantity=2, unit_price=Decimal('499.95'), discount_amount=Decimal('0.10'),
+            start_datetime=start, end_datetime=start + timedelta(days=2, hours=1)
+        )
+        item.calculate_line_total()
+        self.assertEqual(item.line_total, Decimal('2999.60'))
+
+    def test_rental_item_without_price(self):
+        item = RentalItem(quantity=2, unit_price=None, start_datetime=datetime(2026, 1, 1))
+        item.calculate_line_total()
+        self.assertEqual(item.line_total, 0)
+
+    def test_quote_item(self):
+        item = QuoteItem(quantity=3, unit_price=Decimal('0.10'), discount_amount=Decimal('0.05'))
+        item.calculate_line_total()
+        self.assertEqual(item.line_total, Decimal('0.25'))
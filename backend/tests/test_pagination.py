@@ -0,0 +1,129 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import uuid4
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.exceptions import ValidationError
+
+from apps.catalog.models import Product
+from utils.pagination import decode_cursor, encode_cursor, paginate, paginate_keyset
+
+
+def request(**params):
+    return SimpleNamespace(query_params={key: str(value) for key, value in params.items()})
+
+
+class CursorEncodingTests(SimpleTestCase):
+
+    def test_round_trip_keeps_types(self):
+        values = [
+            datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            date(2026, 1, 2),
+            Decimal('12.50'),
+            uuid4(),
+            'name',
+            7,
+            None,
+        ]
+        self.assertEqual(decode_cursor(encode_cursor(values, 'prev'), len(values)), ('prev', values))
+
+    def test_garbage_cursor(self):
+        with self.assertRaises(ValidationError):
+            decode_cursor('not a cursor!', 2)
+
+    def test_tampered_cursor(self):
+        cursor = encode_cursor(['Drill', 5], 'next')
+        tampered = cursor[:-3] + ('A' if cursor[-3] != 'A' else 'B') + cursor[-2:]
+        with self.assertRaises(ValidationError):
+            decode_cursor(tampered, 2)
+
+    def test_cursor_from_another_listing(self):
+        with self.assertRaises(ValidationError):
+            decode_cursor(encode_cursor(['Drill'], 'next'), 2)
+        with self.assertRaises(ValidationError):
+            decode_cursor(encode_cursor(['Drill', 5], 'sideways'), 2)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Five products share a name so a page boundary falls inside the tie
+        names = ['Anchor', 'Drill', 'Drill', 'Drill', 'Drill', 'Drill', 'Saw', 'Tent']
+        cls.products = [
+            Product.objects.create(sku=f'SKU-{index}', name=name, year=2020 + index if index % 3 else None)
+            for index, name in enumerate(names)
+        ]
+
+    def walk(self, ordering, limit=3):
+        pages = []
+        params = {'pagination': 'cursor', 'limit': limit}
+        while True:
+            objects, pagination = paginate_keyset(request(**params), Product.objects.all(), ordering)
+            pages.append((objects, pagination))
+            if not pagination['has_next']:
+                return pages
+            params = {'cursor': pagination['next_cursor'], 'limit': limit}
+
+    def ids(self, objects):
+        return [obj.pk for obj in objects]
+
+    def test_descending_with_ties_across_pages(self):
+        pages = self.walk(['-name'])
+        walked = [pk for objects, _ in pages for pk in self.ids(objects)]
+        expected = list(Product.objects.order_by('-name', '-pk').values_list('pk', flat=True))
+        self.assertEqual(walked, expected)
+        self.assertEqual(len(walked), len(set(walked)))
+        self.assertEqual([len(objects) for objects, _ in pages], [3, 3, 2])
+
+    def test_ascending_ties_break_on_id(self):
+        walked = [pk for objects, _ in self.walk(['name'], limit=2) for pk in self.ids(objects)]
+        expected = list(Product.objects.order_by('name', 'pk').values_list('pk', flat=True))
+        self.assertEqual(walked, expected)
+
+    def test_nulls_sort_last(self):
+        walked = [obj for objects, _ in self.walk(['-year']) for obj in objects]
+        years = [obj.year for obj in walked]
+        with_year = [year for year in years if year is not None]
+        self.assertEqual(years, with_year + [None] * (len(years) - len(with_year)))
+        self.assertEqual(with_year, sorted(with_year, reverse=True))
+        self.assertEqual(len(walked), len(self.products))
+
+    def test_prev_cursor_returns_previous_page(self):
+        for ordering in (['-name'], ['-year'], ['year']):
+            pages = self.walk(ordering)
+            for previous, (_, pagination) in zip(pages, pages[1:]):
+                objects, back = paginate_keyset(
+                    request(cursor=pagination['prev_cursor'], limit=3), Product.objects.all(), ordering
+                )
+                self.assertEqual(self.ids(objects), self.ids(previous[0]), ordering)
+                self.assertEqual(back['has_prev'], previous[1]['has_prev'], ordering)
+                self.assertTrue(back['has_next'])
+
+    def test_first_and_last_page_flags(self):
+        pages = self.walk(['-name'])
+        first, last = pages[0][1], pages[-1][1]
+        self.assertFalse(first['has_prev'])
+        self.assertIsNone(first['prev_cursor'])
+        self.assertTrue(last['has_prev'])
+        self.assertIsNone(last['next_cursor'])
+
+    def test_exact_total(self):
+        _, pagination = paginate_keyset(
+            request(pagination='cursor', total='exact'), Product.objects.all(), ['name']
+        )
+        self.assertEqual(pagination['total'], len(self.products))
+
+    def test_tampered_cursor_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            paginate(request(cursor='eyJkIjoibmV4dCJ9'), Product.objects.all(), ['name'])
+
+    def test_offset_mode_is_the_default(self):
+        objects, pagination = paginate(request(page=2, limit=3), Product.objects.all(), ['name'])
+        self.assertEqual(pagination['total'], len(self.products))
+        self.assertEqual(pagination['total_pages'], 3)
+        self.assertEqual(
+            self.ids(objects),
+            list(Product.objects.order_by('name').values_list('pk', flat=True)[3:6])
+        )
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.orders.models import RentalQuote
+from apps.pricing.models import PriceList, PriceListVersion
+
+User = get_user_model()
+
+
+class PriceListVersionStampTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='customer', password='x')
+        cls.retail = PriceList.objects.create(name='Retail')
+        cls.trade = PriceList.objects.create(name='Trade')
+
+    def quote(self, **kwargs):
+        return RentalQuote.objects.create(customer=self.user, created_by=self.user, **kwargs)
+
+    def test_new_quote_is_stamped(self):
+        quote = self.quote(price_list=self.retail)
+        version = PriceListVersion.objects.get(pk=quote.price_list_version_id)
+        self.assertEqual(version.price_list_id, self.retail.pk)
+
+    def test_quote_without_list_is_not_stamped(self):
+        self.assertIsNone(self.quote().price_list_version_id)
+
+    def test_stamp_kept_on_later_saves(self):
+        quote = self.quote(price_list=self.retail)
+        stamped = quote.price_list_version_id
+
+        quote = RentalQuote.objects.get(pk=quote.pk)
+        quote.notes = 'Called the customer'
+        quote.save()
+        self.assertEqual(RentalQuote.objects.get(pk=quote.pk).price_list_version_id, stamped)
+
+    def test_legacy_quote_stays_unstamped(self):
+        quote = self.quote(price_list=self.retail)
+        RentalQuote.objects.filter(pk=quote.pk).update(price_list_version=None)
+
+        quote = RentalQuote.objects.get(pk=quote.pk)
+        quote.notes = 'Status update'
+        quote.save()
+        self.assertIsNone(RentalQuote.objects.get(pk=quote.pk).price_list_version_id)
+
+    def test_changing_list_restamps(self):
+        quote = self.quote(price_list=self.retail)
+        RentalQuote.objects.filter(pk=quote.pk).update(price_list_version=None)
+
+        quote = RentalQuote.objects.get(pk=quote.pk)
+        quote.price_list = self.trade
+        quote.save()
+        version = PriceListVersion.objects.get(pk=RentalQuote.objects.get(pk=quote.pk).price_list_version_id)
+        self.assertEqual(version.price_list_id, self.trade.pk)
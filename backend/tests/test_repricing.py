@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.catalog.models import Product
+from apps.orders.models import QuoteItem, RentalQuote
+from apps.orders.repricing import QuoteRepricingService
+from apps.pricing import index as pricing_index
+from apps.pricing.models import PriceList, PriceRule
+from apps.pricing.versions import PriceListVersions
+
+User = get_user_model()
+
+
+class QuoteRepricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='customer', password='x')
+        cls.product = Product.objects.create(sku='GEN-1', name='Generator')
+        cls.price_list = PriceList.objects.create(name='Retail', is_default=True)
+        cls.rule = PriceRule.objects.create(price_list=cls.price_list, product=cls.product, rate_day=Decimal('100.00'))
+        PriceListVersions.publish([cls.price_list.pk])
+
+    def setUp(self):
+        # The process-wide index is module state; keep it from leaking between tests
+        pricing_index._index = None
+        self.addCleanup(setattr, pricing_index, '_index', None)
+        patcher = mock.patch.object(pricing_index, 'VERSION_CHECK_INTERVAL', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def quote(self, price_list=None):
+        quote = RentalQuote.objects.create(customer=self.user, created_by=self.user, price_list=price_list)
+        start = timezone.now() + timedelta(days=3)
+        QuoteItem.objects.create(
+            quote=quote, product=self.product, quantity=1, unit_price=Decimal('200.00'),
+            start_datetime=start, end_datetime=start + timedelta(days=2)
+        )
+        return quote
+
+    def change_rate(self, rate):
+        # Warm the process-wide index, then change the rule and publish. The
+        # index invalidation runs on commit, which a test never reaches, so
+        # the index stays stale the way a worker's can between checks.
+        pricing_index.get_pricing_index()
+        self.rule.rate_day = rate
+        self.rule.save()
+        return PriceListVersions.publish([self.price_list.pk])[self.price_list.pk]
+
+    def test_prices_against_newly_published_version(self):
+        quote = self.quote(self.price_list)
+        version = self.change_rate(Decimal('150.00'))
+        self.assertNotEqual(version.pk, quote.price_list_version_id)
+
+        report = QuoteRepricingService.reprice([quote.pk])
+
+        self.assertEqual(report['changed_quotes'], 1)
+        item = QuoteItem.objects.get(quote=quote)
+        self.assertEqual(item.unit_price, Decimal('300.00'))
+        quote.refresh_from_db()
+        self.assertEqual(quote.price_list_version_id, version.pk)
+        self.assertEqual(quote.total_amount, Decimal('300.00'))
+
+    def test_quote_without_list_uses_fresh_rules(self):
+        quote = self.quote()
+        self.change_rate(Decimal('150.00'))
+
+        QuoteRepricingService.reprice([quote.pk])
+
+        self.assertEqual(QuoteItem.objects.get(quote=quote).unit_price, Decimal('300.00'))
+        quote.refresh_from_db()
+        self.assertIsNone(quote.price_list_version_id)
+
+    def test_dry_run_writes_nothing(self):
+        quote = self.quote(self.price_list)
+        self.change_rate(Decimal('150.00'))
+
+        report = QuoteRepricingService.reprice([quote.pk], dry_run=True)
+
+        self.assertEqual(report['changed_items'], 1)
+        self.assertEqual(report['total_after'], Decimal('300.00'))
+        self.assertEqual(QuoteItem.objects.get(quote=quote).unit_price, Decimal('200.00'))
+
+    def test_closed_quotes_are_left_alone(self):
+        quote = self.quote(self.price_list)
+        RentalQuote.objects.filter(pk=quote.pk).update(status=RentalQuote.Status.CONFIRMED)
+        self.change_rate(Decimal('150.00'))
+
+        self.assertEqual(QuoteRepricingService.reprice([quote.pk])['quotes'], 0)
@@ -0,0 +1,67 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.catalog.models import Product, ProductCategory, ProductSearchDocument
+from apps.catalog.search import ProductSearchIndex
+
+
+class ProductSearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tools = ProductCategory.objects.create(name='Tools')
+        cls.power = ProductCategory.objects.create(name='Power Tools', parent=cls.tools)
+        cls.drill = Product.objects.create(
+            sku='DRL-1', name='Cordless Drill', brand='Bosch', category=cls.power,
+            description='18V with two batteries'
+        )
+        cls.ladder = Product.objects.create(sku='LAD-1', name='Step Ladder')
+
+    def test_document_carries_category_path(self):
+        document = ProductSearchDocument.objects.get(product=self.drill)
+        self.assertEqual(document.title, 'Cordless Drill DRL-1 Bosch')
+        self.assertEqual(document.body, 'Tools > Power Tools 18V with two batteries')
+
+    def test_document_without_category(self):
+        self.assertEqual(ProductSearchDocument.objects.get(product=self.ladder).body, '')
+
+    def test_renamed_ancestor_reaches_documents(self):
+        self.tools.name = 'Hardware'
+        self.tools.save()
+        ProductSearchIndex.index_categories([self.tools.pk])
+        document = ProductSearchDocument.objects.get(product=self.drill)
+        self.assertTrue(document.body.startswith('Hardware > Power Tools'))
+
+    def test_search_matches_prefix_of_last_term(self):
+        results = ProductSearchIndex.search(Product.objects.all(), 'cordless dri')
+        self.assertEqual(list(results.values_list('pk', flat=True)), [self.drill.pk])
+
+    def test_search_matches_category_path(self):
+        results = ProductSearchIndex.search(Product.objects.all(), 'power')
+        self.assertEqual(list(results.values_list('pk', flat=True)), [self.drill.pk])
+
+
+class AutocompleteViewTests(TestCase):
+
+    url = '/api/catalog/products/autocomplete/'
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(3):
+            Product.objects.create(sku=f'DRL-{index}', name=f'Drill {index}')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_limit_is_clamped(self):
+        response = self.client.get(self.url, {'q': 'drill', 'limit': '-1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']['suggestions']), 1)
+
+        response = self.client.get(self.url, {'q': 'drill', 'limit': '100'})
+        self.assertEqual(len(response.data['data']['suggestions']), 3)
+
+    def test_invalid_limit(self):
+        response = self.client.get(self.url, {'q': 'drill', 'limit': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error']['code'], 'INVALID_LIMIT')
@@ -0,0 +1,111 @@
+"""
+Sparse fieldsets for read endpoints.
+
+Clients can trim a payload with query parameters:
+
+* ``?fields=id,name,sku``: only these fields.
+* ``?view=summary``: the serializer's compact summary fields.
+* ``?expand=items,images``: add expandable (heavy) fields back on top of
+  a ``fields`` or ``summary`` selection.
+
+Without any of them a serializer renders exactly as before. Serializers opt
+in with SparseFieldsetMixin and describe themselves in Meta:
+
+* ``expandable_fields``: heavy fields dropped from sparse and summary
+  output unless expanded.
+* ``summary_fields``: the summary view.
+* ``summary_only_fields``: fields that only exist in sparse output (e.g.
+  counts replacing an embedded list).
+
+Views opt in with SparseFieldsetViewMixin, which passes the options to
+every serializer they build for a GET and exposes ``selected_fields()``
+so get_queryset() can skip prefetches nobody will render.
+"""
+from typing import Dict, Iterable, List, Optional
+
+
+def _split(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def fieldset_options(request) -> Dict:
+    """Serializer kwargs from the request's ``fields``/``expand``/``view`` parameters"""
+    if request is None or request.method != 'GET':
+        return {}
+    params = request.query_params
+    options = {}
+    if params.get('fields'):
+        options['fields'] = _split(params['fields'])
+    if params.get('expand'):
+        options['expand'] = _split(params['expand'])
+    if params.get('view') == 'summary':
+        options['summary'] = True
+    return options
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin accepting ``fields``, ``expand`` and ``summary`` kwargs"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        summary = kwargs.pop('summary', False)
+        super().__init__(*args, **kwargs)
+
+        keep = set(self.select_fields(fields, expand, summary))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def select_fields(
+        cls,
+        fields: Optional[Iterable[str]] = None,
+        expand: Optional[Iterable[str]] = None,
+        summary: bool = False
+    ) -> List[str]:
+        """Names of the fields rendered for these options"""
+        meta = cls.Meta
+        declared = list(meta.fields)
+        expandable = set(getattr(meta, 'expandable_fields', []))
+        summary_only = set(getattr(meta, 'summary_only_fields', []))
+
+        if fields:
+            requested = set(fields)
+            selected = [name for name in declared if name in requested]
+        elif summary:
+            summary_fields = set(getattr(meta, 'summary_fields', declared))
+            selected = [name for name in declared if name in summary_fields]
+        else:
+            return [name for name in declared if name not in summary_only]
+
+        if not fields:
+            selected = [name for name in selected if name not in expandable]
+        for name in expand or []:
+            if name in expandable and name in declared and name not in selected:
+                selected.append(name)
+        return selected
+
+
+class SparseFieldsetViewMixin:
+    """ViewSet mixin wiring request parameters into SparseFieldsetMixin serializers"""
+
+    def get_fieldset_options(self) -> Dict:
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetMixin):
+            return {}
+        return fieldset_options(getattr(self, 'request', None))
+
+    def get_serializer(self, *args, **kwargs):
+        for key, value in self.get_fieldset_options().items():
+            kwargs.setdefault(key, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def selected_fields(self) -> List[str]:
+        """Fields the response will render, for tailoring prefetches"""
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetMixin):
+            return list(getattr(serializer_class.Meta, 'fields', []))
+        return serializer_class.select_fields(**self.get_fieldset_options())
@@ -0,0 +1,61 @@
+"""
+Money arithmetic in integer paise.
+
+Amounts are stored as two-place decimals but computed here as integer
+paise (hundredths of the currency unit). Inputs are converted once with
+to_paise(); everything in between is exact integer math, and every step
+that divides rounds with one policy, half away from zero (ROUND_HALF_UP),
+before from_paise() turns the result back into a Decimal.
+
+Pricing, late fees, order lines and invoice lines all go through these
+helpers, so the same inputs round to the same paisa in every service.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+PAISE_PER_UNIT = 100
+ROUNDING = ROUND_HALF_UP
+
+_ONE = Decimal('1')
+_PAISA = Decimal('0.01')
+
+
+def to_paise(amount) -> int:
+    """Integer paise of a Decimal, int, str or float amount; None is 0"""
+    if amount is None:
+        return 0
+    if isinstance(amount, int):
+        return amount * PAISE_PER_UNIT
+    if not isinstance(amount, Decimal):
+        # str() keeps floats at their shortest repr instead of the binary expansion
+        amount = Decimal(str(amount))
+    return int((amount * PAISE_PER_UNIT).quantize(_ONE, rounding=ROUNDING))
+
+
+def from_paise(paise: int) -> Decimal:
+    """Two-place Decimal amount of ``paise``"""
+    return (Decimal(paise) / PAISE_PER_UNIT).quantize(_PAISA)
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """``numerator / denominator`` rounded half away from zero, in integers"""
+    quotient, remainder = divmod(abs(numerator), abs(denominator))
+    if remainder * 2 >= abs(denominator):
+        quotient += 1
+    return quotient if (numerator < 0) == (denominator < 0) else -quotient
+
+
+def multiply(paise: int, factor) -> int:
+    """``paise`` times a whole or two-place factor (e.g. an invoice quantity)"""
+    if isinstance(factor, int):
+        return paise * factor
+    return div_round(paise * to_paise(factor), PAISE_PER_UNIT)
+
+
+def percent_of(paise: int, percent) -> int:
+    """``percent`` (up to two places, e.g. 18.00) of ``paise``"""
+    return div_round(paise * to_paise(percent), 100 * PAISE_PER_UNIT)
+
+
+def prorate(paise: int, part: int, whole: int) -> int:
+    """``paise`` scaled by ``part / whole``, e.g. an hourly rate by seconds / 3600"""
+    return div_round(paise * part, whole)
@@ -0,0 +1,250 @@
+"""
+Offset and keyset (cursor) pagination for list endpoints.
+
+Offset pagination (``?page=``) needs a ``count()`` and an ``OFFSET`` that
+both scan every earlier row, so deep pages get slower the further a client
+walks. Keyset pagination instead remembers the sort key of the last row
+returned and asks for rows after it, which an index on the sort columns
+answers in constant time at any depth.
+
+List endpoints accept either mode:
+
+* ``?page=3&limit=20``: classic offset pagination (the default).
+* ``?pagination=cursor&limit=20``, then ``?cursor=<next_cursor>``: keyset
+  pagination. Cursors are opaque; ``total=estimate`` adds the planner's
+  row estimate (PostgreSQL only) and ``total=exact`` a real count.
+
+Keyset ordering always ends with the primary key so every row has a
+unique position, and NULLs sort last in both directions on every backend.
+"""
+import base64
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _encode_value(value: Any) -> List:
+    if isinstance(value, datetime):
+        return ['dt', value.isoformat()]
+    if isinstance(value, date):
+        return ['d', value.isoformat()]
+    if isinstance(value, Decimal):
+        return ['dec', str(value)]
+    if isinstance(value, UUID):
+        return ['uuid', str(value)]
+    return ['v', value]
+
+
+def _decode_value(encoded: List) -> Any:
+    kind, value = encoded
+    if kind == 'dt':
+        return datetime.fromisoformat(value)
+    if kind == 'd':
+        return date.fromisoformat(value)
+    if kind == 'dec':
+        return Decimal(value)
+    if kind == 'uuid':
+        return UUID(value)
+    return value
+
+
+def encode_cursor(values: Sequence, direction: str) -> str:
+    """Opaque cursor for the row with sort key ``values``"""
+    payload = {'d': direction, 'k': [_encode_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, key_length: int) -> Tuple[str, List]:
+    """(direction, values) from a cursor; raises ValidationError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        values = [_decode_value(value) for value in payload['k']]
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+    if direction not in ('next', 'prev') or len(values) != key_length:
+        raise ValidationError({'cursor': 'Cursor does not match this listing'})
+    return direction, values
+
+
+def _normalize_ordering(ordering: Sequence[str]) -> List[Tuple[str, bool]]:
+    """[(field, descending)] with the primary key appended as tiebreaker"""
+    keys = []
+    for field in ordering:
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        if name in ('id', 'pk'):
+            keys.append(('pk', descending))
+            return keys
+        keys.append((name, descending))
+    keys.append(('pk', keys[-1][1] if keys else False))
+    return keys
+
+
+def _order_expressions(keys: List[Tuple[str, bool]], reverse: bool) -> List:
+    # Walking backwards flips NULLs to the front; Django only accepts True
+    # or None for the nulls_first/nulls_last flags
+    nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+    expressions = []
+    for name, descending in keys:
+        if descending != reverse:
+            expressions.append(F(name).desc(**nulls))
+        else:
+            expressions.append(F(name).asc(**nulls))
+    return expressions
+
+
+def _after(keys: List[Tuple[str, bool]], values: Sequence, reverse: bool) -> Q:
+    """
+    Rows strictly after ``values`` in the keyset ordering (or strictly
+    before it when ``reverse``), NULLs sorting last going forward.
+    """
+    nothing = Q(pk__in=[])
+    condition = nothing
+    equal_prefix = Q()
+    for (name, descending), value in zip(keys, values):
+        nulls_last = not reverse
+        if value is None:
+            after = nothing if nulls_last else Q(**{f'{name}__isnull': False})
+            equal = Q(**{f'{name}__isnull': True})
+        else:
+            lookup = 'lt' if descending != reverse else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            if nulls_last:
+                after |= Q(**{f'{name}__isnull': True})
+            equal = Q(**{name: value})
+        condition |= equal_prefix & after
+        equal_prefix &= equal
+    return condition
+
+
+def _key_values(obj, keys: List[Tuple[str, bool]]) -> List:
+    values = []
+    for name, _ in keys:
+        value = obj
+        for part in name.split('__'):
+            value = getattr(value, part, None)
+            if value is None:
+                break
+        values.append(value)
+    return values
+
+
+def estimated_count(queryset) -> Optional[int]:
+    """Planner row estimate for a queryset (PostgreSQL only), without running it"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Could not estimate row count: {str(e)}")
+        return None
+
+
+def get_limit(request, default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    return max(1, min(int(request.query_params.get('limit', default)), maximum))
+
+
+def wants_cursor(request) -> bool:
+    return 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor'
+
+
+def paginate_offset(request, queryset, ordering: Sequence[str]) -> Tuple[List, Dict]:
+    """
+    One ``?page=`` page of ``queryset`` in ``ordering``.
+
+    Returns (objects, {'page', 'limit', 'total', 'total_pages', 'has_next', 'has_prev'})
+    """
+    page = int(request.query_params.get('page', 1))
+    limit = get_limit(request)
+    offset = (page - 1) * limit
+
+    queryset = queryset.order_by(*ordering)
+    total = queryset.count()
+    objects = list(queryset[offset:offset + limit])
+
+    return objects, {
+        'page': page,
+        'limit': limit,
+        'total': total,
+        'total_pages': (total + limit - 1) // limit,
+        'has_next': offset + limit < total,
+        'has_prev': page > 1
+    }
+
+
+def paginate_keyset(request, queryset, ordering: Sequence[str]) -> Tuple[List, Dict]:
+    """
+    One cursor page of ``queryset`` in ``ordering`` (primary key appended).
+
+    Returns (objects, {'limit', 'next_cursor', 'prev_cursor', 'has_next',
+    'has_prev', 'total'}); ``total`` is None unless requested with
+    ``total=estimate`` or ``total=exact``.
+    """
+    keys = _normalize_ordering(ordering)
+    limit = get_limit(request)
+    cursor = request.query_params.get('cursor')
+
+    total = None
+    total_mode = request.query_params.get('total')
+    if total_mode == 'estimate':
+        total = estimated_count(queryset)
+    elif total_mode == 'exact':
+        total = queryset.count()
+
+    direction, values = ('next', None)
+    if cursor:
+        direction, values = decode_cursor(cursor, len(keys))
+    reverse = direction == 'prev'
+
+    page = queryset
+    if values is not None:
+        page = page.filter(_after(keys, values, reverse))
+    objects = list(page.order_by(*_order_expressions(keys, reverse))[:limit + 1])
+
+    more = len(objects) > limit
+    objects = objects[:limit]
+    if reverse:
+        objects.reverse()
+
+    # Going forward, rows before the cursor exist whenever a cursor was given;
+    # going back, the cursor row itself is still ahead of the page
+    has_next = more if not reverse else True
+    has_prev = more if reverse else values is not None
+
+    return objects, {
+        'limit': limit,
+        'next_cursor': encode_cursor(_key_values(objects[-1], keys), 'next') if objects and has_next else None,
+        'prev_cursor': encode_cursor(_key_values(objects[0], keys), 'prev') if objects and has_prev else None,
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'total': total
+    }
+
+
+def paginate(request, queryset, ordering: Sequence[str]) -> Tuple[List, Dict]:
+    """Cursor page when the request asks for one, otherwise an offset page"""
+    if wants_cursor(request):
+        return paginate_keyset(request, queryset, ordering)
+    return paginate_offset(request, queryset, ordering)